@@ -0,0 +1,4 @@
+"""
+Intelligent Form Agent - Benchmarks
+Standalone scripts that measure the cost of each pipeline stage
+"""
@@ -0,0 +1,88 @@
+"""
+Adaptive Retrieval Benchmark
+Compares fixed k=4 retrieval against adaptive retrieval depth
+
+Runs the same questions through the agent twice and reports, for single
+document questions and cross-document analysis:
+- Mean number of chunks put in the prompt
+- Mean prompt size in (estimated) tokens
+- Mean LLM latency
+
+Needs Ollama running, like the agent itself.
+
+To run:
+    python -m benchmarks.adaptive_k_benchmark [data_dir]
+"""
+
+import os
+import sys
+from statistics import mean
+from typing import List
+from src.agent import ANALYSIS_DEPTH, QA_DEPTH, IntelligentFormAgent
+from src.ingest import DocumentIngester
+from src.retrieval import RetrievalDepth
+from src.utils import print_separator
+
+
+ANALYSIS_QUESTIONS = [
+    "What is the total across all invoices?",
+    "Which invoice has the highest amount?",
+    "Which vendors appear in the documents?",
+]
+
+
+def lookup_questions(agent: IntelligentFormAgent) -> List[str]:
+    """
+    Simple single-document lookups for every loaded document
+    """
+    questions = []
+    for source in agent.chunks.sources():
+        name = os.path.splitext(os.path.basename(source))[0]
+        questions.append(f"What is the total amount in {name}?")
+        questions.append(f"What is the date of {name}?")
+    return questions
+
+
+def run(agent: IntelligentFormAgent, method, questions: List[str]) -> dict:
+    """
+    Run questions through one agent method and average the results
+    """
+    results = [method(question) for question in questions]
+    return {
+        "k": mean(r.k for r in results),
+        "prompt_tokens": mean(r.prompt_tokens for r in results),
+        "llm_seconds": mean(r.timings.get("generate", 0.0) for r in results),
+    }
+
+
+def main():
+    """Run the benchmark and print a comparison table"""
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), "data"
+    )
+
+    chunks = DocumentIngester().process_directory(data_dir)
+    if not chunks:
+        sys.exit(1)
+    agent = IntelligentFormAgent(chunks)
+    questions = lookup_questions(agent)
+
+    rows = []
+    for label, qa_depth, analysis_depth in (
+        ("fixed k=4", RetrievalDepth.fixed(4), RetrievalDepth.fixed(4)),
+        ("adaptive", QA_DEPTH, ANALYSIS_DEPTH),
+    ):
+        agent.qa_depth = qa_depth
+        agent.analysis_depth = analysis_depth
+        rows.append((label, "lookup", run(agent, agent.ask_question, questions)))
+        rows.append((label, "analysis", run(agent, agent.holistic_analysis, ANALYSIS_QUESTIONS)))
+
+    print_separator(f"Adaptive Retrieval Benchmark ({len(questions)} lookups, "
+                    f"{len(ANALYSIS_QUESTIONS)} analyses)")
+    print(f"{'retrieval':<12}{'query':<10}{'mean k':>8}{'prompt tokens':>15}{'LLM (s)':>10}")
+    for label, kind, r in rows:
+        print(f"{label:<12}{kind:<10}{r['k']:>8.1f}{r['prompt_tokens']:>15.0f}{r['llm_seconds']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
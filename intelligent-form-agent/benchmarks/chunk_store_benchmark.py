@@ -0,0 +1,87 @@
+"""
+Chunk Store Benchmark
+Compares the memory held by a plain List[Document] against ChunkStore
+
+Builds synthetic invoice-like chunks spread over a number of documents and
+measures, for each representation:
+- Python heap memory per 100k chunks (tracemalloc)
+- Time to list the distinct documents
+
+To run:
+    python -m benchmarks.chunk_store_benchmark [num_chunks] [num_documents]
+"""
+
+import sys
+import time
+import tracemalloc
+from langchain.schema import Document
+from src.chunk_store import ChunkStore
+from src.utils import print_separator
+
+
+def make_chunks(num_chunks: int, num_documents: int):
+    """
+    Generate invoice-like chunks, each with its own metadata dict
+    """
+    for i in range(num_chunks):
+        doc = i % num_documents
+        yield Document(
+            page_content=(
+                f"Invoice Number: INV-{doc:06d}\nDate: January {i % 28 + 1}, 2024\n"
+                f"From: Vendor {doc % 97}\nItems:\n1. Line item {i} - ${i % 1000}.00\n"
+                f"Total: ${(i * 7) % 5000}.00\n" + "Payment due within 30 days. " * 20
+            ),
+            metadata={"source": f"/data/inbox/invoices/invoice_{doc:06d}.pdf", "page": i % 3},
+        )
+
+
+def measure(build):
+    """
+    Build a representation and return (object, bytes allocated)
+    """
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def main():
+    """Run the benchmark and print a comparison table"""
+    num_chunks = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    num_documents = int(sys.argv[2]) if len(sys.argv) > 2 else 5_000
+
+    chunk_list, list_bytes = measure(lambda: list(make_chunks(num_chunks, num_documents)))
+    start = time.perf_counter()
+    list_sources = {chunk.metadata.get("source", "Unknown") for chunk in chunk_list}
+    list_seconds = time.perf_counter() - start
+    del chunk_list
+
+    def build_store():
+        store = ChunkStore()
+        batch = []
+        for chunk in make_chunks(num_chunks, num_documents):
+            batch.append(chunk)
+            if len(batch) == 1000:
+                store.add(batch)
+                batch = []
+        store.add(batch)
+        return store
+
+    store, store_bytes = measure(build_store)
+    start = time.perf_counter()
+    store_sources = store.sources()
+    store_seconds = time.perf_counter() - start
+
+    assert len(list_sources) == len(store_sources)
+
+    scale = 100_000 / num_chunks
+    print_separator(f"Chunk Store Benchmark ({num_chunks} chunks, {num_documents} documents)")
+    print(f"{'representation':<18}{'MB / 100k chunks':>18}{'list documents (ms)':>22}")
+    print(f"{'List[Document]':<18}{list_bytes * scale / 1e6:>18.1f}{list_seconds * 1000:>22.2f}")
+    print(f"{'ChunkStore':<18}{store_bytes * scale / 1e6:>18.1f}{store_seconds * 1000:>22.2f}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Chunking Benchmark
+Compares the recursive character splitter against layout-aware chunking
+
+Measures, for each strategy:
+- Number of chunks and average chunk size
+- Time to embed all chunks
+- Retrieval hit rate: for every "key: value" line in the source pages, ask
+  for the key and check that a top-k chunk from the right file contains
+  the whole line
+
+To run:
+    python -m benchmarks.chunking_benchmark [data_dir]
+"""
+
+import os
+import sys
+import time
+from typing import Dict, List, Tuple
+import numpy as np
+from langchain.schema import Document
+from langchain_community.embeddings import HuggingFaceEmbeddings
+from src.chunking import KEY_VALUE, classify_line
+from src.ingest import DocumentIngester
+from src.utils import print_separator
+
+
+TOP_K = 4
+
+
+def build_probes(pages: List[Document]) -> List[Tuple[str, str, str]]:
+    """
+    Build (query, source, expected line) probes from the key: value lines of each page
+    """
+    probes = []
+    for page in pages:
+        source = page.metadata.get("source", "")
+        name = os.path.splitext(os.path.basename(source))[0]
+        for line in page.page_content.splitlines():
+            line = line.strip()
+            if classify_line(line) == KEY_VALUE:
+                key = line.split(":", 1)[0]
+                probes.append((f"What is the {key} in {name}?", source, line))
+    return probes
+
+
+def run_strategy(
+    strategy: str,
+    pages: List[Document],
+    probes: List[Tuple[str, str, str]],
+    embeddings: HuggingFaceEmbeddings
+) -> Dict[str, float]:
+    """
+    Chunk, embed and probe the pages with one chunking strategy
+    """
+    ingester = DocumentIngester(chunk_size=1000, chunking_strategy=strategy)
+    chunks = ingester.text_splitter.split_documents(pages)
+
+    start = time.perf_counter()
+    vectors = np.array(embeddings.embed_documents([c.page_content for c in chunks]))
+    embed_seconds = time.perf_counter() - start
+
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    hits = 0
+    for query, source, line in probes:
+        query_vector = np.array(embeddings.embed_query(query))
+        scores = vectors @ (query_vector / np.linalg.norm(query_vector))
+        top = np.argsort(-scores)[:TOP_K]
+        if any(
+            chunks[i].metadata.get("source") == source and line in chunks[i].page_content
+            for i in top
+        ):
+            hits += 1
+
+    return {
+        "chunks": len(chunks),
+        "avg_chars": sum(len(c.page_content) for c in chunks) / max(len(chunks), 1),
+        "embed_seconds": embed_seconds,
+        "hit_rate": hits / max(len(probes), 1),
+    }
+
+
+def main():
+    """Run the benchmark and print a comparison table"""
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), "data"
+    )
+
+    pages = DocumentIngester().load_directory(data_dir)
+    if not pages:
+        sys.exit(1)
+
+    probes = build_probes(pages)
+    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+
+    results = {
+        strategy: run_strategy(strategy, pages, probes, embeddings)
+        for strategy in ("recursive", "layout")
+    }
+
+    print_separator(f"Chunking Benchmark ({len(pages)} pages, {len(probes)} probes, k={TOP_K})")
+    print(f"{'strategy':<12}{'chunks':>8}{'avg chars':>12}{'embed (s)':>12}{'hit rate':>10}")
+    for strategy, r in results.items():
+        print(
+            f"{strategy:<12}{r['chunks']:>8}{r['avg_chars']:>12.0f}"
+            f"{r['embed_seconds']:>12.3f}{r['hit_rate']:>10.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
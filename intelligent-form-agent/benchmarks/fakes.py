@@ -0,0 +1,119 @@
+"""
+Fake Models
+Deterministic, offline stand-ins for HuggingFaceEmbeddings and Ollama that
+count every call, so tests and benchmarks can assert how much model work an
+operation does
+"""
+
+import contextlib
+import hashlib
+import math
+import re
+import threading
+from typing import Any, Iterator, List, Optional
+from unittest import mock
+from langchain.schema.embeddings import Embeddings
+from langchain.llms.base import LLM
+
+
+WORD = re.compile(r"\w+")
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Hashed bag-of-words embedder
+
+    The same text always gets the same vector, and texts sharing words
+    land close together, so retrieval behaves sensibly.
+    """
+
+    def __init__(self, size: int = 512):
+        """
+        Args:
+            size: Vector dimension
+        """
+        self.size = size
+        self.document_calls = 0
+        self.documents_embedded = 0
+        self.query_calls = 0
+        self._lock = threading.Lock()
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.size
+        for word in WORD.findall(text.lower()):
+            digest = hashlib.md5(word.encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.size] += 1.0
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            self.document_calls += 1
+            self.documents_embedded += len(texts)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        with self._lock:
+            self.query_calls += 1
+        return self._embed(text)
+
+
+class FakeLLM(LLM):
+    """
+    LLM that answers with the context line sharing the most words with the
+    question, e.g. "Total: $1250.00" for "What is the total amount?"
+    """
+
+    calls: int = 0
+    prompt_chars: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None,
+              **kwargs: Any) -> str:
+        self.calls += 1
+        self.prompt_chars += len(prompt)
+
+        question = re.search(r"^Question: (.*)$", prompt, re.MULTILINE)
+        if question is None:
+            return f"Summary of {len(prompt)} characters."
+
+        words = set(WORD.findall(question.group(1).lower()))
+        best, best_overlap = "I don't have enough information to answer that.", 0
+        for line in prompt[:question.start()].splitlines():
+            overlap = len(words & set(WORD.findall(line.lower())))
+            if overlap > best_overlap:
+                best, best_overlap = line.strip(), overlap
+        return best
+
+
+class FakeModels:
+    """
+    One fake embedder and one fake LLM, shared by every agent in a test
+    """
+
+    def __init__(self):
+        self.embeddings = FakeEmbeddings()
+        self.llm = FakeLLM()
+
+    def calls(self) -> dict:
+        """
+        Snapshot of every counter, to diff before and after an operation
+        """
+        return {
+            "embed_documents": self.embeddings.documents_embedded,
+            "embed_query": self.embeddings.query_calls,
+            "llm": self.llm.calls,
+        }
+
+    @contextlib.contextmanager
+    def installed(self) -> Iterator["FakeModels"]:
+        """
+        Make agents created inside the block construct these fakes instead
+        of the real models
+        """
+        with mock.patch("src.agent.HuggingFaceEmbeddings", lambda **kwargs: self.embeddings), \
+                mock.patch("src.agent.Ollama", lambda **kwargs: self.llm):
+            yield self
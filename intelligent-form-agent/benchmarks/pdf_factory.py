@@ -0,0 +1,127 @@
+"""
+PDF Factory
+Generates small, valid text PDFs of invoice-like forms for the tests and
+benchmarks, without any PDF library
+"""
+
+import os
+from typing import List
+
+
+VENDORS = ["ABC Corporation", "Northwind Traders", "Globex Inc", "Initech LLC", "Umbrella Supplies"]
+
+ITEMS = [
+    ("Consulting Services", 800.00),
+    ("Software License", 300.00),
+    ("Support Package", 150.00),
+    ("Hardware Rental", 420.00),
+    ("Training Session", 275.00),
+    ("Cloud Hosting", 99.00),
+]
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def pdf_bytes(pages: List[List[str]]) -> bytes:
+    """
+    Build a PDF with one page per list of text lines
+
+    Args:
+        pages: Lines of text for each page
+
+    Returns:
+        bytes: The PDF file
+    """
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    kids = []
+    number = 4
+    for lines in pages:
+        text = " T* ".join(f"({_escape(line)}) Tj" for line in lines)
+        stream = f"BT /F1 11 Tf 14 TL 72 740 Td {text} ET".encode("latin-1")
+        objects[number] = (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents "
+            + f"{number + 1} 0 R >>".encode()
+        )
+        objects[number + 1] = (
+            f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream"
+        )
+        kids.append(f"{number} 0 R")
+        number += 2
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for num in sorted(objects):
+        offsets[num] = len(out)
+        out += f"{num} 0 obj\n".encode() + objects[num] + b"\nendobj\n"
+
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for num in sorted(objects):
+        out += f"{offsets[num]:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def invoice_pages(index: int, num_pages: int = 1) -> List[List[str]]:
+    """
+    Text of one generated invoice; the same index always gives the same text
+
+    Args:
+        index: Invoice number
+        num_pages: Pages; pages after the first hold numbered line items
+
+    Returns:
+        Lines of text for each page
+    """
+    vendor = VENDORS[index % len(VENDORS)]
+    items = [ITEMS[(index + i) % len(ITEMS)] for i in range(3)]
+    total = sum(price for _, price in items)
+
+    first = [
+        "INVOICE",
+        f"Invoice Number: INV-{index:04d}",
+        f"Date: 2024-{index % 12 + 1:02d}-{index % 28 + 1:02d}",
+        f"From: {vendor}",
+        f"To: Customer {index % 7}",
+        "Items:",
+    ]
+    first += [f"{i}. {name} - ${price:.2f}" for i, (name, price) in enumerate(items, 1)]
+    first.append(f"Total: ${total:.2f}")
+
+    pages = [first]
+    for page in range(1, num_pages):
+        pages.append([f"Invoice INV-{index:04d} detail page {page}"] + [
+            f"Line {page}.{line}: {ITEMS[(index * 7 + page * 3 + line) % len(ITEMS)][0]} "
+            f"for project {index}-{page}-{line}, {(index + page + line) % 9 + 1} units"
+            for line in range(20)
+        ])
+    return pages
+
+
+def make_corpus(directory: str, num_documents: int, pages_per_document: int = 1) -> List[str]:
+    """
+    Write generated invoices to a directory
+
+    Args:
+        directory: Where to write the PDFs (created if missing)
+        num_documents: Number of invoices
+        pages_per_document: Pages in each invoice
+
+    Returns:
+        List of the written file paths
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for index in range(1, num_documents + 1):
+        path = os.path.join(directory, f"invoice_{index:04d}.pdf")
+        with open(path, "wb") as f:
+            f.write(pdf_bytes(invoice_pages(index, pages_per_document)))
+        paths.append(path)
+    return paths
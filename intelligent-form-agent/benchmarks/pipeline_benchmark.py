@@ -0,0 +1,190 @@
+"""
+Pipeline Benchmark
+Runs ingest and the agent end to end on generated PDFs with deterministic
+fake models, and measures every operation:
+- Wall time
+- Peak Python heap memory (tracemalloc, in a separate run, since tracing
+  slows pure-Python code such as MinHash several times over)
+- Embedding, LLM and vector search calls
+
+Needs no Ollama, embeddings model or network. tests/test_budgets.py runs
+the same pipeline and fails when an operation goes over its budget.
+
+To run:
+    python -m benchmarks.pipeline_benchmark [num_documents] [pages_per_document]
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, Optional
+from benchmarks.fakes import FakeModels
+from benchmarks.pdf_factory import make_corpus
+from src.agent import IntelligentFormAgent
+from src.ingest import DocumentIngester
+from src.utils import print_separator
+
+
+QUESTIONS = [
+    "What is the total of invoice INV-0001?",
+    "What is the date of invoice INV-0002?",
+    "Who issued invoice INV-0003?",
+    "Which items are on invoice INV-0004?",
+    "What is the total amount?",
+]
+
+ANALYSIS_QUESTION = "Which vendors issued invoices, and what are their totals?"
+
+
+class PipelineRun:
+    """
+    Per-operation measurements of one pipeline run
+    """
+
+    def __init__(self, models: FakeModels, trace_memory: bool = False):
+        self.models = models
+        self.trace_memory = trace_memory
+        self.results: Dict[str, dict] = {}
+
+    @contextlib.contextmanager
+    def measure(self, name: str, agent: Optional[IntelligentFormAgent] = None, repeat: int = 1):
+        """
+        Measure a block; counts and time are divided by repeat, the peak is not
+        """
+        before = self.models.calls()
+        searches = _searches(agent)
+        if self.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak = 0
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+            after = self.models.calls()
+            result = {key: (after[key] - before[key]) / repeat for key in after}
+            result["searches"] = (_searches(agent) - searches) / repeat
+            result["seconds"] = seconds / repeat
+            result["peak_mb"] = peak / 2 ** 20
+            self.results[name] = result
+
+
+def _searches(agent: Optional[IntelligentFormAgent]) -> int:
+    if agent is None:
+        return 0
+    return sum(stats["queries"] for stats in agent.collection_stats())
+
+
+def run_pipeline(
+    data_dir: str,
+    work_dir: str,
+    models: FakeModels,
+    trace_memory: bool = False
+) -> Dict[str, dict]:
+    """
+    Ingest a directory, build the agent and run every kind of query
+
+    Args:
+        data_dir: Directory of PDFs
+        work_dir: Scratch directory for caches and the snapshot (created if missing)
+        models: Fake models, already installed
+        trace_memory: Record peak_mb with tracemalloc (slows the run down)
+
+    Returns:
+        Dict of operation -> measurements; per-query operations are per call
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    run = PipelineRun(models, trace_memory)
+    ingester = DocumentIngester(
+        ocr_cache_dir=os.path.join(work_dir, "ocr_cache"),
+        page_cache_path=os.path.join(work_dir, "page_cache.db")
+    )
+
+    with run.measure("ingest"):
+        chunks = ingester.process_directory(data_dir)
+
+    with run.measure("build_index"):
+        agent = IntelligentFormAgent(chunks)
+    run.results["build_index"]["chunks"] = len(chunks)
+
+    with run.measure("ask_question", agent, repeat=len(QUESTIONS)):
+        for question in QUESTIONS:
+            agent.ask_question(question)
+
+    # The same questions again are served from the query cache
+    with run.measure("ask_question_cached", agent, repeat=len(QUESTIONS)):
+        for question in QUESTIONS:
+            agent.ask_question(question)
+
+    with run.measure("holistic_analysis", agent):
+        agent.holistic_analysis(ANALYSIS_QUESTION)
+
+    with run.measure("summarize_document", agent):
+        agent.summarize_document("invoice_0001")
+
+    with run.measure("aggregate", agent):
+        agent.aggregate("total", group_by="vendor")
+
+    snapshot = os.path.join(work_dir, "snapshot")
+    with run.measure("save_snapshot", agent):
+        agent.save_snapshot(snapshot)
+
+    with run.measure("from_snapshot"):
+        restored = IntelligentFormAgent.from_snapshot(snapshot)
+
+    # Parsing again is served from the page cache; a new ingester with the
+    # default settings, so hashing and MinHash are still paid for
+    reingester = DocumentIngester(
+        ocr_cache_dir=os.path.join(work_dir, "ocr_cache"),
+        page_cache_path=os.path.join(work_dir, "page_cache.db")
+    )
+    with run.measure("reingest_cached"):
+        reingester.process_directory(data_dir)
+    run.results["reingest_cached"]["pages"] = reingester.metrics.pages
+    run.results["reingest_cached"]["cached_pages"] = reingester.metrics.cached_pages
+
+    agent.close()
+    restored.close()
+    return run.results
+
+
+def main():
+    """Run the benchmark and print a table"""
+    num_documents = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    pages_per_document = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        data_dir = os.path.join(work_dir, "data")
+        make_corpus(data_dir, num_documents, pages_per_document)
+
+        runs = []
+        for trace_memory in (False, True):
+            run_dir = os.path.join(work_dir, "traced" if trace_memory else "timed")
+            with FakeModels().installed() as models, contextlib.redirect_stdout(io.StringIO()):
+                runs.append(run_pipeline(data_dir, run_dir, models, trace_memory))
+
+        # Times from the untraced run, peaks from the traced one
+        results, traced = runs
+        for name, result in results.items():
+            result["peak_mb"] = traced[name]["peak_mb"]
+
+    print_separator(f"Pipeline Benchmark ({num_documents} documents x {pages_per_document} pages, "
+                    f"{results['build_index']['chunks']} chunks)")
+    print(f"{'operation':<22}{'seconds':>9}{'peak MB':>9}{'embed docs':>12}"
+          f"{'embed query':>13}{'LLM':>6}{'searches':>10}")
+    for name, r in results.items():
+        print(f"{name:<22}{r['seconds']:>9.3f}{r['peak_mb']:>9.1f}{r['embed_documents']:>12.0f}"
+              f"{r['embed_query']:>13.1f}{r['llm']:>6.1f}{r['searches']:>10.1f}")
+    print("\nPer-query operations are averaged per call.")
+
+
+if __name__ == "__main__":
+    main()
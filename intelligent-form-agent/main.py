@@ -3,11 +3,17 @@ Intelligent Form Agent - Main Entry Point
 Run this file to start the agent
 """
 
+import argparse
 import os
 import sys
+import threading
+from typing import Iterator, List, Optional
+from langchain.schema import Document
 from src.ingest import DocumentIngester
 from src.agent import IntelligentFormAgent
-from src.utils import print_separator
+from src.results import DocumentFields
+from src.profiling import Profiler, add_profile_argument, profiled
+from src.utils import print_separator, format_timings, format_cache_stats
 
 
 def print_welcome():
@@ -20,6 +26,7 @@ def print_welcome():
     print("  1. Answer questions about your documents")
     print("  2. Summarize documents")
     print("  3. Analyze multiple documents together")
+    print("  4. Compare documents and total their amounts")
     print()
 
 
@@ -31,19 +38,55 @@ def print_menu():
     print("  1. Ask a question about a specific document")
     print("  2. Summarize a document")
     print("  3. Perform holistic analysis (multiple documents)")
-    print("  4. List all loaded documents")
-    print("  5. Exit")
+    print("  4. Compare documents")
+    print("  5. Total a field across documents")
+    print("  6. List all loaded documents")
+    print("  7. Exit")
     print("-"*60)
 
 
-def main():
-    """Main function to run the agent"""
-    
-    # Print welcome
-    print_welcome()
-    
-    # Define data directory
-    data_dir = os.path.join(os.path.dirname(__file__), "data")
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Intelligent Form Agent")
+    parser.add_argument(
+        "--snapshot",
+        metavar="DIR",
+        help="start from a saved snapshot instead of ingesting data/"
+    )
+    parser.add_argument(
+        "--save-snapshot",
+        metavar="DIR",
+        help="after ingesting, save a snapshot other processes can start from"
+    )
+    parser.add_argument(
+        "--precompute",
+        action="store_true",
+        help="generate summaries and key facts for every document in the background"
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        metavar="N",
+        help="spread documents over N vector collections, searched in parallel"
+    )
+    parser.add_argument(
+        "--lazy",
+        action="store_true",
+        help="start answering after the first pages are indexed; parse and index the rest in the background"
+    )
+    add_profile_argument(parser)
+    return parser.parse_args()
+
+
+def build_agent(
+    data_dir: str,
+    save_snapshot: Optional[str] = None,
+    num_shards: int = 1,
+    profiler: Optional[Profiler] = None,
+    lazy: bool = False
+) -> IntelligentFormAgent:
+    """Ingest the data directory and build the agent"""
     
     # Check if data directory exists
     if not os.path.exists(data_dir):
@@ -60,8 +103,17 @@ def main():
     
     # Load and process documents
     print_separator("Step 1: Loading Documents")
+    profiler = profiler or Profiler(enabled=False)
     ingester = DocumentIngester(chunk_size=1000, chunk_overlap=200)
-    chunks = ingester.process_directory(data_dir)
+    
+    # A snapshot needs every chunk, so it is never built lazily. Lazily, a
+    # file is only precomputed once its last batch is indexed; the agent is
+    # created before any file finishes, so it is looked up at that point
+    batches = ingester.iter_chunks(
+        data_dir, on_file_done=lambda source: agent.document_complete(source)
+    ) if lazy and not save_snapshot else None
+    with profiler.stage("ingest"):
+        chunks = next(batches, []) if batches else ingester.process_directory(data_dir)
     
     if not chunks:
         print("Failed to load documents. Exiting.")
@@ -70,7 +122,8 @@ def main():
     # Initialize agent
     print_separator("Step 2: Initializing AI Agent")
     try:
-        agent = IntelligentFormAgent(chunks)
+        with profiler.stage("build_index"):
+            agent = IntelligentFormAgent(chunks, num_shards=num_shards, complete=not batches)
     except ValueError as e:
         print(f"\nError: {e}")
         sys.exit(1)
@@ -78,19 +131,91 @@ def main():
         print(f"\nUnexpected error: {e}")
         sys.exit(1)
     
+    if save_snapshot:
+        with profiler.stage("save_snapshot"):
+            agent.save_snapshot(save_snapshot, ingest_params={
+                "chunk_size": ingester.chunk_size,
+                "chunk_overlap": ingester.chunk_overlap,
+                "chunking_strategy": ingester.chunking_strategy,
+            })
+    
+    if batches:
+        threading.Thread(
+            target=index_in_background, args=(agent, batches), name="lazy-ingest", daemon=True
+        ).start()
+        print("  ↷ Indexing the remaining pages in the background")
+    
+    return agent
+
+
+def index_in_background(agent: IntelligentFormAgent, batches: Iterator[List[Document]]):
+    """Parse and add the remaining batches of chunks to a running agent"""
+    added = 0
+    for chunks in batches:
+        added += len(agent.add_chunks(chunks, complete=False))
+    print(f"\n  ✓ Background indexing finished ({added} more chunks)")
+
+
+def print_progress(done: int, total: int, document: DocumentFields):
+    """Print one line per document as a comparison or total runs"""
+    status = f"✗ {document.error}" if document.error else ", ".join(
+        f"{field}={value}" for field, value in document.values.items()
+    )
+    print(f"  [{done}/{total}] {os.path.basename(document.source)}: {status}")
+
+
+def main():
+    """Main function to run the agent"""
+    args = parse_args()
+    
+    # With --profile, the whole session is sampled and a summary is
+    # printed at exit
+    with profiled(args.profile) as profiler:
+        run(args, profiler)
+
+
+def run(args, profiler: Profiler):
+    """Build or restore the agent and run the interactive loop"""
+    
+    # Print welcome
+    print_welcome()
+    
+    if args.snapshot:
+        # Query node: serve a snapshot built elsewhere
+        try:
+            with profiler.stage("load_snapshot"):
+                agent = IntelligentFormAgent.from_snapshot(args.snapshot, num_shards=args.shards)
+        except (OSError, ValueError) as e:
+            print(f"\nError loading snapshot: {e}")
+            sys.exit(1)
+    else:
+        # Define data directory
+        data_dir = os.path.join(os.path.dirname(__file__), "data")
+        agent = build_agent(data_dir, args.save_snapshot, args.shards, profiler, args.lazy)
+    
+    if args.precompute:
+        agent.enable_precompute()
+    
+    # Every agent call becomes a stage of the profile
+    profiler.instrument(
+        agent, "ask_question", "summarize_document", "holistic_analysis",
+        "compare_documents", "aggregate", "list_documents"
+    )
+    
     # Main interaction loop
     print_separator("Step 3: Ready to Answer Questions!")
     
     while True:
         print_menu()
-        choice = input("\nEnter your choice (1-5): ").strip()
+        choice = input("\nEnter your choice (1-7): ").strip()
         
         if choice == "1":
             # Ask a question
             print("\n" + "="*60)
             question = input("Enter your question: ").strip()
             if question:
-                agent.ask_question(question, show_sources=True)
+                result = agent.ask_question(question, show_sources=True)
+                print(f"\n({format_timings(result.timings)})")
             else:
                 print("Please enter a valid question.")
         
@@ -101,6 +226,8 @@ def main():
             doc_name = input("> ").strip()
             if doc_name:
                 agent.summarize_document(doc_name)
+                for field, value in agent.get_key_facts(doc_name).items():
+                    print(f"  {field}: {value}")
             else:
                 agent.summarize_document()
         
@@ -109,23 +236,47 @@ def main():
             print("\n" + "="*60)
             question = input("Enter your analysis question: ").strip()
             if question:
-                agent.holistic_analysis(question)
+                result = agent.holistic_analysis(question)
+                print(f"\n({format_timings(result.timings)})")
             else:
                 print("Please enter a valid question.")
         
         elif choice == "4":
+            # Compare documents
+            print("\n" + "="*60)
+            print("Enter document names to compare, separated by commas:")
+            names = [name.strip() for name in input("> ").split(",") if name.strip()]
+            if names:
+                result = agent.compare_documents(names, on_progress=print_progress)
+                print(f"\n{result.table}")
+                print(f"\n({format_timings(result.timings)}, {result.llm_calls} LLM call(s))")
+            else:
+                print("Please enter at least one document name.")
+        
+        elif choice == "5":
+            # Aggregate across documents
+            print("\n" + "="*60)
+            value_field = input("Field to total (press Enter for total): ").strip() or "total"
+            group_by = input("Group by (press Enter for vendor): ").strip() or "vendor"
+            result = agent.aggregate(value_field, group_by, on_progress=print_progress)
+            print(f"\n{result.table}")
+            print(f"\n({format_timings(result.timings)}, {result.llm_calls} LLM call(s))")
+        
+        elif choice == "6":
             # List documents
             agent.list_documents()
         
-        elif choice == "5":
+        elif choice == "7":
             # Exit
+            print(f"\nQuery cache: {format_cache_stats(agent.cache_stats())}")
+            agent.collections.report()
             print("\n" + "="*60)
             print("Thank you for using Intelligent Form Agent!")
             print("="*60 + "\n")
             break
         
         else:
-            print("\nInvalid choice. Please enter a number between 1 and 5.")
+            print("\nInvalid choice. Please enter a number between 1 and 7.")
 
 
 if __name__ == "__main__":
@@ -3,14 +3,64 @@ Intelligent Form Agent - Main AI Logic
 Handles QA, Summarization, and Multi-Document Analysis
 """
 
-from typing import List, Optional
+import functools
+import os
+import threading
+import time
+from collections import Counter
+from dataclasses import asdict
+from typing import Callable, Dict, Iterator, List, Optional, Set
+import numpy as np
 from langchain.schema import Document
-from langchain.vectorstores import Chroma
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.llms import Ollama
-from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
-from src.utils import print_separator, format_documents_for_display
+from src.cache import QueryCache
+from src.chunk_store import ChunkStore
+from src.collection_manager import CHROMA_BATCH_SIZE, CollectionManager, SnapshotIndex
+from src.cross_document import FieldExtractor, comparison_table, group_totals
+from src.precompute import (
+    KEY_FIELD_QUESTIONS, SUMMARY, PrecomputeScheduler, PrecomputeStore, document_key, stream_text
+)
+from src.results import CrossDocumentResult, DocumentFields, QueryResult, SourceChunk
+from src.retrieval import RetrievalDepth, select_depth
+from src.snapshot import read_snapshot, write_snapshot
+from src.utils import print_separator, format_documents_for_display, estimate_tokens
+
+
+# Models and retrieval settings; saved with snapshots
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+LLM_MODEL = "mistral"
+LLM_TEMPERATURE = 0.3
+
+# Adaptive retrieval depth: single-document lookups rarely need more than
+# one or two chunks, cross-document analysis needs several
+QA_DEPTH = RetrievalDepth(min_k=1, max_k=6, max_context_tokens=1500)
+ANALYSIS_DEPTH = RetrievalDepth(min_k=3, max_k=12, max_context_tokens=3000)
+
+# Collections per agent; raise to spread a large corpus over several
+NUM_SHARDS = 1
+
+
+def interactive_request(method):
+    """
+    Mark an agent method as interactive, so background precompute jobs
+    wait until it has finished
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.scheduler is None:
+            return method(self, *args, **kwargs)
+        with self.scheduler.interactive():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _sources_of(chunks: List[Document]) -> List[str]:
+    """
+    Get the distinct sources of a list of chunks, in order of appearance
+    """
+    return list(dict.fromkeys(chunk.metadata.get("source", "Unknown") for chunk in chunks))
 
 
 class IntelligentFormAgent:
@@ -18,55 +68,244 @@ class IntelligentFormAgent:
     Main agent that can answer questions and summarize documents
     """
     
-    def __init__(self, chunks: List[Document]):
+    def __init__(self, chunks: List[Document], tenant: str = "default", num_shards: int = NUM_SHARDS,
+                 complete: bool = True):
         """
         Initialize the agent with document chunks
         
         Args:
             chunks: List of document chunks from the ingester
+            tenant: Name of the tenant or corpus; every agent gets its own
+                collections, named after it
+            num_shards: Number of collections to spread documents over
+            complete: False when the chunks are a first batch and more of
+                their documents are still to come (see add_chunks())
         """
         print_separator("Initializing Intelligent Form Agent")
         
-        # Store chunks
-        self.chunks = chunks
+        # Store chunks compactly; the text is kept once, on disk, and
+        # fetched by chunk ID when needed - the vector store holds none
+        self.chunks = ChunkStore()
+        chunk_ids = self.chunks.add(chunks)
         
-        # Initialize embeddings (using free HuggingFace embeddings)
-        print("Loading embeddings model...")
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
-        print("  ✓ Embeddings loaded")
+        self._load_embeddings()
         
         # Create vector store
         print("Creating vector database...")
-        self.vector_store = Chroma.from_documents(
-            documents=chunks,
-            embedding=self.embeddings,
-            collection_name="form_documents"
+        self.collections = CollectionManager(self.embeddings, tenant=tenant, num_shards=num_shards)
+        self._embed(chunk_ids)
+        print(f"  ✓ Vector database created ({num_shards} collection(s) for '{tenant}')")
+        
+        self._finish_setup()
+        if not complete:
+            self.incomplete_sources.update(_sources_of(chunks))
+    
+    def add_chunks(self, chunks: List[Document], complete: bool = True) -> List[int]:
+        """
+        Add newly ingested chunks to a running agent, embedding only them
+        
+        Args:
+            chunks: New document chunks from the ingester
+            complete: False when more chunks of the same documents are still
+                to come, e.g. one batch of pages from iter_chunks(); their
+                summaries and key fields then wait for document_complete()
+            
+        Returns:
+            List of the new chunk IDs
+        """
+        if not chunks:
+            return []
+        
+        chunk_ids = self.chunks.add(chunks)
+        embedded = self._embed(chunk_ids)
+        print(f"  ✓ Added {len(chunk_ids)} chunks ({embedded} embedded, "
+              f"{len(chunk_ids) - embedded} linked to existing ones)")
+        
+        for source in _sources_of(chunks):
+            if complete:
+                self.document_complete(source)
+            else:
+                self.incomplete_sources.add(source)
+        
+        return chunk_ids
+    
+    def document_complete(self, source: str):
+        """
+        Mark a document as fully ingested, so its summary and key fields can
+        be precomputed
+        
+        Args:
+            source: Source path the document's chunks were ingested under
+        """
+        with self._precompute_lock:
+            self.incomplete_sources.discard(source)
+            if self.scheduler is not None and source in self.chunks.sources():
+                self._schedule_precompute(source)
+    
+    def remove_document(self, source: str) -> int:
+        """
+        Remove a document from a running agent, e.g. before adding a changed
+        version of it under the same name
+        
+        Chunks of other documents that were linked to its chunks are
+        embedded in their place, so they stay searchable.
+        
+        Args:
+            source: Source path or name the document was ingested under
+            
+        Returns:
+            int: Number of the document's chunks removed from the index
+        """
+        removed, promoted = self.chunks.remove(source)
+        self.collections.delete([str(chunk_id) for chunk_id in removed])
+        embedded = self._embed(promoted)
+        if removed:
+            print(f"  ✓ Removed {os.path.basename(source)} ({len(removed)} chunks"
+                  + (f", {embedded} linked chunks re-embedded" if embedded else "") + ")")
+        return len(removed)
+    
+    def _embed(self, chunk_ids: List[int]) -> int:
+        """
+        Embed and index stored chunks, except those linked at ingest to
+        text that is already indexed
+        
+        Returns:
+            int: Number of chunks embedded
+        """
+        chunk_ids = [chunk_id for chunk_id in chunk_ids if not self.chunks.is_linked(chunk_id)]
+        self.collections.add_texts(
+            texts=[self.chunks.text(chunk_id) for chunk_id in chunk_ids],
+            metadatas=[self.chunks.metadata(chunk_id) for chunk_id in chunk_ids],
+            ids=[str(chunk_id) for chunk_id in chunk_ids]
+        )
+        return len(chunk_ids)
+    
+    @classmethod
+    def from_snapshot(
+        cls,
+        path: str,
+        tenant: str = "default",
+        num_shards: int = NUM_SHARDS
+    ) -> "IntelligentFormAgent":
+        """
+        Start an agent from a snapshot instead of re-ingesting
+        
+        Chunk text and vectors are memory-mapped from the snapshot and
+        searched in place: nothing is re-embedded or re-indexed, so startup
+        does not grow with the corpus and every process serving the
+        snapshot shares one copy. The agent serves the snapshot read-only.
+        
+        Args:
+            path: Snapshot directory written by save_snapshot()
+            tenant: Name of the tenant or corpus, used in shard names
+            num_shards: Number of row ranges searched in parallel
+            
+        Returns:
+            IntelligentFormAgent: The restored agent
+        """
+        print_separator("Restoring Intelligent Form Agent")
+        
+        agent = cls.__new__(cls)
+        
+        print(f"Loading snapshot: {path}")
+        manifest, agent.chunks, vectors, norms = read_snapshot(
+            path, expected_params={"embedding_model": EMBEDDING_MODEL}
         )
-        print("  ✓ Vector database created")
+        print(f"  ✓ {manifest['num_chunks']} chunks from {manifest['num_documents']} document(s)")
+        
+        agent._load_embeddings()
         
+        # Search the saved vectors where they are, instead of rebuilding an index
+        agent.collections = SnapshotIndex(vectors, norms, agent.chunks, tenant=tenant, num_shards=num_shards)
+        print(f"  ✓ Vector index mapped ({num_shards} shard(s) for '{tenant}')")
+        
+        agent._finish_setup()
+        return agent
+    
+    def save_snapshot(self, path: str, ingest_params: Optional[dict] = None):
+        """
+        Save chunks, vectors and parameters so other processes can start
+        from them with from_snapshot()
+        
+        Args:
+            path: Snapshot directory to write
+            ingest_params: Optional ingester settings to record, e.g.
+                chunk_size and chunking_strategy
+        """
+        print_separator(f"Saving Snapshot: {path}")
+        
+        # Read the vectors back from the index, in chunk ID order; linked
+        # chunks have none and keep a zero row
+        vectors = None
+        for start in range(0, len(self.chunks), CHROMA_BATCH_SIZE):
+            ids = [str(i) for i in range(start, min(start + CHROMA_BATCH_SIZE, len(self.chunks)))]
+            batch = self.collections.get_vectors(ids)
+            if vectors is None and batch:
+                vectors = np.zeros((len(self.chunks), len(next(iter(batch.values())))), dtype=np.float32)
+            for chunk_id, embedding in batch.items():
+                vectors[int(chunk_id)] = embedding
+        if vectors is None:
+            vectors = np.zeros((len(self.chunks), 0), dtype=np.float32)
+        
+        params = {
+            "embedding_model": EMBEDDING_MODEL,
+            "llm_model": LLM_MODEL,
+            "llm_temperature": LLM_TEMPERATURE,
+            "qa_depth": asdict(self.qa_depth),
+            "analysis_depth": asdict(self.analysis_depth),
+            "ingest": ingest_params or {},
+        }
+        write_snapshot(path, self.chunks, vectors, params)
+        
+        print(f"  ✓ Saved {len(self.chunks)} chunks and vectors")
+    
+    def _load_embeddings(self):
+        """
+        Load the embeddings model
+        """
+        # Initialize embeddings (using free HuggingFace embeddings)
+        print("Loading embeddings model...")
+        self.embeddings = HuggingFaceEmbeddings(
+            model_name=EMBEDDING_MODEL
+        )
+        print("  ✓ Embeddings loaded")
+    
+    def _finish_setup(self):
+        """
+        Connect the LLM and build the caches and QA prompt on top of the
+        vector store
+        """
         # Initialize LLM (using local Ollama - no API costs or quotas)
         print("Connecting to Local AI (Ollama)...")
         self.llm = Ollama(
-            model="mistral",
-            temperature=0.3
+            model=LLM_MODEL,
+            temperature=LLM_TEMPERATURE
         )
         print("  ✓ AI model ready")
         
-        # Create retriever
-        self.retriever = self.vector_store.as_retriever(
-            search_kwargs={"k": 4}  # Return top 4 relevant chunks
-        )
+        # Query embeddings and search results, reused across requests;
+        # writes to the collections invalidate the search results
+        self.query_cache = QueryCache(self.collections)
+        
+        # How many chunks each kind of query may use
+        self.qa_depth = QA_DEPTH
+        self.analysis_depth = ANALYSIS_DEPTH
         
-        # Setup QA chain
-        self._setup_qa_chain()
+        # Setup QA prompt
+        self._setup_qa_prompt()
+        
+        # Background precomputation is off until enable_precompute(), and
+        # never starts on a document that is still being ingested
+        self.precompute_store = None
+        self.scheduler = None
+        self.incomplete_sources: Set[str] = set()
+        self._precompute_lock = threading.Lock()
         
         print("\n✓ Agent initialized successfully!")
     
-    def _setup_qa_chain(self):
+    def _setup_qa_prompt(self):
         """
-        Setup the Question-Answering chain with custom prompt
+        Setup the Question-Answering prompt
         """
         # Custom prompt template for better answers
         qa_template = """You are an intelligent assistant helping users understand form documents like invoices, receipts, and tax forms.
@@ -80,52 +319,172 @@ Question: {question}
 
 Answer (be specific and cite values when possible):"""
 
-        QA_PROMPT = PromptTemplate(
+        # Retrieval is done by the agent itself (see _retrieve), so the
+        # retrieved chunks can be returned to the caller and reused
+        self.qa_prompt = PromptTemplate(
             template=qa_template,
             input_variables=["context", "question"]
         )
+    
+    def _retrieve(
+        self,
+        question: str,
+        timings: dict,
+        depth: RetrievalDepth,
+        where: Optional[dict] = None
+    ) -> List[SourceChunk]:
+        """
+        Embed a question once, fetch the closest chunks with their scores
+        and keep as many as the scores and token budget justify
         
-        # Create the QA chain
-        self.qa_chain = RetrievalQA.from_chain_type(
-            llm=self.llm,
-            chain_type="stuff",
-            retriever=self.retriever,
-            return_source_documents=True,
-            chain_type_kwargs={"prompt": QA_PROMPT}
-        )
+        Both the embedding and the search results are cached; the search
+        cache is invalidated whenever the vector store changes.
+        
+        Args:
+            question: The question to retrieve for
+            timings: Dict to record embed and retrieve times in
+            depth: Limits on how many chunks to keep
+            where: Optional metadata filter, e.g. {"source": path}
+            
+        Returns:
+            List of SourceChunk, closest first
+        """
+        start = time.perf_counter()
+        question_key = self.query_cache.question_key(question)
+        query_embedding = self.query_cache.embeddings.get(question_key)
+        if query_embedding is None:
+            query_embedding = self.embeddings.embed_query(question)
+            self.query_cache.embeddings.put(question_key, query_embedding)
+        timings["embed"] = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        k = min(depth.max_k, len(self.chunks))
+        
+        # A duplicate's linked chunks are indexed only as the exact chunks
+        # they repeat; search those too, and report them as the duplicate's
+        routes, linked = None, {}
+        if where and isinstance(where.get("source"), str):
+            linked = self.chunks.linked_chunks(where["source"])
+            if linked:
+                routes = {where["source"]} | {
+                    self.chunks.metadata(chunk_id)["source"] for chunk_id in linked
+                }
+                where = {"$or": [where, {"chunk_id": {"$in": sorted(linked)}}]}
+        
+        retrieval_key = self.query_cache.retrieval_key(query_embedding, k, where)
+        cached = self.query_cache.get_retrieval(retrieval_key)
+        if cached is None:
+            cached = [
+                (linked.get(int(chunk_id), int(chunk_id)), score)
+                for chunk_id, score in self.collections.search(
+                    query_embedding, k=k, where=where, sources=routes
+                )
+            ]
+            self.query_cache.put_retrieval(retrieval_key, cached)
+        
+        # Hits are IDs; the text is read from the chunk store
+        candidates = [
+            SourceChunk(document=self.chunks.get(chunk_id), score=score)
+            for chunk_id, score in cached
+        ]
+        sources, reason = select_depth(candidates, depth)
+        timings["retrieve"] = time.perf_counter() - start
+        
+        print(f"Retrieved k={len(sources)} of {len(candidates)} candidates (stopped by {reason})")
+        return sources
     
-    def ask_question(self, question: str, show_sources: bool = False) -> str:
+    def cache_stats(self) -> dict:
+        """
+        Get hit rates of the query embedding and retrieval caches
+        
+        Returns:
+            dict: Stats per cache level, and the current index version
+        """
+        return self.query_cache.stats()
+    
+    def collection_stats(self) -> List[dict]:
+        """
+        Get size and search latency of each of the agent's collections
+        
+        Returns:
+            List of dicts with name, chunks, queries, p50_ms and p95_ms
+        """
+        return self.collections.stats()
+    
+    def close(self):
+        """
+        Stop background work, delete the agent's collections and release
+        the chunk store and precompute store
+        """
+        if self.scheduler is not None:
+            self.scheduler.shutdown()
+            self.scheduler = None
+        if self.precompute_store is not None:
+            self.precompute_store.close()
+            self.precompute_store = None
+        self.collections.drop()
+        self.chunks.close()
+    
+    def _log_prompt(self, prompt: str) -> int:
+        """
+        Log and return the estimated size of a prompt
+        """
+        prompt_tokens = estimate_tokens(prompt)
+        print(f"Prompt size: ~{prompt_tokens} tokens")
+        return prompt_tokens
+    
+    @interactive_request
+    def ask_question(self, question: str, show_sources: bool = False) -> QueryResult:
         """
         Answer a question about the documents
         
         Args:
             question: The question to answer
-            show_sources: Whether to show source documents
+            show_sources: Whether to print the source documents
             
         Returns:
-            str: The answer
+            QueryResult: The answer, the source chunks with scores, and
+                per-stage timings
         """
         print_separator(f"Question: {question}")
         
+        timings = {}
+        start = time.perf_counter()
+        
         try:
-            # Run the QA chain
-            result = self.qa_chain({"query": question})
+            sources = self._retrieve(question, timings, self.qa_depth)
+            
+            # Generate the answer from the retrieved chunks
+            prompt = self.qa_prompt.format(
+                context="\n\n".join([source.document.page_content for source in sources]),
+                question=question
+            )
+            prompt_tokens = self._log_prompt(prompt)
+            
+            generate_start = time.perf_counter()
+            answer = self.llm.predict(prompt)
+            timings["generate"] = time.perf_counter() - generate_start
+            timings["total"] = time.perf_counter() - start
             
-            answer = result["result"]
             print(f"Answer: {answer}")
             
             # Optionally show sources
-            if show_sources and "source_documents" in result:
+            if show_sources:
                 print("\n--- Sources Used ---")
-                print(format_documents_for_display(result["source_documents"]))
+                print(format_documents_for_display([source.document for source in sources]))
             
-            return answer
+            return QueryResult(
+                question=question, answer=answer, sources=sources, timings=timings,
+                k=len(sources), prompt_tokens=prompt_tokens
+            )
             
         except Exception as e:
             error_msg = f"Error answering question: {e}"
             print(error_msg)
-            return error_msg
+            timings["total"] = time.perf_counter() - start
+            return QueryResult(question=question, answer=error_msg, timings=timings, error=str(e))
     
+    @interactive_request
     def summarize_document(self, document_name: Optional[str] = None) -> str:
         """
         Generate a summary of a document or all documents
@@ -140,25 +499,55 @@ Answer (be specific and cite values when possible):"""
             print_separator(f"Summarizing: {document_name}")
             
             # Filter chunks for specific document
-            relevant_chunks = [
-                chunk for chunk in self.chunks 
-                if document_name.lower() in chunk.metadata.get('source', '').lower()
+            sources = self.chunks.find_sources(document_name)
+            relevant_ids = [
+                chunk_id
+                for source in sources
+                for chunk_id in self.chunks.chunk_ids(source)
             ]
             
-            if not relevant_chunks:
+            if not relevant_ids:
                 return f"No document found matching '{document_name}'"
             
+            # Serve a summary generated in the background, if there is one
+            if len(sources) == 1:
+                summary = self._precomputed(sources[0]).get(SUMMARY)
+                if summary:
+                    print(f"\nSummary (precomputed):\n{summary}")
+                    return summary
+            
             # Combine text from relevant chunks
-            combined_text = "\n\n".join([chunk.page_content for chunk in relevant_chunks[:5]])
+            combined_text = "\n\n".join([self.chunks.text(chunk_id) for chunk_id in relevant_ids[:5]])
             
         else:
             print_separator("Summarizing All Documents")
             
             # Use first few chunks from all documents
-            combined_text = "\n\n".join([chunk.page_content for chunk in self.chunks[:8]])
+            first_ids = range(min(len(self.chunks), 8))
+            combined_text = "\n\n".join([self.chunks.text(chunk_id) for chunk_id in first_ids])
         
-        # Create summary prompt
-        summary_prompt = f"""Please provide a concise summary of the following form document(s). 
+        try:
+            # Get summary from LLM
+            summary = self.llm.predict(self._summary_prompt(combined_text))
+            print(f"\nSummary:\n{summary}")
+            
+            # Keep it, so the next request for this document is instant
+            if document_name and len(sources) == 1 and self.precompute_store is not None:
+                key = document_key(sources[0], self._document_text(sources[0]))
+                self.precompute_store.put(key, SUMMARY, summary)
+            
+            return summary
+            
+        except Exception as e:
+            error_msg = f"Error generating summary: {e}"
+            print(error_msg)
+            return error_msg
+    
+    def _summary_prompt(self, combined_text: str) -> str:
+        """
+        Build the summary prompt for some document text
+        """
+        return f"""Please provide a concise summary of the following form document(s). 
 Include key information such as:
 - Document type
 - Important dates
@@ -170,19 +559,9 @@ Document content:
 {combined_text}
 
 Summary:"""
-        
-        try:
-            # Get summary from LLM
-            summary = self.llm.predict(summary_prompt)
-            print(f"\nSummary:\n{summary}")
-            return summary
-            
-        except Exception as e:
-            error_msg = f"Error generating summary: {e}"
-            print(error_msg)
-            return error_msg
     
-    def holistic_analysis(self, question: str) -> str:
+    @interactive_request
+    def holistic_analysis(self, question: str) -> QueryResult:
         """
         Perform analysis across multiple documents
         
@@ -190,18 +569,23 @@ Summary:"""
             question: Question requiring multi-document analysis
             
         Returns:
-            str: The analysis result
+            QueryResult: The analysis, the source chunks with scores, and
+                per-stage timings
         """
         print_separator(f"Holistic Analysis: {question}")
         
-        # Retrieve relevant chunks from all documents
-        relevant_docs = self.retriever.get_relevant_documents(question)
+        timings = {}
+        start = time.perf_counter()
         
-        # Combine context from multiple documents
-        combined_context = "\n\n".join([doc.page_content for doc in relevant_docs])
-        
-        # Create analysis prompt
-        analysis_prompt = f"""You are analyzing multiple form documents together to answer a comprehensive question.
+        try:
+            # Retrieve relevant chunks from all documents
+            sources = self._retrieve(question, timings, self.analysis_depth)
+            
+            # Combine context from multiple documents
+            combined_context = "\n\n".join([source.document.page_content for source in sources])
+            
+            # Create analysis prompt
+            analysis_prompt = f"""You are analyzing multiple form documents together to answer a comprehensive question.
 
 Context from multiple documents:
 {combined_context}
@@ -211,17 +595,298 @@ Question: {question}
 Provide a detailed answer that synthesizes information across all documents. Include specific values and calculations if needed.
 
 Answer:"""
-        
-        try:
+            prompt_tokens = self._log_prompt(analysis_prompt)
+            
             # Get analysis from LLM
+            generate_start = time.perf_counter()
             analysis = self.llm.predict(analysis_prompt)
+            timings["generate"] = time.perf_counter() - generate_start
+            timings["total"] = time.perf_counter() - start
+            
             print(f"\nAnalysis:\n{analysis}")
-            return analysis
+            return QueryResult(
+                question=question, answer=analysis, sources=sources, timings=timings,
+                k=len(sources), prompt_tokens=prompt_tokens
+            )
             
         except Exception as e:
             error_msg = f"Error performing analysis: {e}"
             print(error_msg)
-            return error_msg
+            timings["total"] = time.perf_counter() - start
+            return QueryResult(question=question, answer=error_msg, timings=timings, error=str(e))
+    
+    def _resolve_sources(self, document_names: Optional[List[str]]) -> List[str]:
+        """
+        Match document names to sources, in order, without duplicates
+        """
+        if document_names is None:
+            return sorted(self.chunks.sources())
+        
+        sources = []
+        for name in document_names:
+            matches = self.chunks.find_sources(name)
+            if not matches:
+                print(f"  ⚠ No document found matching '{name}'")
+            sources += [source for source in matches if source not in sources]
+        return sources
+    
+    def iter_document_fields(
+        self,
+        document_names: Optional[List[str]] = None,
+        fields: Optional[List[str]] = None,
+        extractor: Optional[FieldExtractor] = None
+    ) -> Iterator[DocumentFields]:
+        """
+        Look up fields in many documents, yielding each document as soon as
+        its fields are known
+        
+        Fields come from labelled lines such as "Total: $1,250.00", or from
+        precomputed answers that reduce to a bare value, where possible;
+        only the rest are asked of the LLM, LLM_CONCURRENCY at a time.
+        
+        Args:
+            document_names: Names to match, e.g. ["invoice_001"] (default: all documents)
+            fields: Fields to look up (default: the precomputed key fields)
+            extractor: FieldExtractor to run on, e.g. to read its llm_calls
+            
+        Yields:
+            DocumentFields, in completion order
+        """
+        extractor = extractor or FieldExtractor(self)
+        yield from extractor.iter_fields(self._resolve_sources(document_names), self._field_questions(fields))
+    
+    def _field_questions(self, fields: Optional[List[str]]) -> Dict[str, str]:
+        """
+        Get the question asked of the LLM for each field, when it is needed
+        """
+        return {
+            field: KEY_FIELD_QUESTIONS.get(field, f"What is the {field.replace('_', ' ')}?")
+            for field in (fields or KEY_FIELD_QUESTIONS)
+        }
+    
+    def _collect_fields(
+        self,
+        document_names: Optional[List[str]],
+        fields: List[str],
+        on_progress: Optional[Callable[[int, int, DocumentFields], None]],
+        extractor: FieldExtractor
+    ) -> List[DocumentFields]:
+        """
+        Run iter_document_fields() to the end, reporting each document
+        """
+        sources = self._resolve_sources(document_names)
+        documents = []
+        for document in extractor.iter_fields(sources, self._field_questions(fields)):
+            documents.append(document)
+            if on_progress is not None:
+                on_progress(len(documents), len(sources), document)
+        
+        # Completion order varies between runs; the table should not
+        documents.sort(key=lambda document: document.source)
+        methods = Counter(method for document in documents for method in document.methods.values())
+        print(f"  ✓ Fields of {len(documents)} document(s): "
+              + ", ".join(f"{count} {method}" for method, count in methods.most_common()))
+        return documents
+    
+    def _narrate(self, result: CrossDocumentResult, prompt: str, extractor: FieldExtractor, start: float):
+        """
+        Make the single LLM call that turns joined values into an answer
+        """
+        self._log_prompt(prompt)
+        generate_start = time.perf_counter()
+        try:
+            result.answer = self.llm.predict(prompt)
+            result.llm_calls = extractor.llm_calls + 1
+        except Exception as e:
+            # The joined values are still worth returning
+            print(f"Error generating narrative: {e}")
+            result.answer = result.table
+            result.llm_calls = extractor.llm_calls
+            result.error = str(e)
+        result.timings["generate"] = time.perf_counter() - generate_start
+        result.timings["total"] = time.perf_counter() - start
+        print(f"\n{result.answer}")
+        return result
+    
+    @interactive_request
+    def compare_documents(
+        self,
+        document_names: List[str],
+        fields: Optional[List[str]] = None,
+        on_progress: Optional[Callable[[int, int, DocumentFields], None]] = None
+    ) -> CrossDocumentResult:
+        """
+        Compare fields across documents
+        
+        Values are looked up per document in parallel and joined into a
+        table; the LLM is called once, on the table, for the comparison.
+        
+        Args:
+            document_names: Names of the documents to compare
+            fields: Fields to compare (default: the precomputed key fields)
+            on_progress: Called as (done, total, DocumentFields) as each
+                document finishes
+            
+        Returns:
+            CrossDocumentResult: The comparison, per-document values and timings
+        """
+        fields = list(fields or KEY_FIELD_QUESTIONS)
+        question = f"Compare {', '.join(document_names)}"
+        print_separator(question)
+        
+        start = time.perf_counter()
+        extractor = FieldExtractor(self)
+        documents = self._collect_fields(document_names, fields, on_progress, extractor)
+        table = comparison_table(documents, fields)
+        result = CrossDocumentResult(
+            question=question, answer="", documents=documents, table=table,
+            timings={"extract": time.perf_counter() - start}
+        )
+        
+        prompt = f"""You are comparing form documents. These values were extracted from each document:
+
+{table}
+
+Describe the notable differences and similarities between the documents. Use only the values above.
+
+Comparison:"""
+        return self._narrate(result, prompt, extractor, start)
+    
+    @interactive_request
+    def aggregate(
+        self,
+        value_field: str = "total",
+        group_by: str = "vendor",
+        document_names: Optional[List[str]] = None,
+        on_progress: Optional[Callable[[int, int, DocumentFields], None]] = None
+    ) -> CrossDocumentResult:
+        """
+        Sum a field across documents, grouped by another field
+        
+        The sums are computed in Python from per-document values, so they
+        are exact however many documents there are; the LLM is called once
+        to describe them.
+        
+        Args:
+            value_field: Numeric field to sum (default: total)
+            group_by: Field to group on (default: vendor)
+            document_names: Names to match (default: all documents)
+            on_progress: Called as (done, total, DocumentFields) as each
+                document finishes
+            
+        Returns:
+            CrossDocumentResult: The description, the groups with their sum
+                and count, per-document values and timings
+        """
+        question = f"Sum of {value_field} by {group_by}"
+        print_separator(question)
+        
+        start = time.perf_counter()
+        extractor = FieldExtractor(self)
+        documents = self._collect_fields(document_names, [group_by, value_field], on_progress, extractor)
+        groups, skipped = group_totals(documents, value_field, group_by)
+        
+        rows = [f"{group_by} | {value_field} | documents"]
+        rows += [f"{group} | {values['sum']:.2f} | {values['count']}" for group, values in groups.items()]
+        rows.append(f"all | {sum(values['sum'] for values in groups.values()):.2f} | "
+                    f"{sum(values['count'] for values in groups.values())}")
+        if skipped:
+            rows.append(f"(no {value_field} found in: {', '.join(skipped)})")
+        result = CrossDocumentResult(
+            question=question, answer="", documents=documents, table="\n".join(rows),
+            groups=groups, timings={"extract": time.perf_counter() - start}
+        )
+        
+        prompt = f"""You are reporting on {len(documents)} form documents. These totals were computed exactly from the documents:
+
+{result.table}
+
+Describe what the totals show. Quote the numbers as given; do not recalculate them.
+
+Report:"""
+        return self._narrate(result, prompt, extractor, start)
+    
+    def enable_precompute(self, store_path: str = ".precompute.db"):
+        """
+        Start generating summaries and key facts for every document in the
+        background, at low priority
+        
+        Interactive requests always go first; results are kept in a
+        persistent store and served by summarize_document() and
+        get_key_facts().
+        
+        Args:
+            store_path: SQLite file for precomputed results
+        """
+        with self._precompute_lock:
+            if self.scheduler is not None:
+                return
+            
+            self.precompute_store = PrecomputeStore(store_path)
+            self.scheduler = PrecomputeScheduler(self.precompute_store)
+            
+            # Documents still being ingested are queued by document_complete()
+            for source in self.chunks.sources():
+                if source not in self.incomplete_sources:
+                    self._schedule_precompute(source)
+        
+        print(f"  ✓ Precomputing {self.scheduler.pending()} result(s) in the background")
+    
+    def get_key_facts(self, document_name: str) -> Dict[str, str]:
+        """
+        Get the precomputed key fields of a document
+        
+        Args:
+            document_name: Name of the document, e.g. "invoice_001"
+            
+        Returns:
+            Dict of field -> answer; empty if the name matches no single
+            document or nothing has been precomputed yet
+        """
+        sources = self.chunks.find_sources(document_name)
+        if len(sources) != 1:
+            return {}
+        
+        facts = self._precomputed(sources[0])
+        facts.pop(SUMMARY, None)
+        return facts
+    
+    def _document_text(self, source: str, max_chunks: Optional[int] = None) -> str:
+        """
+        Join the text of a document's chunks
+        """
+        chunk_ids = self.chunks.chunk_ids(source)[:max_chunks]
+        return "\n\n".join([self.chunks.text(chunk_id) for chunk_id in chunk_ids])
+    
+    def _precomputed(self, source: str) -> Dict[str, str]:
+        """
+        Get every precomputed result for a document
+        """
+        if self.precompute_store is None:
+            return {}
+        return self.precompute_store.get_all(document_key(source, self._document_text(source)))
+    
+    def _schedule_precompute(self, source: str):
+        """
+        Queue the summary and key-field answers of one document
+        """
+        key = document_key(source, self._document_text(source))
+        
+        # Same context as an on-demand summary of this document
+        context = self._document_text(source, max_chunks=5)
+        
+        # Streamed, so an interactive request can take the LLM mid-answer
+        self.scheduler.schedule(
+            key, SUMMARY,
+            lambda preempted: stream_text(self.llm, self._summary_prompt(context), preempted)
+        )
+        for field, question in KEY_FIELD_QUESTIONS.items():
+            self.scheduler.schedule(
+                key, field,
+                lambda preempted, question=question: stream_text(
+                    self.llm, self.qa_prompt.format(context=context, question=question), preempted
+                )
+            )
     
     def list_documents(self):
         """
@@ -229,15 +894,11 @@ Answer:"""
         """
         print_separator("Loaded Documents")
         
-        # Get unique document sources
-        sources = set()
-        for chunk in self.chunks:
-            source = chunk.metadata.get('source', 'Unknown')
-            sources.add(source)
+        # Sources are interned by the chunk store, one entry per document
+        sources = self.chunks.sources()
         
         print("Available documents:")
         for i, source in enumerate(sorted(sources), 1):
-            import os
             print(f"  {i}. {os.path.basename(source)}")
         
         print(f"\nTotal: {len(sources)} document(s)")
@@ -246,17 +907,27 @@ Answer:"""
 # Example usage
 if __name__ == "__main__":
     from src.ingest import DocumentIngester
+    from src.profiling import add_profile_argument, profiled
+    import argparse
     import os
     
-    # Load documents
-    data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
-    ingester = DocumentIngester()
-    chunks = ingester.process_directory(data_dir)
+    parser = argparse.ArgumentParser(description="Run a sample agent session")
+    add_profile_argument(parser, default="agent.folded")
+    args = parser.parse_args()
     
-    if chunks:
-        # Create agent
-        agent = IntelligentFormAgent(chunks)
+    with profiled(args.profile) as profiler:
+        # Load documents
+        data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+        ingester = DocumentIngester()
+        with profiler.stage("ingest"):
+            chunks = ingester.process_directory(data_dir)
         
-        # Test questions
-        agent.ask_question("What documents do we have?")
-        agent.summarize_document()
+        if chunks:
+            # Create agent
+            with profiler.stage("build_index"):
+                agent = IntelligentFormAgent(chunks)
+            profiler.instrument(agent, "ask_question", "summarize_document")
+            
+            # Test questions
+            agent.ask_question("What documents do we have?")
+            agent.summarize_document()
@@ -0,0 +1,184 @@
+"""
+Query Cache Module
+LRU caches for query embeddings and retrieval results
+"""
+
+import hashlib
+import json
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache that counts hits and misses
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        """
+        Initialize the cache
+
+        Args:
+            maxsize: Most entries kept before the least recently used is evicted
+        """
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Look up a key, marking it as recently used
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The cached value, or None on a miss
+        """
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any):
+        """
+        Store a value, evicting the least recently used entry if full
+
+        Args:
+            key: Cache key
+            value: Value to store
+        """
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """
+        Drop every entry (the hit and miss counts are kept)
+        """
+        with self._lock:
+            self._data.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get the cache's counters
+
+        Returns:
+            Dict with size, hits, misses, evictions and hit_rate
+        """
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+        }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class QueryCache:
+    """
+    Two-level cache in front of the embeddings model and the vector store
+
+    Level 1 maps question text to its embedding. Level 2 maps (embedding,
+    index version, k, filters) to the retrieved chunk IDs and scores. The
+    index version is read from the vector store itself, which bumps it on
+    every write, so stale retrievals can never be served whoever changed
+    the store. Embeddings only depend on the model, so they stay valid
+    across index changes.
+    """
+
+    def __init__(self, index, embedding_size: int = 1024, retrieval_size: int = 1024):
+        """
+        Initialize both levels
+
+        Args:
+            index: The vector store searched behind the cache; anything
+                with an index_version counter, e.g. a CollectionManager
+            embedding_size: Most question embeddings kept
+            retrieval_size: Most retrieval results kept
+        """
+        self.index = index
+        self.embeddings = LRUCache(embedding_size)
+        self.retrievals = LRUCache(retrieval_size)
+        self._cleared_version = index.index_version
+
+    @property
+    def index_version(self) -> int:
+        return self.index.index_version
+
+    @staticmethod
+    def question_key(question: str) -> str:
+        """
+        Normalise whitespace so trivially different questions share an entry
+        """
+        return " ".join(question.split())
+
+    def retrieval_key(
+        self,
+        embedding: Sequence[float],
+        k: int,
+        filters: Optional[dict] = None
+    ) -> Tuple[str, int, int, str]:
+        """
+        Build the level-2 key for a search
+
+        Args:
+            embedding: Query embedding
+            k: Number of results requested
+            filters: Metadata filter passed to the vector store, if any
+
+        Returns:
+            Hashable key that includes the current index version
+        """
+        version = self.index_version
+        if version != self._cleared_version:
+            # Entries for older versions can never be hit again
+            self.retrievals.clear()
+            self._cleared_version = version
+
+        digest = hashlib.sha1(array("d", embedding).tobytes()).hexdigest()
+        return digest, version, k, json.dumps(filters, sort_keys=True)
+
+    def get_retrieval(self, key: Tuple) -> Optional[List[Tuple[int, float]]]:
+        """
+        Look up the (chunk ID, score) pairs of a search
+        """
+        return self.retrievals.get(key)
+
+    def put_retrieval(self, key: Tuple, results: List[Tuple[int, float]]):
+        """
+        Store the (chunk ID, score) pairs of a search
+        """
+        self.retrievals.put(key, results)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the counters of both levels
+
+        Returns:
+            Dict with "embeddings" and "retrievals" stats, and the index version
+        """
+        return {
+            "embeddings": self.embeddings.stats(),
+            "retrievals": self.retrievals.stats(),
+            "index_version": self.index_version,
+        }
@@ -0,0 +1,414 @@
+"""
+Chunk Store Module
+Keeps document chunks in a compact, memory-mapped form inside the agent
+"""
+
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+from langchain.schema import Document
+from src.dedup import DUPLICATE_OF, content_hash
+
+
+# link_index values that are not chunk IDs
+UNLINKED = -1  # the chunk is embedded itself
+REMOVED = -2   # the chunk's document was removed or replaced
+
+
+class ChunkStore:
+    """
+    Append-only store of chunks
+
+    Chunk text is written once to a file and read back through mmap on
+    demand. Everything else is kept in flat arrays indexed by chunk ID:
+    an interned source table, page numbers and byte offsets. Only the
+    source and page metadata are kept, plus, for chunks that repeat
+    another document's text, the ID of the embedded chunk they duplicate.
+    Removing a document only marks its rows; chunk IDs are never reused.
+    """
+
+    # Column files written by save(), with their array type codes
+    COLUMNS = {
+        "source_index": "I",
+        "page_index": "i",
+        "offsets": "Q",
+        "lengths": "I",
+        "link_index": "i",
+    }
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialize an empty store
+
+        Args:
+            path: File to hold the chunk text (default: an anonymous
+                temporary file, removed when the store is closed)
+        """
+        self.path = path
+        self.read_only = False
+        self._file = open(path, "w+b") if path else tempfile.TemporaryFile()
+        self._mmap: Optional[mmap.mmap] = None
+        self._lock = threading.Lock()
+
+        # Interned source paths, and the chunk IDs belonging to each
+        self._sources: List[str] = []
+        self._source_ids: Dict[str, int] = {}
+        self._source_chunks: List[array] = []
+
+        # Per-chunk columns, indexed by chunk ID
+        self.source_index = array("I")
+        self.page_index = array("i")
+        self.offsets = array("Q")
+        self.lengths = array("I")
+        # ID of the embedded chunk a chunk duplicates, UNLINKED or REMOVED
+        self.link_index = array("i")
+
+    def add(self, documents: List[Document]) -> List[int]:
+        """
+        Append chunks to the store
+
+        Args:
+            documents: Chunks to add
+
+        Returns:
+            List of the new chunk IDs, in the same order
+        """
+        if self.read_only:
+            raise ValueError("This chunk store was loaded read-only")
+
+        with self._lock:
+            self._file.seek(0, os.SEEK_END)
+            offset = self._file.tell()
+            chunk_ids = []
+            links = []
+
+            for document in documents:
+                data = document.page_content.encode("utf-8")
+                self._file.write(data)
+
+                chunk_id = len(self.offsets)
+                source_id = self._intern(document.metadata.get("source", "Unknown"))
+
+                self.source_index.append(source_id)
+                self.page_index.append(int(document.metadata.get("page", -1)))
+                self.offsets.append(offset)
+                self.lengths.append(len(data))
+                self.link_index.append(UNLINKED)
+                self._source_chunks[source_id].append(chunk_id)
+
+                original = document.metadata.get(DUPLICATE_OF)
+                if original is not None:
+                    links.append((chunk_id, original, content_hash(document.page_content)))
+
+                offset += len(data)
+                chunk_ids.append(chunk_id)
+
+            self._file.flush()
+            self._resolve_links(links)
+
+            # The mapping is reopened at the new size on the next read
+            self._mmap = None
+
+        return chunk_ids
+
+    def _resolve_links(self, links: List[Tuple[int, str, str]]):
+        """
+        Point each linked chunk at the embedded chunk of its original
+        document with the same text
+
+        A chunk whose original is not in the store, or no longer has that
+        text, stays unlinked and is embedded like any other.
+
+        Args:
+            links: (chunk ID, original source, content hash), in ID order
+        """
+        embedded: Dict[str, Dict[str, int]] = {}
+        for chunk_id, original, digest in links:
+            if original not in embedded:
+                # Built on first use, after the original's own links in
+                # this batch are resolved, since they have lower IDs
+                embedded[original] = {}
+                for original_id in self.chunk_ids(original):
+                    target = self.link_index[original_id]
+                    embedded[original].setdefault(
+                        content_hash(self._read(original_id)), original_id if target == UNLINKED else target
+                    )
+            self.link_index[chunk_id] = embedded[original].get(digest, UNLINKED)
+
+    def remove(self, source: str) -> Tuple[List[int], List[int]]:
+        """
+        Remove a document, e.g. before adding a changed version of it
+
+        Its rows are marked REMOVED and no longer belong to the source.
+        Chunks of other documents that were linked to one of its chunks
+        are relinked to a single one of them, which must now be embedded.
+
+        Args:
+            source: Source path as returned by sources()
+
+        Returns:
+            Tuple of (removed chunk IDs that were embedded, chunk IDs that
+            must be embedded in their place)
+        """
+        if self.read_only:
+            raise ValueError("This chunk store was loaded read-only")
+
+        with self._lock:
+            source_id = self._source_ids.get(source)
+            if source_id is None:
+                return [], []
+
+            removed = self._source_chunks[source_id].tolist()
+            self._source_chunks[source_id] = array("I")
+            embedded = [chunk_id for chunk_id in removed if self.link_index[chunk_id] == UNLINKED]
+            for chunk_id in removed:
+                self.link_index[chunk_id] = REMOVED
+
+            # The first chunk repeating a removed chunk takes its place
+            replacements: Dict[int, int] = {}
+            promoted = []
+            removed_ids = set(embedded)
+            for chunk_id, target in enumerate(self.link_index):
+                if target not in removed_ids:
+                    continue
+                if target in replacements:
+                    self.link_index[chunk_id] = replacements[target]
+                else:
+                    replacements[target] = chunk_id
+                    self.link_index[chunk_id] = UNLINKED
+                    promoted.append(chunk_id)
+
+        return embedded, promoted
+
+    def _read(self, chunk_id: int) -> str:
+        """
+        Read one chunk's text from the file, without the mapping
+        """
+        self._file.seek(self.offsets[chunk_id])
+        data = self._file.read(self.lengths[chunk_id])
+        self._file.seek(0, os.SEEK_END)
+        return data.decode("utf-8")
+
+    def text(self, chunk_id: int) -> str:
+        """
+        Read one chunk's text
+
+        Args:
+            chunk_id: ID returned by add()
+
+        Returns:
+            str: The chunk text
+        """
+        if not self.lengths[chunk_id]:
+            return ""
+        start = self.offsets[chunk_id]
+        data = self._mapping()[start:start + self.lengths[chunk_id]]
+        return data.decode("utf-8")
+
+    def metadata(self, chunk_id: int) -> dict:
+        """
+        Build the metadata dict of one chunk
+
+        Args:
+            chunk_id: ID returned by add()
+
+        Returns:
+            dict: source, page and chunk_id, and duplicate_of for linked chunks
+        """
+        metadata = {
+            "source": self._sources[self.source_index[chunk_id]],
+            "page": self.page_index[chunk_id],
+            "chunk_id": chunk_id,
+        }
+        if self.link_index[chunk_id] >= 0:
+            metadata[DUPLICATE_OF] = self._sources[self.source_index[self.link_index[chunk_id]]]
+        return metadata
+
+    def is_linked(self, chunk_id: int) -> bool:
+        """
+        Check whether a chunk repeats text already indexed for another
+        chunk, so it is kept but not embedded
+
+        Args:
+            chunk_id: ID returned by add()
+
+        Returns:
+            bool: True if the chunk was marked as a duplicate at ingest
+        """
+        return self.link_index[chunk_id] >= 0
+
+    def linked_chunks(self, source: str) -> Dict[int, int]:
+        """
+        Map the embedded originals of a source's linked chunks back to the
+        source's own chunks
+
+        Args:
+            source: Source path as returned by sources()
+
+        Returns:
+            Dict of original chunk ID -> chunk ID in source
+        """
+        linked = {}
+        for chunk_id in self.chunk_ids(source):
+            if self.link_index[chunk_id] >= 0:
+                linked.setdefault(self.link_index[chunk_id], chunk_id)
+        return linked
+
+    def get(self, chunk_id: int) -> Document:
+        """
+        Materialise one chunk as a Document
+
+        Args:
+            chunk_id: ID returned by add()
+
+        Returns:
+            Document with the chunk's text and metadata
+        """
+        return Document(page_content=self.text(chunk_id), metadata=self.metadata(chunk_id))
+
+    def sources(self) -> List[str]:
+        """
+        List every source in the store, in O(documents)
+
+        Returns:
+            List of source paths, without removed documents
+        """
+        return [source for source, chunk_ids in zip(self._sources, self._source_chunks) if len(chunk_ids)]
+
+    def find_sources(self, name: str) -> List[str]:
+        """
+        Find sources whose path contains a name (case-insensitive)
+
+        Args:
+            name: Part of a file name, e.g. "invoice_001"
+
+        Returns:
+            List of matching source paths
+        """
+        name = name.lower()
+        return [source for source in self.sources() if name in source.lower()]
+
+    def chunk_ids(self, source: str) -> List[int]:
+        """
+        List the chunk IDs of one source
+
+        Args:
+            source: Source path as returned by sources()
+
+        Returns:
+            List of chunk IDs, in insertion order
+        """
+        source_id = self._source_ids.get(source)
+        if source_id is None:
+            return []
+        return self._source_chunks[source_id].tolist()
+
+    def save(self, directory: str):
+        """
+        Write the store to a directory: the text file, one binary file per
+        column and the interned source table
+
+        Args:
+            directory: Existing directory to write into
+        """
+        with self._lock:
+            self._file.flush()
+            self._file.seek(0)
+            with open(os.path.join(directory, "chunks.txt"), "wb") as f:
+                shutil.copyfileobj(self._file, f)
+
+            for name in self.COLUMNS:
+                with open(os.path.join(directory, f"{name}.bin"), "wb") as f:
+                    getattr(self, name).tofile(f)
+
+            with open(os.path.join(directory, "sources.json"), "w", encoding="utf-8") as f:
+                json.dump(self._sources, f)
+
+    @classmethod
+    def load(cls, directory: str, read_only: bool = True) -> "ChunkStore":
+        """
+        Open a store written by save()
+
+        The text file is memory-mapped in place, so several processes can
+        share one copy of it.
+
+        Args:
+            directory: Directory written by save()
+            read_only: Refuse add() so the saved files are never modified
+                (default: True)
+
+        Returns:
+            ChunkStore: The loaded store
+        """
+        store = cls.__new__(cls)
+        store.path = os.path.join(directory, "chunks.txt")
+        store.read_only = read_only
+        store._file = open(store.path, "rb" if read_only else "r+b")
+        store._mmap = None
+        store._lock = threading.Lock()
+
+        for name, typecode in cls.COLUMNS.items():
+            column = array(typecode)
+            with open(os.path.join(directory, f"{name}.bin"), "rb") as f:
+                column.frombytes(f.read())
+            setattr(store, name, column)
+
+        with open(os.path.join(directory, "sources.json"), "r", encoding="utf-8") as f:
+            store._sources = json.load(f)
+        store._source_ids = {source: i for i, source in enumerate(store._sources)}
+
+        # Rebuild the per-source chunk lists from the source column
+        store._source_chunks = [array("I") for _ in store._sources]
+        for chunk_id, source_id in enumerate(store.source_index):
+            if store.link_index[chunk_id] != REMOVED:
+                store._source_chunks[source_id].append(chunk_id)
+
+        return store
+
+    def close(self):
+        """
+        Release the mapping and the text file
+        """
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, chunk_id: int) -> Document:
+        return self.get(chunk_id)
+
+    def __iter__(self) -> Iterator[Document]:
+        for chunk_id in range(len(self)):
+            yield self.get(chunk_id)
+
+    def _intern(self, source: str) -> int:
+        """
+        Return the ID of a source path, adding it if it is new
+        """
+        source_id = self._source_ids.get(source)
+        if source_id is None:
+            source_id = len(self._sources)
+            self._sources.append(source)
+            self._source_ids[source] = source_id
+            self._source_chunks.append(array("I"))
+        return source_id
+
+    def _mapping(self) -> mmap.mmap:
+        """
+        Map the text file, remapping if chunks were added since the last read
+        """
+        mapping = self._mmap
+        if mapping is None:
+            with self._lock:
+                if self._mmap is None:
+                    self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                mapping = self._mmap
+        return mapping
@@ -0,0 +1,213 @@
+"""
+Layout-Aware Chunking Module
+Splits form pages along their own structure instead of fixed character windows
+"""
+
+import re
+from typing import List, Tuple
+from langchain.schema import Document
+
+
+# Line kinds recognised on a form page
+KEY_VALUE = "key_value"   # "Invoice Number: INV-001"
+TABLE_ROW = "table_row"   # "1. Consulting Services - $800.00" or "Qty    Price    Total"
+HEADING = "heading"       # "Items:" - introduces the block that follows
+TEXT = "text"             # Free-running prose
+
+KEY_VALUE_PATTERN = re.compile(r"^[A-Za-z][\w .#/&()'-]{0,40}:\s*\S")
+HEADING_PATTERN = re.compile(r"^[A-Za-z][\w .#/&()'-]{0,40}:$")
+LIST_ITEM_PATTERN = re.compile(r"^(\d+[.)]|[-*•])\s+")
+COLUMN_GAP_PATTERN = re.compile(r"\S(\t|\s{2,})\S")
+
+
+def classify_line(line: str) -> str:
+    """
+    Work out what kind of form element a line of text is
+
+    Args:
+        line: A single stripped line of page text
+
+    Returns:
+        str: One of KEY_VALUE, TABLE_ROW, HEADING or TEXT
+    """
+    if HEADING_PATTERN.match(line):
+        return HEADING
+    if LIST_ITEM_PATTERN.match(line) or COLUMN_GAP_PATTERN.search(line):
+        return TABLE_ROW
+    if KEY_VALUE_PATTERN.match(line):
+        return KEY_VALUE
+    return TEXT
+
+
+class LayoutAwareSplitter:
+    """
+    Splits pages into chunks made of whole text blocks, table rows and
+    key: value lines, so a field is never cut in half
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 0):
+        """
+        Initialize the splitter
+
+        Args:
+            chunk_size: Maximum size of each chunk (default: 1000 characters)
+            chunk_overlap: Trailing lines of the previous chunk to repeat, in
+                characters (default: 0 - blocks are whole, so none is needed)
+        """
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        """
+        Split page documents into layout-aware chunks
+
+        Args:
+            documents: List of page documents to split
+
+        Returns:
+            List of document chunks, each keeping its page's metadata
+        """
+        chunks = []
+        for document in documents:
+            for text in self.split_text(document.page_content):
+                chunks.append(Document(page_content=text, metadata=dict(document.metadata)))
+        return chunks
+
+    def split_text(self, text: str) -> List[str]:
+        """
+        Split the text of one page into chunks
+
+        Args:
+            text: Raw page text
+
+        Returns:
+            List of chunk strings
+        """
+        chunks: List[str] = []
+        current: List[str] = []
+
+        def size(lines: List[str]) -> int:
+            return sum(len(line) + 1 for line in lines)
+
+        def flush(next_size: int) -> List[str]:
+            # Close the current chunk and start the next one with any overlap
+            # that still leaves room for what comes next
+            chunks.append("\n".join(current))
+            carried = self._overlap_lines(current)
+            return carried if size(carried) + next_size <= self.chunk_size else []
+
+        for kind, lines in self._group_blocks(text):
+            block_size = size(lines)
+
+            # Whole blocks are kept together whenever they fit in a chunk
+            if block_size <= self.chunk_size:
+                if current and size(current) + block_size > self.chunk_size:
+                    current = flush(block_size)
+                current.extend(lines)
+                continue
+
+            # Oversized blocks are broken at line boundaries; table
+            # continuations repeat the table's heading so they read on their own
+            header = lines[:1] if kind == TABLE_ROW and HEADING_PATTERN.match(lines[0]) else []
+
+            # The heading starts a chunk together with its first row, rather
+            # than being left at the end of the previous chunk
+            if header and current:
+                opening = size(header) + len(self._split_line(lines[1])[0]) + 1
+                if size(current) + opening > self.chunk_size:
+                    current = flush(opening)
+
+            for line in lines:
+                for part in self._split_line(line):
+                    if current and size(current) + len(part) + 1 > self.chunk_size:
+                        current = flush(size(header) + len(part) + 1)
+                        if header and size(header) + len(part) + 1 <= self.chunk_size:
+                            current = header + current
+                    current.append(part)
+
+        if current:
+            chunks.append("\n".join(current))
+
+        return chunks
+
+    def _group_blocks(self, text: str) -> List[Tuple[str, List[str]]]:
+        """
+        Group consecutive lines of the same kind into blocks
+
+        A heading is attached to the block it introduces, and a blank line
+        always ends the current block.
+        """
+        blocks: List[Tuple[str, List[str]]] = []
+        kind, lines = None, []
+
+        for raw_line in text.splitlines():
+            line = raw_line.strip()
+
+            if not line:
+                if lines:
+                    blocks.append((kind, lines))
+                kind, lines = None, []
+                continue
+
+            line_kind = classify_line(line)
+
+            if line_kind == HEADING:
+                if lines:
+                    blocks.append((kind, lines))
+                kind, lines = HEADING, [line]
+            elif kind == HEADING:
+                # The heading takes on the kind of the first line it introduces
+                kind = line_kind
+                lines.append(line)
+            elif line_kind != kind:
+                if lines:
+                    blocks.append((kind, lines))
+                kind, lines = line_kind, [line]
+            else:
+                lines.append(line)
+
+        if lines:
+            blocks.append((kind, lines))
+
+        return blocks
+
+    def _split_line(self, line: str) -> List[str]:
+        """
+        Break a single line longer than the chunk size at word boundaries
+        """
+        if len(line) <= self.chunk_size:
+            return [line]
+
+        parts = []
+        current = ""
+        for word in line.split(" "):
+            while len(word) > self.chunk_size:
+                if current:
+                    parts.append(current)
+                    current = ""
+                parts.append(word[:self.chunk_size])
+                word = word[self.chunk_size:]
+            if current and len(current) + len(word) + 1 > self.chunk_size:
+                parts.append(current)
+                current = word
+            else:
+                current = f"{current} {word}" if current else word
+        if current:
+            parts.append(current)
+        return parts
+
+    def _overlap_lines(self, lines: List[str]) -> List[str]:
+        """
+        Pick the trailing whole lines of a finished chunk to carry forward
+        """
+        if self.chunk_overlap <= 0:
+            return []
+
+        carried = []
+        size = 0
+        for line in reversed(lines):
+            if size + len(line) + 1 > self.chunk_overlap:
+                break
+            carried.insert(0, line)
+            size += len(line) + 1
+        return carried
@@ -0,0 +1,546 @@
+"""
+Collection Manager Module
+Gives every agent its own named vector collections, shards large corpora
+across several of them and merges search results across shards; snapshots
+are searched in place, read-only
+"""
+
+import heapq
+import re
+import time
+import uuid
+import zlib
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+import chromadb
+import numpy as np
+from src.chunk_store import UNLINKED
+from src.utils import print_separator
+
+
+# Largest batch Chroma accepts in a single add
+CHROMA_BATCH_SIZE = 5000
+
+# Search latencies kept per shard for the percentiles
+LATENCY_WINDOW = 1000
+
+# Chroma collection names: 3-63 characters, alphanumeric at both ends
+MAX_TENANT_CHARS = 40
+
+
+def collection_prefix(tenant: str) -> str:
+    """
+    Build a collection name prefix that is unique to one manager
+
+    Args:
+        tenant: Tenant or corpus name, e.g. a user or session ID
+
+    Returns:
+        str: e.g. "acme-corp-3f9a1c2b"
+    """
+    slug = re.sub(r"[^a-zA-Z0-9]+", "-", tenant).strip("-").lower()[:MAX_TENANT_CHARS]
+    return f"{slug or 'tenant'}-{uuid.uuid4().hex[:8]}"
+
+
+def shard_for(source: str, num_shards: int) -> int:
+    """
+    Pick the shard a document lives in
+
+    All chunks of a document go to the same shard, so a search filtered to
+    one document only has to query one shard.
+
+    Args:
+        source: Document source path
+        num_shards: Number of shards
+
+    Returns:
+        int: Shard index
+    """
+    return zlib.crc32(source.encode("utf-8")) % num_shards
+
+
+@dataclass
+class ShardStats:
+    """
+    Size and search latency of one collection
+    """
+    name: str
+    chunks: int = 0
+    queries: int = 0
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=LATENCY_WINDOW))
+
+    def percentile(self, q: float) -> float:
+        """
+        Search latency percentile in seconds, over the recent searches
+        """
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self) -> dict:
+        """
+        Get the stats as a plain dict
+        """
+        return {
+            "name": self.name,
+            "chunks": self.chunks,
+            "queries": self.queries,
+            "p50_ms": self.percentile(0.5) * 1000,
+            "p95_ms": self.percentile(0.95) * 1000,
+        }
+
+
+class CollectionManager:
+    """
+    Owns the vector collections of one tenant
+
+    Collection names are unique per manager, so several agents in one
+    process (e.g. Streamlit sessions) never share or overwrite each other's
+    data. Documents are spread over num_shards collections by source;
+    searches go to every shard in parallel, or to a single shard when
+    filtered to one document, and the results are merged by distance.
+    Collections hold only IDs, vectors and metadata; the chunk text lives
+    in the agent's ChunkStore and is looked up by ID. Every write bumps
+    index_version, which caches in front of the manager key on.
+    """
+
+    def __init__(self, embeddings, tenant: str = "default", num_shards: int = 1):
+        """
+        Create the tenant's collections
+
+        Args:
+            embeddings: Embeddings model used to embed added texts
+            tenant: Tenant or corpus name, used in collection names
+            num_shards: Number of collections to spread documents over
+        """
+        if num_shards < 1:
+            raise ValueError(f"num_shards must be at least 1, got {num_shards}")
+
+        self.tenant = tenant
+        self.embeddings = embeddings
+        self.prefix = collection_prefix(tenant)
+
+        # Vectors are always computed by the agent, so the collections get
+        # no embedding function of their own
+        self.client = chromadb.Client()
+        self.shards = [
+            self.client.get_or_create_collection(f"{self.prefix}-s{i}", embedding_function=None)
+            for i in range(num_shards)
+        ]
+        self.shard_stats = [ShardStats(name=f"{self.prefix}-s{i}") for i in range(num_shards)]
+
+        # Bumped by every method that changes the collections
+        self.index_version = 0
+
+        # Shards are searched concurrently; Chroma releases the GIL while searching
+        self._pool = ThreadPoolExecutor(max_workers=num_shards) if num_shards > 1 else None
+
+    @property
+    def num_shards(self) -> int:
+        return len(self.shards)
+
+    def _group(self, metadatas: Sequence[dict]) -> Dict[int, List[int]]:
+        """
+        Group positions in a batch by the shard their source belongs to
+        """
+        groups = defaultdict(list)
+        for position, metadata in enumerate(metadatas):
+            groups[shard_for(metadata.get("source", "Unknown"), self.num_shards)].append(position)
+        return groups
+
+    def add_texts(self, texts: Sequence[str], metadatas: Sequence[dict], ids: Sequence[str]):
+        """
+        Embed texts and add their vectors to their shards
+
+        The texts themselves are not stored; callers keep them and look
+        search hits up by chunk ID.
+
+        Args:
+            texts: Chunk texts
+            metadatas: Chunk metadata, including "source"
+            ids: Chunk IDs
+        """
+        for start in range(0, len(texts), CHROMA_BATCH_SIZE):
+            batch = slice(start, start + CHROMA_BATCH_SIZE)
+            self.upsert_vectors(
+                ids=ids[batch],
+                vectors=self.embeddings.embed_documents(list(texts[batch])),
+                metadatas=metadatas[batch]
+            )
+
+    def upsert_vectors(
+        self,
+        ids: Sequence[str],
+        vectors: Sequence[Sequence[float]],
+        metadatas: Sequence[dict]
+    ):
+        """
+        Add chunks whose embeddings are already known, e.g. from a snapshot
+
+        Args:
+            ids: Chunk IDs
+            vectors: One embedding per chunk
+            metadatas: Chunk metadata, including "source"
+        """
+        for shard, positions in self._group(metadatas).items():
+            for start in range(0, len(positions), CHROMA_BATCH_SIZE):
+                batch = positions[start:start + CHROMA_BATCH_SIZE]
+                self.shards[shard].upsert(
+                    ids=[ids[i] for i in batch],
+                    embeddings=[vectors[i] for i in batch],
+                    metadatas=[metadatas[i] for i in batch]
+                )
+            self.shard_stats[shard].chunks = self.shards[shard].count()
+        self.index_version += 1
+
+    def delete(self, ids: Sequence[str]):
+        """
+        Remove chunks from whichever shards hold them
+
+        Args:
+            ids: Chunk IDs
+        """
+        if not ids:
+            return
+        for shard, stats in zip(self.shards, self.shard_stats):
+            shard.delete(ids=list(ids))
+            stats.chunks = shard.count()
+        self.index_version += 1
+
+    def get_vectors(self, ids: Sequence[str]) -> Dict[str, List[float]]:
+        """
+        Read stored embeddings back from whichever shards hold them
+
+        Args:
+            ids: Chunk IDs
+
+        Returns:
+            Dict of chunk ID -> embedding
+        """
+        vectors = {}
+        for shard in self.shards:
+            batch = shard.get(ids=list(ids), include=["embeddings"])
+            vectors.update(zip(batch["ids"], batch["embeddings"]))
+        return vectors
+
+    def search(
+        self,
+        embedding: List[float],
+        k: int,
+        where: Optional[dict] = None,
+        sources: Optional[Sequence[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Find the k closest chunks across all shards
+
+        A filter on "source" (one path, or {"$in": [paths]}) is routed to
+        those documents' shards only, as is any filter given the sources
+        it can match; any other search fans out to every shard in parallel.
+
+        Args:
+            embedding: Query embedding
+            k: Number of results
+            where: Optional metadata filter, e.g. {"source": path}
+            sources: Documents the filter can match, when it is not a plain
+                "source" filter (default: read from the filter)
+
+        Returns:
+            List of (chunk ID, distance), closest first
+        """
+        if sources is None:
+            source = (where or {}).get("source")
+            if isinstance(source, str):
+                sources = [source]
+            elif isinstance(source, dict) and "$in" in source:
+                sources = source["$in"]
+
+        if sources is None:
+            targets = range(self.num_shards)
+        else:
+            targets = sorted({shard_for(path, self.num_shards) for path in sources})
+
+        # Empty shards would make Chroma complain about k
+        targets = [shard for shard in targets if self.shard_stats[shard].chunks]
+        if not targets:
+            return []
+
+        if self._pool is None or len(targets) == 1:
+            per_shard = [self._search_shard(shard, embedding, k, where) for shard in targets]
+        else:
+            per_shard = list(self._pool.map(
+                lambda shard: self._search_shard(shard, embedding, k, where), targets
+            ))
+
+        # Distances are comparable across shards: same model, same metric
+        return heapq.nsmallest(k, (hit for hits in per_shard for hit in hits), key=lambda hit: hit[1])
+
+    def _search_shard(
+        self,
+        shard: int,
+        embedding: List[float],
+        k: int,
+        where: Optional[dict]
+    ) -> List[Tuple[str, float]]:
+        """
+        Search one shard and record its latency
+        """
+        stats = self.shard_stats[shard]
+        start = time.perf_counter()
+        results = self.shards[shard].query(
+            query_embeddings=[embedding],
+            n_results=min(k, stats.chunks),
+            where=where,
+            include=["distances"]
+        )
+        hits = list(zip(results["ids"][0], results["distances"][0]))
+        stats.latencies.append(time.perf_counter() - start)
+        stats.queries += 1
+        return hits
+
+    def stats(self) -> List[dict]:
+        """
+        Get size and latency stats of every collection
+
+        Returns:
+            List of dicts with name, chunks, queries, p50_ms and p95_ms
+        """
+        return [stats.summary() for stats in self.shard_stats]
+
+    def report(self):
+        """
+        Print size and latency stats of every collection
+        """
+        print_separator(f"Collections: {self.tenant}")
+        for stats in self.stats():
+            print(f"{stats['name']}: {stats['chunks']} chunks, {stats['queries']} searches, "
+                  f"p50 {stats['p50_ms']:.1f}ms, p95 {stats['p95_ms']:.1f}ms")
+
+    def drop(self):
+        """
+        Delete the tenant's collections and stop the search threads
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+        for shard in self.shards:
+            self.client.delete_collection(shard.name)
+        for stats in self.shard_stats:
+            stats.chunks = 0
+        self.index_version += 1
+
+
+class SnapshotIndex:
+    """
+    Read-only, exact vector search over a snapshot's memory-mapped vectors
+
+    A drop-in for CollectionManager on query nodes. Nothing is copied or
+    re-indexed at startup: the vectors stay in the snapshot file, so every
+    process serving the snapshot shares one copy through the OS page cache.
+    Rows are split into num_shards ranges searched in parallel; numpy
+    releases the GIL while multiplying. Distances are squared L2, like
+    Chroma's default, so scores mean the same on both.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        norms: np.ndarray,
+        chunks,
+        tenant: str = "default",
+        num_shards: int = 1
+    ):
+        """
+        Open the index
+
+        Args:
+            vectors: One embedding per chunk, in chunk ID order (memory-mapped)
+            norms: Squared length of each vector
+            chunks: The snapshot's ChunkStore, used to resolve filters
+            tenant: Tenant or corpus name, used in shard names
+            num_shards: Number of row ranges to search in parallel
+        """
+        if num_shards < 1:
+            raise ValueError(f"num_shards must be at least 1, got {num_shards}")
+
+        self.tenant = tenant
+        self.prefix = collection_prefix(tenant)
+        self.vectors = vectors
+        self.norms = norms
+        self.chunks = chunks
+
+        # Linked and removed chunks have no vectors; their rows are empty
+        self._searchable = np.frombuffer(chunks.link_index, dtype=np.int32) == UNLINKED
+
+        bounds = np.linspace(0, len(vectors), num_shards + 1).astype(int)
+        self._ranges = list(zip(bounds[:-1], bounds[1:]))
+        self.shard_stats = [
+            ShardStats(name=f"{self.prefix}-s{i}", chunks=int(self._searchable[start:end].sum()))
+            for i, (start, end) in enumerate(self._ranges)
+        ]
+
+        # Never changes; kept so caches can key on it like on a CollectionManager
+        self.index_version = 0
+
+        self._pool = ThreadPoolExecutor(max_workers=num_shards) if num_shards > 1 else None
+
+    @property
+    def num_shards(self) -> int:
+        return len(self._ranges)
+
+    def add_texts(self, texts: Sequence[str], metadatas: Sequence[dict], ids: Sequence[str]):
+        raise ValueError("This index was loaded read-only from a snapshot")
+
+    def upsert_vectors(self, ids: Sequence[str], vectors: Sequence[Sequence[float]], metadatas: Sequence[dict]):
+        raise ValueError("This index was loaded read-only from a snapshot")
+
+    def delete(self, ids: Sequence[str]):
+        raise ValueError("This index was loaded read-only from a snapshot")
+
+    def get_vectors(self, ids: Sequence[str]) -> Dict[str, List[float]]:
+        """
+        Read stored embeddings
+
+        Args:
+            ids: Chunk IDs
+
+        Returns:
+            Dict of chunk ID -> embedding, for the chunks that have one
+        """
+        return {
+            chunk_id: self.vectors[int(chunk_id)].tolist()
+            for chunk_id in ids
+            if int(chunk_id) < len(self.vectors) and self._searchable[int(chunk_id)]
+        }
+
+    def search(
+        self,
+        embedding: List[float],
+        k: int,
+        where: Optional[dict] = None,
+        sources: Optional[Sequence[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Find the k closest chunks
+
+        Args:
+            embedding: Query embedding
+            k: Number of results
+            where: Optional filter on "source", "page" or "chunk_id", with
+                "$in", "$or" and "$and" as in Chroma
+            sources: Accepted for compatibility; the filter alone decides
+                which rows are searched
+
+        Returns:
+            List of (chunk ID, distance), closest first
+        """
+        mask = self._matching(where) & self._searchable
+        query = np.asarray(embedding, dtype=np.float32)
+        targets = [shard for shard, (start, end) in enumerate(self._ranges) if mask[start:end].any()]
+        if not targets:
+            return []
+
+        if self._pool is None or len(targets) == 1:
+            per_shard = [self._search_shard(shard, query, k, mask) for shard in targets]
+        else:
+            per_shard = list(self._pool.map(
+                lambda shard: self._search_shard(shard, query, k, mask), targets
+            ))
+
+        return heapq.nsmallest(k, (hit for hits in per_shard for hit in hits), key=lambda hit: hit[1])
+
+    def _search_shard(self, shard: int, query: np.ndarray, k: int, mask: np.ndarray) -> List[Tuple[str, float]]:
+        """
+        Search one row range and record its latency
+        """
+        stats = self.shard_stats[shard]
+        start_time = time.perf_counter()
+        start, end = self._ranges[shard]
+
+        if mask[start:end].all():
+            rows = np.arange(start, end)
+            dots = self.vectors[start:end] @ query
+        else:
+            # Filtered searches only read the rows they can match
+            rows = start + np.flatnonzero(mask[start:end])
+            dots = self.vectors[rows] @ query
+        distances = self.norms[rows] - 2 * dots + float(query @ query)
+
+        if len(rows) > k:
+            nearest = np.argpartition(distances, k - 1)[:k]
+        else:
+            nearest = np.arange(len(rows))
+        nearest = nearest[np.argsort(distances[nearest], kind="stable")]
+        hits = [(str(rows[i]), float(distances[i])) for i in nearest]
+
+        stats.latencies.append(time.perf_counter() - start_time)
+        stats.queries += 1
+        return hits
+
+    def _matching(self, where: Optional[dict]) -> np.ndarray:
+        """
+        Turn a metadata filter into a mask over chunk IDs
+        """
+        mask = np.zeros(len(self.vectors), dtype=bool)
+        if not where:
+            mask[:] = True
+            return mask
+        if "$or" in where:
+            for clause in where["$or"]:
+                mask |= self._matching(clause)
+            return mask
+        if "$and" in where:
+            mask[:] = True
+            for clause in where["$and"]:
+                mask &= self._matching(clause)
+            return mask
+
+        (key, condition), = where.items()
+        if isinstance(condition, dict) and "$in" in condition:
+            values = condition["$in"]
+        elif isinstance(condition, dict) and "$eq" in condition:
+            values = [condition["$eq"]]
+        elif not isinstance(condition, dict):
+            values = [condition]
+        else:
+            raise ValueError(f"Unsupported filter: {where}")
+
+        if key == "source":
+            for source in values:
+                mask[self.chunks.chunk_ids(source)] = True
+        elif key == "chunk_id":
+            mask[[int(value) for value in values]] = True
+        elif key == "page":
+            mask[np.isin(np.frombuffer(self.chunks.page_index, dtype=np.int32), values)] = True
+        else:
+            raise ValueError(f"Unsupported filter on {key!r}")
+        return mask
+
+    def stats(self) -> List[dict]:
+        """
+        Get size and latency stats of every shard
+
+        Returns:
+            List of dicts with name, chunks, queries, p50_ms and p95_ms
+        """
+        return [stats.summary() for stats in self.shard_stats]
+
+    def report(self):
+        """
+        Print size and latency stats of every shard
+        """
+        print_separator(f"Snapshot index: {self.tenant}")
+        for stats in self.stats():
+            print(f"{stats['name']}: {stats['chunks']} chunks, {stats['queries']} searches, "
+                  f"p50 {stats['p50_ms']:.1f}ms, p95 {stats['p95_ms']:.1f}ms")
+
+    def drop(self):
+        """
+        Stop the search threads and let go of the mapped vectors
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+        self.vectors = self.norms = None
+        for stats in self.shard_stats:
+            stats.chunks = 0
@@ -0,0 +1,249 @@
+"""
+Cross-Document Module
+Looks up fields in many documents at once and joins the results in Python,
+so comparisons and totals over thousands of forms need one narrative LLM
+call instead of one prompt over everything
+"""
+
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Tuple
+from src.chunking import KEY_VALUE, classify_line
+from src.results import DocumentFields
+
+
+# Threads looking up fields; most lookups never reach the LLM
+MAX_WORKERS = 8
+
+# LLM calls allowed at once; a local Ollama serves one or two at a time
+LLM_CONCURRENCY = 2
+
+# Labels that introduce a field on a form, e.g. "Total: $1,250.00"
+FIELD_LABELS = {
+    "document_number": re.compile(r"^(invoice|form|receipt|document|bill|order)\s*(number|no\.?|#|id)$", re.I),
+    "date": re.compile(r"^(date|invoice date|issue date|date issued)$", re.I),
+    "vendor": re.compile(r"^(from|vendor|seller|supplier|issued by|company)$", re.I),
+    "total": re.compile(r"^(total|grand total|total amount|total due|amount due|balance due)$", re.I),
+}
+
+AMOUNT_PATTERN = re.compile(r"-?\d[\d,]*(?:\.\d+)?")
+
+# An amount with a currency sign or cents, preferred over other numbers in
+# the same text, e.g. "$1,250.00" in "Invoice 0001 has a total of $1,250.00"
+MONEY_PATTERN = re.compile(r"-?[$€£]\s?\d[\d,]*(?:\.\d+)?|\d[\d,]*\.\d{2}\b")
+
+# Fields whose value is an amount
+AMOUNT_FIELDS = {"total"}
+
+# Longest free-form answer still taken as a bare value, e.g. "ABC Corporation"
+MAX_VALUE_WORDS = 6
+
+
+def find_field(text: str, field: str) -> Optional[str]:
+    """
+    Find a field's value on a labelled "key: value" line
+
+    Args:
+        text: Document text
+        field: A FIELD_LABELS field name
+
+    Returns:
+        The value of the first matching line, or None
+    """
+    label_pattern = FIELD_LABELS.get(field)
+    if label_pattern is None:
+        return None
+
+    for line in text.splitlines():
+        line = line.strip()
+        if classify_line(line) != KEY_VALUE:
+            continue
+        label, value = line.split(":", 1)
+        if label_pattern.match(label.strip()):
+            return value.strip()
+    return None
+
+
+def parse_amount(value: Optional[str]) -> Optional[float]:
+    """
+    Read a number out of a value such as "$1,250.00" or "EUR 99"
+
+    Returns:
+        The number, or None if the value holds none
+    """
+    match = MONEY_PATTERN.search(value or "") or AMOUNT_PATTERN.search(value or "")
+    return float(re.sub(r"[^\d.-]", "", match.group())) if match else None
+
+
+def normalise_answer(field: str, answer: Optional[str]) -> Optional[str]:
+    """
+    Reduce a free-form LLM answer to the bare value of a field
+
+    Args:
+        field: Field name
+        answer: e.g. "Invoice 0001 has a total amount of $1,250.00."
+
+    Returns:
+        The value, e.g. "$1,250.00", or None if the answer is not one
+        value (a sentence, a refusal, several amounts)
+    """
+    answer = (answer or "").strip().strip("\"'").strip()
+    if not answer:
+        return None
+
+    # The model quoted the labelled line, e.g. "Total: $1,250.00"
+    quoted = find_field(answer, field)
+    if quoted:
+        return quoted
+
+    if field in AMOUNT_FIELDS:
+        amounts = MONEY_PATTERN.findall(answer)
+        return amounts[0].strip() if len(set(amounts)) == 1 else None
+
+    if "\n" in answer or len(answer.split()) > MAX_VALUE_WORDS or answer.endswith((".", "?", "!")):
+        return None
+    return answer
+
+
+def comparison_table(documents: List[DocumentFields], fields: List[str]) -> str:
+    """
+    Join per-document values into a plain-text table, one row per document
+
+    Args:
+        documents: Field values, in the order the rows should appear
+        fields: Columns
+
+    Returns:
+        str: e.g. "document | date | total\\ninvoice_001.pdf | ... "
+    """
+    rows = [" | ".join(["document"] + fields)]
+    for document in documents:
+        values = [document.values.get(field, "not found") for field in fields]
+        rows.append(" | ".join([os.path.basename(document.source)] + values))
+    return "\n".join(rows)
+
+
+def group_totals(
+    documents: List[DocumentFields],
+    value_field: str,
+    group_by: str
+) -> Tuple[Dict[str, Dict[str, float]], List[str]]:
+    """
+    Sum a numeric field per group
+
+    Args:
+        documents: Field values of every document
+        value_field: Field to sum, e.g. "total"
+        group_by: Field to group on, e.g. "vendor"
+
+    Returns:
+        Tuple of (group -> {"sum", "count"}, sorted by sum descending;
+        names of documents whose value could not be read)
+    """
+    groups: Dict[str, Dict[str, float]] = {}
+    skipped = []
+    for document in documents:
+        amount = parse_amount(document.values.get(value_field))
+        if amount is None:
+            skipped.append(os.path.basename(document.source))
+            continue
+        group = groups.setdefault(document.values.get(group_by, "unknown"), {"sum": 0.0, "count": 0})
+        group["sum"] += amount
+        group["count"] += 1
+    ordered = dict(sorted(groups.items(), key=lambda item: -item[1]["sum"]))
+    return ordered, skipped
+
+
+class FieldExtractor:
+    """
+    Looks up fields in many documents on a thread pool
+
+    Each field is taken from the first of: a labelled line in the document's
+    text, a precomputed answer reduced to a bare value, or a short LLM
+    extraction over the document's closest chunks. At most llm_concurrency
+    extractions talk to the LLM at once; the other workers keep going on
+    text lookups.
+    """
+
+    def __init__(self, agent, max_workers: int = MAX_WORKERS, llm_concurrency: int = LLM_CONCURRENCY):
+        """
+        Initialize the extractor
+
+        Args:
+            agent: The IntelligentFormAgent whose documents to read
+            max_workers: Documents processed at once
+            llm_concurrency: LLM calls allowed at once
+        """
+        self.agent = agent
+        self.max_workers = max_workers
+        self._llm_slots = threading.BoundedSemaphore(llm_concurrency)
+        self._lock = threading.Lock()
+        self.llm_calls = 0
+
+    def iter_fields(self, sources: List[str], fields: Dict[str, str]) -> Iterator[DocumentFields]:
+        """
+        Look up fields in every document, yielding each as soon as it is done
+
+        Args:
+            sources: Document source paths
+            fields: Field name -> question asked when the LLM is needed
+
+        Yields:
+            DocumentFields, in completion order
+        """
+        pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="fields")
+        futures = [pool.submit(self._extract, source, fields) for source in sources]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # Stop queued documents if the caller stops reading early
+            for future in futures:
+                future.cancel()
+            pool.shutdown(wait=True)
+
+    def _extract(self, source: str, fields: Dict[str, str]) -> DocumentFields:
+        """
+        Look up every field of one document
+        """
+        result = DocumentFields(source=source)
+        start = time.perf_counter()
+
+        try:
+            precomputed = self.agent._precomputed(source)
+            text = self.agent._document_text(source)
+
+            for field, question in fields.items():
+                # Labelled lines are exact; precomputed answers are prose
+                # from the QA prompt and are only used once reduced to a value
+                value, method = find_field(text, field), "text"
+                if not value:
+                    value, method = normalise_answer(field, precomputed.get(field)), "precomputed"
+                if not value:
+                    value, method = self._ask(source, field, question), "llm"
+                result.values[field] = value
+                result.methods[field] = method
+        except Exception as e:
+            result.error = str(e)
+
+        result.seconds = time.perf_counter() - start
+        return result
+
+    def _ask(self, source: str, field: str, question: str) -> str:
+        """
+        Extract one value with the LLM, from this document's closest chunks
+        """
+        chunks = self.agent._retrieve(question, {}, self.agent.qa_depth, where={"source": source})
+        prompt = self.agent.qa_prompt.format(
+            context="\n\n".join([chunk.document.page_content for chunk in chunks]),
+            question=f"{question} Reply with the value only."
+        )
+        with self._llm_slots:
+            answer = self.agent.llm.predict(prompt)
+        with self._lock:
+            self.llm_calls += 1
+        # Keep the whole answer for a comparison when it is not one value
+        return normalise_answer(field, answer) or answer.strip()
@@ -0,0 +1,399 @@
+"""
+Document Deduplication Module
+Detects exact and near-duplicate documents at ingest and links them to the
+content already indexed, so shared text is embedded and searched only once
+"""
+
+import hashlib
+import os
+import struct
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from langchain.schema import Document
+from src.utils import print_separator
+
+
+# Metadata key set on pages and chunks that repeat already indexed content;
+# the value is the source of the original
+DUPLICATE_OF = "duplicate_of"
+
+# Largest prime below 2**32: every (a * h + b) of 32-bit values fits in
+# an unsigned 64-bit integer, so all permutations run as one numpy product
+HASH_PRIME = (1 << 32) - 5
+MAX_HASH = (1 << 32) - 1
+
+# Multiplier that spreads packed shingle bytes over 64 bits (Fibonacci hashing)
+SHINGLE_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def content_hash(data) -> str:
+    """
+    Hash file bytes or text for exact duplicate detection
+
+    Args:
+        data: Raw bytes, or text (normalised for whitespace and case)
+
+    Returns:
+        str: Hex digest of the content
+    """
+    if isinstance(data, str):
+        data = " ".join(data.lower().split()).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def shingle_hashes(text: str, size: int = 5) -> np.ndarray:
+    """
+    Hash every overlapping shingle of a text, all at once
+
+    Args:
+        text: Text to shingle (normalised for whitespace and case)
+        size: Bytes of UTF-8 per shingle (default: 5, at most 8)
+
+    Returns:
+        Array of the distinct 32-bit shingle hashes
+    """
+    data = np.frombuffer(" ".join(text.lower().split()).encode("utf-8"), dtype=np.uint8)
+    if not data.size:
+        return np.empty(0, dtype=np.uint64)
+
+    # Pack each window of bytes into one integer, then mix it down to 32 bits
+    size = min(size, data.size)
+    windows = np.lib.stride_tricks.sliding_window_view(data, size).astype(np.uint64)
+    packed = windows @ (np.uint64(1) << np.arange(8 * (size - 1), -1, -8, dtype=np.uint64))
+    return np.unique((packed * SHINGLE_MIX) >> np.uint64(32))
+
+
+class MinHash:
+    """
+    MinHash signatures for estimating Jaccard similarity between texts
+    """
+
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        """
+        Initialize the hash permutations
+
+        Args:
+            num_perm: Number of permutations (signature length)
+            seed: Seed for the permutation coefficients
+        """
+        self.num_perm = num_perm
+
+        # Derive permutation coefficients deterministically from the seed
+        a, b = [], []
+        for i in range(num_perm):
+            digest = hashlib.sha256(f"{seed}:{i}".encode()).digest()
+            first, second = struct.unpack("<QQ", digest[:16])
+            a.append(first % (HASH_PRIME - 1) + 1)
+            b.append(second % HASH_PRIME)
+        self._a = np.array(a, dtype=np.uint64)[:, None]
+        self._b = np.array(b, dtype=np.uint64)[:, None]
+
+    def signature(self, text: str) -> np.ndarray:
+        """
+        Compute the MinHash signature of a text
+
+        Args:
+            text: Text to sign
+
+        Returns:
+            Array of num_perm minimum hash values
+        """
+        hashes = shingle_hashes(text)
+        if not hashes.size:
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+
+        # One row per permutation, one column per shingle
+        permuted = (self._a * hashes[None, :] + self._b) % HASH_PRIME
+        return permuted.min(axis=1)
+
+    @staticmethod
+    def similarity(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+        """
+        Estimate the Jaccard similarity of two signatures, or of one
+        signature against each row of a stack of them
+        """
+        return np.mean(first == second, axis=-1)
+
+
+@dataclass
+class DedupStats:
+    """
+    Work avoided by deduplication
+    """
+    files_seen: int = 0
+    files_skipped: int = 0
+    files_linked: int = 0
+    files_replaced: int = 0
+    pages_seen: int = 0
+    pages_linked: int = 0
+    near_duplicate_pages: int = 0
+    chunks_seen: int = 0
+    chunks_linked: int = 0
+    characters_not_embedded: int = 0
+
+    def report(self):
+        """
+        Print how much work deduplication avoided
+        """
+        print_separator("Deduplication")
+        print(f"Files:  {self.files_skipped} of {self.files_seen} skipped as already ingested, "
+              f"{self.files_linked} linked as exact duplicates, {self.files_replaced} changed")
+        print(f"Pages:  {self.pages_linked} of {self.pages_seen} linked as exact duplicates, "
+              f"{self.near_duplicate_pages} near-duplicate")
+        print(f"Chunks: {self.chunks_linked} of {self.chunks_seen} linked to existing chunks "
+              f"instead of being embedded")
+        print(f"Saved:  {self.characters_not_embedded} characters of embedding work")
+
+
+class DocumentDeduplicator:
+    """
+    Links exact duplicate files and pages by content hash, and detects
+    near-duplicate pages with MinHash/LSH so only their changed chunks
+    are embedded
+
+    Duplicates are never dropped: their pages and chunks are kept, marked
+    with DUPLICATE_OF, so every document still has all of its text. Only
+    the embedding of marked chunks is skipped. The deduplicator remembers
+    everything it has seen, so reusing one instance across ingests also
+    skips files that are already indexed under the same name.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 128, bands: int = 32):
+        """
+        Initialize the deduplicator
+
+        Args:
+            threshold: Estimated Jaccard similarity above which two pages
+                are near-duplicates (default: 0.8)
+            num_perm: MinHash signature length (default: 128)
+            bands: LSH bands; num_perm must divide evenly (default: 32)
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.minhash = MinHash(num_perm=num_perm)
+
+        self.stats = DedupStats()
+
+        # Duplicate source -> source it duplicates, for the current run
+        self.links: Dict[str, str] = {}
+
+        # File hash -> every source with those bytes, the original first
+        self._file_hashes: Dict[str, List[str]] = {}
+        self._page_hashes: Dict[str, str] = {}
+        self._chunk_hashes: Dict[str, str] = {}
+        self._signatures: List[np.ndarray] = []
+        self._signature_sources: List[Optional[str]] = []
+        self._lsh_buckets: Dict[Tuple[int, bytes], List[int]] = defaultdict(list)
+        self._near_duplicate_pages: Set[Tuple[str, int]] = set()
+
+    def check_file(self, source: str, data: bytes) -> Optional[str]:
+        """
+        Check a file's bytes against every file seen so far, and register them
+
+        A file seen before under the same name but with other bytes is a
+        new version: everything registered for the old one is forgotten,
+        so nothing is linked to text that is about to be replaced.
+
+        Args:
+            source: Path or name of the file
+            data: Raw file bytes
+
+        Returns:
+            source itself if this file was already ingested under the same
+            name, the source it duplicates if the same bytes were ingested
+            under another name, or None if the file is new or changed
+        """
+        self.stats.files_seen += 1
+        sources = self._file_hashes.setdefault(content_hash(data), [])
+
+        if source in sources:
+            self.stats.files_skipped += 1
+            return source
+
+        if self.has_name(source):
+            self.stats.files_replaced += 1
+            self.forget(source)
+
+        sources.append(source)
+        if len(sources) > 1:
+            self.stats.files_linked += 1
+            self.links[source] = sources[0]
+            return sources[0]
+        return None
+
+    def has_file(self, data: bytes, source: Optional[str] = None) -> bool:
+        """
+        Check a file's bytes without registering them
+
+        Args:
+            data: Raw file bytes
+            source: Only count a file seen under this name (default: any name)
+
+        Returns:
+            bool: True if a file with the same bytes was already seen
+        """
+        sources = self._file_hashes.get(content_hash(data), [])
+        return source in sources if source is not None else bool(sources)
+
+    def has_name(self, source: str) -> bool:
+        """
+        Check whether any version of a file was registered under a name
+
+        Args:
+            source: Path or name of the file
+
+        Returns:
+            bool: True if the name was seen, whatever its bytes were
+        """
+        return any(source in sources for sources in self._file_hashes.values())
+
+    def forget(self, source: str):
+        """
+        Forget everything registered for a source, e.g. after it failed to
+        index, so it is neither skipped nor linked to next time
+
+        Args:
+            source: Path or name of the file
+        """
+        for sources in self._file_hashes.values():
+            if source in sources:
+                sources.remove(source)
+        for registry in (self._page_hashes, self._chunk_hashes):
+            for digest in [digest for digest, owner in registry.items() if owner == source]:
+                del registry[digest]
+        self._signature_sources = [
+            None if owner == source else owner for owner in self._signature_sources
+        ]
+        self._near_duplicate_pages = {key for key in self._near_duplicate_pages if key[0] != source}
+        self.links.pop(source, None)
+
+    def link_pages(self, pages: List[Document]) -> List[Document]:
+        """
+        Mark exact duplicate pages with DUPLICATE_OF and flag near-duplicate
+        ones, so link_chunks() can mark their unchanged chunks
+
+        Args:
+            pages: Loaded page documents
+
+        Returns:
+            The same pages; none are dropped
+        """
+        for page in pages:
+            self.stats.pages_seen += 1
+            source = page.metadata.get("source", "")
+
+            # Blank pages carry nothing to compare
+            if not page.page_content.strip():
+                continue
+
+            digest = content_hash(page.page_content)
+
+            original = self._page_hashes.get(digest)
+            if original is not None:
+                self.stats.pages_linked += 1
+                page.metadata[DUPLICATE_OF] = original
+                self.links.setdefault(source, original)
+                continue
+            self._page_hashes[digest] = source
+
+            signature = self.minhash.signature(page.page_content)
+            match = self._find_similar(signature)
+            if match is not None:
+                self.stats.near_duplicate_pages += 1
+                self._near_duplicate_pages.add((source, page.metadata.get("page", 0)))
+            self._add_signature(signature, source)
+
+        return pages
+
+    def link_chunks(self, chunks: List[Document]) -> List[Document]:
+        """
+        Mark with DUPLICATE_OF the chunks of exact duplicate pages, and the
+        chunks of near-duplicate pages that are unchanged from a chunk
+        already seen, so only the changed chunks are embedded
+
+        Args:
+            chunks: Chunks split from the pages returned by link_pages
+
+        Returns:
+            The same chunks; none are dropped
+        """
+        for chunk in chunks:
+            self.stats.chunks_seen += 1
+            source = chunk.metadata.get("source", "")
+            page_key = (source, chunk.metadata.get("page", 0))
+            digest = content_hash(chunk.page_content)
+
+            original = chunk.metadata.get(DUPLICATE_OF)
+            if original is None and page_key in self._near_duplicate_pages:
+                original = self._chunk_hashes.get(digest)
+
+            if original is not None:
+                chunk.metadata[DUPLICATE_OF] = original
+                self.stats.chunks_linked += 1
+                self.stats.characters_not_embedded += len(chunk.page_content)
+                self.links.setdefault(source, original)
+                continue
+
+            self._chunk_hashes.setdefault(digest, source)
+
+        return chunks
+
+    def describe_links(self) -> List[str]:
+        """
+        Describe which sources were linked to which existing documents
+
+        Returns:
+            List of "duplicate -> original" lines
+        """
+        return [
+            f"{os.path.basename(duplicate)} -> {os.path.basename(original)}"
+            for duplicate, original in sorted(self.links.items())
+        ]
+
+    def reset_stats(self):
+        """
+        Start counting a new ingest run, keeping everything already seen
+        """
+        self.stats = DedupStats()
+        self.links = {}
+
+    def _find_similar(self, signature: np.ndarray) -> Optional[str]:
+        """
+        Find the most similar previously seen page whose signature is above
+        the threshold
+        """
+        candidates = set()
+        for band, key in self._band_keys(signature):
+            candidates.update(self._lsh_buckets.get((band, key), []))
+
+        # Forgotten sources keep their slot, without an owner
+        candidates = sorted(index for index in candidates if self._signature_sources[index] is not None)
+        if not candidates:
+            return None
+
+        similarities = MinHash.similarity(signature, np.stack([self._signatures[i] for i in candidates]))
+        best = int(np.argmax(similarities))
+        return self._signature_sources[candidates[best]] if similarities[best] >= self.threshold else None
+
+    def _add_signature(self, signature: np.ndarray, source: str):
+        """
+        Index a page signature in the LSH buckets
+        """
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        self._signature_sources.append(source)
+        for band, key in self._band_keys(signature):
+            self._lsh_buckets[(band, key)].append(index)
+
+    def _band_keys(self, signature: np.ndarray):
+        """
+        Split a signature into its LSH band keys
+        """
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
@@ -4,36 +4,126 @@ Handles loading PDFs and preparing them for the AI system
 """
 
 import os
-from typing import List
-from langchain.document_loaders import PyPDFLoader
+import time
+from io import BytesIO
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
+from src.chunking import LayoutAwareSplitter
+from src.dedup import DocumentDeduplicator, content_hash
+from src.ocr import OCRFallback
+from src.page_cache import LazyPages, PageCache
 from src.utils import print_separator, clean_text
 
 
+# Available chunking strategies
+CHUNKING_STRATEGIES = ("recursive", "layout")
+
+# Pages parsed, OCR'd and split together by iter_chunks()
+PAGE_BATCH_SIZE = 32
+
+
+@dataclass
+class IngestMetrics:
+    """
+    Time and volume of each ingest stage
+    """
+    files: int = 0
+    pages: int = 0
+    cached_pages: int = 0
+    chunks: int = 0
+    load_seconds: float = 0.0
+    ocr_seconds: float = 0.0
+    ocr_pages: int = 0
+    ocr_cache_hits: int = 0
+    ocr_failures: int = 0
+    split_seconds: float = 0.0
+    
+    def report(self):
+        """
+        Print a per-stage summary of the last ingest
+        """
+        print_separator("Ingest Metrics")
+        print(f"Load:  {self.load_seconds:.2f}s for {self.pages} pages from {self.files} file(s), "
+              f"{self.cached_pages} served from the page cache")
+        print(f"OCR:   {self.ocr_seconds:.2f}s for {self.ocr_pages} page(s), "
+              f"{self.ocr_cache_hits} served from cache, {self.ocr_failures} failed")
+        print(f"Split: {self.split_seconds:.2f}s into {self.chunks} chunks")
+
+
 class DocumentIngester:
     """
     Loads PDF documents and splits them into chunks for processing
     """
     
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+    def __init__(
+        self,
+        chunk_size: int = 1000,
+        chunk_overlap: Optional[int] = None,
+        chunking_strategy: str = "recursive",
+        deduplicate: bool = True,
+        ocr_workers: int = 2,
+        ocr_cache_dir: str = ".ocr_cache",
+        page_cache_path: Optional[str] = ".page_cache.db"
+    ):
         """
         Initialize the document ingester
         
         Args:
             chunk_size: Size of each text chunk (default: 1000 characters)
-            chunk_overlap: Overlap between chunks (default: 200 characters)
+            chunk_overlap: Overlap between chunks (default: 200 characters
+                for "recursive", 0 for "layout" since its chunks are whole)
+            chunking_strategy: "recursive" for fixed character windows, or
+                "layout" to split along text blocks, table rows and
+                key: value lines (default: "recursive")
+            deduplicate: Skip files already ingested under the same name,
+                and embed exact duplicate pages and the unchanged chunks of
+                near-duplicate pages only once; their chunks are kept and
+                linked to the original (default: True)
+            ocr_workers: Processes used to OCR scanned pages (default: 2)
+            ocr_cache_dir: Where OCR output is cached by page image hash
+                (default: .ocr_cache)
+            page_cache_path: SQLite file caching the extracted text of every
+                page, so unchanged files are not parsed again; None turns
+                the cache off (default: .page_cache.db)
         """
+        if chunking_strategy not in CHUNKING_STRATEGIES:
+            raise ValueError(
+                f"Unknown chunking strategy '{chunking_strategy}'. "
+                f"Choose one of: {', '.join(CHUNKING_STRATEGIES)}"
+            )
+        
+        if chunk_overlap is None:
+            chunk_overlap = 0 if chunking_strategy == "layout" else 200
+        
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.chunking_strategy = chunking_strategy
         
         # Create text splitter
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.chunk_size,
-            chunk_overlap=self.chunk_overlap,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""]
-        )
+        if chunking_strategy == "layout":
+            self.text_splitter = LayoutAwareSplitter(
+                chunk_size=self.chunk_size,
+                chunk_overlap=self.chunk_overlap
+            )
+        else:
+            self.text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=self.chunk_size,
+                chunk_overlap=self.chunk_overlap,
+                length_function=len,
+                separators=["\n\n", "\n", " ", ""]
+            )
+        
+        # Remembers every file, page and chunk seen by this ingester
+        self.deduplicator = DocumentDeduplicator() if deduplicate else None
+        
+        # Scanned pages have no text layer; they are sent to OCR instead
+        self.ocr = OCRFallback(max_workers=ocr_workers, cache_dir=ocr_cache_dir)
+        
+        # Extracted page text, keyed by file hash, page and extractor version
+        self.page_cache = PageCache(page_cache_path) if page_cache_path else None
+        self.metrics = IngestMetrics()
     
     def load_pdf(self, file_path: str) -> List[Document]:
         """
@@ -48,14 +138,107 @@ class DocumentIngester:
         print(f"Loading PDF: {os.path.basename(file_path)}")
         
         try:
-            loader = PyPDFLoader(file_path)
-            documents = loader.load()
-            print(f"  ✓ Loaded {len(documents)} pages")
-            return documents
+            with open(file_path, "rb") as f:
+                data = f.read()
+            
+            if self.deduplicator and self._skip_duplicate(file_path, data):
+                return []
+            
+            documents = self._page_documents(file_path, data)
+            return self._finish_pages(documents, BytesIO(data))
         except Exception as e:
             print(f"  ✗ Error loading PDF: {e}")
+            self.forget(file_path)
             return []
     
+    def load_pdf_bytes(self, data: bytes, name: str) -> List[Document]:
+        """
+        Load a PDF held in memory, e.g. an upload, without writing it to disk
+        
+        Args:
+            data: Raw PDF bytes
+            name: File name to record as the document source
+            
+        Returns:
+            List of Document objects
+        """
+        print(f"Loading PDF: {name}")
+        
+        try:
+            if self.deduplicator and self._skip_duplicate(name, data):
+                return []
+            
+            documents = self._page_documents(name, data)
+            return self._finish_pages(documents, BytesIO(data))
+        except Exception as e:
+            print(f"  ✗ Error loading PDF: {e}")
+            self.forget(name)
+            return []
+    
+    def has_seen(self, data: bytes, name: Optional[str] = None) -> bool:
+        """
+        Check whether a file with these exact bytes was already ingested
+        
+        Args:
+            data: Raw file bytes
+            name: Only count the file as seen under this name (default: any name)
+            
+        Returns:
+            bool: True if deduplication is on and the content is known
+        """
+        return bool(self.deduplicator and self.deduplicator.has_file(data, name))
+    
+    def forget(self, name: str):
+        """
+        Forget a file that could not be ingested or indexed, so it is
+        processed again, rather than skipped, when it is sent again
+        
+        Args:
+            name: Source path or name the file was loaded under
+        """
+        if self.deduplicator:
+            self.deduplicator.forget(name)
+    
+    def _skip_duplicate(self, source: str, data: bytes) -> bool:
+        """
+        Register a file's bytes and report whether it should be skipped
+        """
+        if self.deduplicator.has_name(source) and not self.deduplicator.has_file(data, source):
+            print("  ↻ Changed since it was ingested: the new version replaces the old one")
+        original = self.deduplicator.check_file(source, data)
+        if original == source:
+            print("  ↷ Skipped: already ingested")
+            return True
+        if original:
+            print(f"  ↪ Duplicate of {os.path.basename(original)}: linked, not embedded again")
+        return False
+    
+    def _page_documents(self, source: str, data: bytes) -> List[Document]:
+        """
+        Get one Document per page, from the page cache where possible
+        """
+        pages = LazyPages(data, content_hash(data), self.page_cache)
+        documents = [
+            Document(page_content=text, metadata={"source": source, "page": i})
+            for i, text in enumerate(pages)
+        ]
+        
+        cached = len(documents) - pages.parsed
+        self.metrics.cached_pages += cached
+        print(f"  ✓ Loaded {len(documents)} pages" + (f" ({cached} from cache)" if cached else ""))
+        return documents
+    
+    def _finish_pages(self, documents: List[Document], pdf) -> List[Document]:
+        """
+        OCR text-less pages, then mark duplicate pages
+        """
+        documents = self.ocr.apply(documents, pdf)
+        
+        if self.deduplicator:
+            documents = self.deduplicator.link_pages(documents)
+        
+        return documents
+    
     def load_directory(self, directory_path: str) -> List[Document]:
         """
         Load all PDF files from a directory
@@ -105,14 +288,82 @@ class DocumentIngester:
         """
         print_separator("Splitting Documents into Chunks")
         
-        chunks = self.text_splitter.split_documents(documents)
+        chunks = self._split(documents)
         
         print(f"Created {len(chunks)} chunks from {len(documents)} pages")
+        print(f"Chunking strategy: {self.chunking_strategy}")
         print(f"Chunk size: {self.chunk_size} characters")
         print(f"Chunk overlap: {self.chunk_overlap} characters")
         
         return chunks
     
+    def _split(self, documents: List[Document]) -> List[Document]:
+        """
+        Split pages and mark chunks whose text is already embedded
+        """
+        chunks = self.text_splitter.split_documents(documents)
+        
+        if self.deduplicator:
+            chunks = self.deduplicator.link_chunks(chunks)
+        
+        return chunks
+    
+    def iter_chunks(
+        self,
+        directory_path: str,
+        batch_pages: int = PAGE_BATCH_SIZE,
+        on_file_done: Optional[Callable[[str], None]] = None
+    ) -> Iterator[List[Document]]:
+        """
+        Lazily load a directory: pages are parsed only as batches are pulled
+        
+        The first chunks are ready after one batch of pages instead of after
+        every page of every file, so large forms do not block startup.
+        
+        Args:
+            directory_path: Path to directory containing PDFs
+            batch_pages: Pages parsed, OCR'd and split per batch
+            on_file_done: Called with a file's path once the batch holding
+                its last page has been consumed, e.g. to start work that
+                needs the whole document; never called for a file that
+                yielded no chunks
+            
+        Yields:
+            Lists of document chunks, one per batch of pages
+        """
+        if not os.path.exists(directory_path):
+            print(f"Error: Directory '{directory_path}' not found!")
+            return
+        
+        for pdf_file in sorted(f for f in os.listdir(directory_path) if f.endswith('.pdf')):
+            file_path = os.path.join(directory_path, pdf_file)
+            print(f"Loading PDF lazily: {pdf_file}")
+            
+            try:
+                with open(file_path, "rb") as f:
+                    data = f.read()
+                if self.deduplicator and self._skip_duplicate(file_path, data):
+                    continue
+                
+                pages = LazyPages(data, content_hash(data), self.page_cache)
+                yielded = False
+                for start in range(0, len(pages), batch_pages):
+                    batch = [
+                        Document(page_content=pages.text(i), metadata={"source": file_path, "page": i})
+                        for i in range(start, min(start + batch_pages, len(pages)))
+                    ]
+                    chunks = self._split(self._finish_pages(batch, BytesIO(data)))
+                    if chunks:
+                        yielded = True
+                        yield chunks
+            except Exception as e:
+                print(f"  ✗ Error loading PDF: {e}")
+                self.forget(file_path)
+                continue
+            
+            if yielded and on_file_done is not None:
+                on_file_done(file_path)
+    
     def process_directory(self, directory_path: str) -> List[Document]:
         """
         Complete pipeline: Load directory and split into chunks
@@ -123,27 +374,80 @@ class DocumentIngester:
         Returns:
             List of processed document chunks
         """
+        if self.deduplicator:
+            self.deduplicator.reset_stats()
+        self.ocr.reset_stats()
+        self.metrics = IngestMetrics()
+        
         # Load all documents
+        start = time.perf_counter()
         documents = self.load_directory(directory_path)
+        self.metrics.load_seconds = time.perf_counter() - start - self.ocr.seconds
         
         if not documents:
             print("No documents to process!")
-            return []
+            chunks = []
+        else:
+            # Split into chunks
+            start = time.perf_counter()
+            chunks = self.split_documents(documents)
+            self.metrics.split_seconds = time.perf_counter() - start
+        
+        self.metrics.files = len({doc.metadata.get("source") for doc in documents})
+        self.metrics.pages = len(documents)
+        self.metrics.chunks = len(chunks)
+        self.metrics.ocr_seconds = self.ocr.seconds
+        self.metrics.ocr_pages = self.ocr.pages
+        self.metrics.ocr_cache_hits = self.ocr.cache_hits
+        self.metrics.ocr_failures = self.ocr.failures
         
-        # Split into chunks
-        chunks = self.split_documents(documents)
+        if self.deduplicator:
+            self.deduplicator.stats.report()
+            for link in self.deduplicator.describe_links():
+                print(f"  ↪ {link}")
+        self.metrics.report()
         
         return chunks
+    
+    def process_bytes(self, data: bytes, name: str) -> List[Document]:
+        """
+        Complete pipeline for one in-memory PDF: load and split into chunks
+        
+        Args:
+            data: Raw PDF bytes
+            name: File name to record as the document source
+            
+        Returns:
+            List of document chunks (empty if the file was already ingested)
+        """
+        documents = self.load_pdf_bytes(data, name)
+        
+        if not documents:
+            return []
+        
+        try:
+            return self.split_documents(documents)
+        except Exception:
+            self.forget(name)
+            raise
 
 
 # Example usage and testing
 if __name__ == "__main__":
+    import argparse
+    from src.profiling import add_profile_argument, profiled
+    
+    parser = argparse.ArgumentParser(description="Ingest the data directory")
+    add_profile_argument(parser, default="ingest.folded")
+    args = parser.parse_args()
+    
     # Test the ingester
     ingester = DocumentIngester()
     
     # Try to load from data directory
     data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
-    chunks = ingester.process_directory(data_dir)
+    with profiled(args.profile) as profiler, profiler.stage("ingest"):
+        chunks = ingester.process_directory(data_dir)
     
     if chunks:
         print_separator("Sample Chunk")
@@ -0,0 +1,260 @@
+"""
+OCR Fallback Module
+Recovers text from scanned pages that have no extractable text layer
+"""
+
+import hashlib
+import os
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ProcessPoolExecutor, wait
+from io import BytesIO
+from typing import List, Optional
+from langchain.schema import Document
+from pypdf import PdfReader
+
+try:
+    import pytesseract
+    from PIL import Image
+except ImportError:  # OCR is optional
+    pytesseract = None
+
+
+# Pages with less extracted text than this are treated as scanned
+MIN_PAGE_CHARS = 20
+
+
+def ocr_image(image_bytes: bytes) -> str:
+    """
+    Run Tesseract on one page image (executed in a worker process)
+
+    Args:
+        image_bytes: Encoded page image
+
+    Returns:
+        str: Recognised text
+    """
+    try:
+        image = Image.open(BytesIO(image_bytes))
+        return pytesseract.image_to_string(image)
+    except Exception as e:
+        # pytesseract's exceptions cannot be pickled back to the parent
+        raise RuntimeError(str(e)) from None
+
+
+def page_image(page) -> Optional[bytes]:
+    """
+    Get the scanned image of a PDF page
+
+    Scanners store each page as one embedded image, so the largest image
+    on the page is taken as the page itself.
+
+    Args:
+        page: A pypdf page
+
+    Returns:
+        Encoded image bytes, or None if the page has no images
+    """
+    images = list(page.images)
+    if not images:
+        return None
+    return max(images, key=lambda image: len(image.data)).data
+
+
+class OCRCache:
+    """
+    On-disk cache of OCR output, keyed by the hash of the page image
+    """
+
+    def __init__(self, cache_dir: str):
+        """
+        Initialize the cache
+
+        Args:
+            cache_dir: Directory holding one text file per page image
+        """
+        self.cache_dir = cache_dir
+
+    def _path(self, image_hash: str) -> str:
+        return os.path.join(self.cache_dir, f"{image_hash}.txt")
+
+    def get(self, image_hash: str) -> Optional[str]:
+        """
+        Look up cached OCR text
+
+        Args:
+            image_hash: Hash of the page image
+
+        Returns:
+            The cached text, or None on a miss
+        """
+        try:
+            with open(self._path(image_hash), "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, image_hash: str, text: str):
+        """
+        Store OCR text for a page image
+
+        Args:
+            image_hash: Hash of the page image
+            text: Recognised text
+        """
+        # Write then rename, so a crash never leaves a partial entry
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(image_hash)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(path + ".tmp", path)
+
+
+class OCRFallback:
+    """
+    Sends text-less pages to a local OCR engine in a bounded process pool
+    """
+
+    def __init__(self, max_workers: int = 2, cache_dir: str = ".ocr_cache"):
+        """
+        Initialize the OCR fallback
+
+        Args:
+            max_workers: Most OCR processes running at once (default: 2)
+            cache_dir: Directory for cached OCR output (default: .ocr_cache)
+        """
+        self.max_workers = max_workers
+        self.cache = OCRCache(cache_dir)
+        self.available = pytesseract is not None
+        self._engine_checked = False
+
+        # Counters for the current ingest run
+        self.seconds = 0.0
+        self.pages = 0
+        self.cache_hits = 0
+        self.failures = 0
+
+    def reset_stats(self):
+        """
+        Start counting a new ingest run
+        """
+        self.seconds = 0.0
+        self.pages = 0
+        self.cache_hits = 0
+        self.failures = 0
+
+    def apply(self, documents: List[Document], pdf) -> List[Document]:
+        """
+        Fill in the text of pages that came out (nearly) empty
+
+        Args:
+            documents: Page documents, in page order, as extracted
+            pdf: Path or binary stream of the same PDF
+
+        Returns:
+            The same list, with OCR text on scanned pages
+        """
+        empty = [
+            i for i, document in enumerate(documents)
+            if len(document.page_content.strip()) < MIN_PAGE_CHARS
+        ]
+        if not empty:
+            return documents
+
+        if self.available and not self._engine_checked:
+            self._engine_checked = True
+            try:
+                pytesseract.get_tesseract_version()
+            except Exception:
+                self.available = False
+
+        if not self.available:
+            print(f"  ⚠ {len(empty)} page(s) have no text; install Tesseract and pytesseract to OCR them")
+            return documents
+
+        start = time.perf_counter()
+        try:
+            self._ocr_pages(documents, empty, pdf)
+        except Exception as e:
+            print(f"  ✗ OCR failed: {e}")
+        finally:
+            self.seconds += time.perf_counter() - start
+
+        return documents
+
+    def _ocr_pages(self, documents: List[Document], empty: List[int], pdf):
+        """
+        OCR the given pages, serving repeats from the cache
+        """
+        reader = PdfReader(pdf)
+        pool = None
+        pending = {}
+        recognised = 0
+        cache_hits = 0
+        failures_before = self.failures
+
+        try:
+            for i in empty:
+                page = documents[i].metadata.get("page", i)
+                try:
+                    image_bytes = page_image(reader.pages[page])
+                except Exception as e:
+                    self.failures += 1
+                    print(f"  ✗ OCR failed on page {page + 1}: {e}")
+                    continue
+                if image_bytes is None:
+                    continue
+
+                image_hash = hashlib.sha256(image_bytes).hexdigest()
+                cached = self.cache.get(image_hash)
+                if cached is not None:
+                    documents[i].page_content = cached
+                    cache_hits += 1
+                    continue
+
+                # Keep at most two pages per worker in flight, so page
+                # images are not all held in memory at once
+                if len(pending) >= 2 * self.max_workers:
+                    recognised += self._collect(pending, documents, FIRST_COMPLETED)
+
+                if pool is None:
+                    pool = ProcessPoolExecutor(max_workers=self.max_workers)
+                pending[pool.submit(ocr_image, image_bytes)] = (i, image_hash)
+
+            recognised += self._collect(pending, documents)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+            self.pages += recognised
+            self.cache_hits += cache_hits
+
+        failures = self.failures - failures_before
+        if recognised or cache_hits or failures:
+            print(f"  ✓ OCR: {recognised} page(s) recognised, {cache_hits} from cache"
+                  + (f", {failures} failed" if failures else ""))
+
+    def _collect(self, pending: dict, documents: List[Document], return_when=ALL_COMPLETED) -> int:
+        """
+        Wait for OCR jobs, store their text and cache it
+
+        A page that fails is counted and left as extracted; the other
+        pages of the file are still recognised.
+
+        Returns:
+            int: Number of pages recognised
+        """
+        if not pending:
+            return 0
+        done, _ = wait(list(pending), return_when=return_when)
+        recognised = 0
+        for future in done:
+            i, image_hash = pending.pop(future)
+            try:
+                text = future.result()
+            except Exception as e:
+                self.failures += 1
+                print(f"  ✗ OCR failed on page {documents[i].metadata.get('page', i) + 1}: {e}")
+                continue
+            documents[i].page_content = text
+            self.cache.put(image_hash, text)
+            recognised += 1
+        return recognised
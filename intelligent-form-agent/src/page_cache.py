@@ -0,0 +1,199 @@
+"""
+Page Cache Module
+Keeps the extracted text of every PDF page on disk, so unchanged files are
+never parsed twice, and parses uncached pages only when they are read
+"""
+
+import sqlite3
+import threading
+import zlib
+from io import BytesIO
+from typing import Iterator, Optional
+import pypdf
+from pypdf import PdfReader
+
+
+# Part of every cache key; bump the suffix when extraction changes, so
+# text from an older extractor is never served
+EXTRACTOR_VERSION = f"pypdf-{pypdf.__version__}/1"
+
+
+class PageCache:
+    """
+    Compressed page text, keyed by (file hash, page number, extractor version)
+    """
+
+    def __init__(self, path: str = ".page_cache.db"):
+        """
+        Open (or create) the cache
+
+        Args:
+            path: SQLite database file (default: .page_cache.db)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        # A lost write only costs a re-parse, so commits need not be durable
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " file_hash TEXT NOT NULL,"
+            " extractor TEXT NOT NULL,"
+            " page INTEGER NOT NULL,"
+            " text BLOB NOT NULL,"
+            " PRIMARY KEY (file_hash, extractor, page))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " file_hash TEXT NOT NULL,"
+            " extractor TEXT NOT NULL,"
+            " num_pages INTEGER NOT NULL,"
+            " PRIMARY KEY (file_hash, extractor))"
+        )
+        self._db.commit()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, file_hash: str, page: int) -> Optional[str]:
+        """
+        Look up the text of one page
+
+        Args:
+            file_hash: content_hash() of the file's bytes
+            page: Zero-based page number
+
+        Returns:
+            The cached text, or None
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT text FROM pages WHERE file_hash = ? AND extractor = ? AND page = ?",
+                (file_hash, EXTRACTOR_VERSION, page)
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def put(self, file_hash: str, page: int, text: str):
+        """
+        Store the text of one page
+
+        Args:
+            file_hash: content_hash() of the file's bytes
+            page: Zero-based page number
+            text: Extracted text
+        """
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?)",
+                (file_hash, EXTRACTOR_VERSION, page, zlib.compress(text.encode("utf-8")))
+            )
+            self._db.commit()
+
+    def num_pages(self, file_hash: str) -> Optional[int]:
+        """
+        Look up a file's page count
+
+        Returns:
+            The page count, or None if the file was never opened
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT num_pages FROM files WHERE file_hash = ? AND extractor = ?",
+                (file_hash, EXTRACTOR_VERSION)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put_num_pages(self, file_hash: str, num_pages: int):
+        """
+        Store a file's page count
+        """
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?)",
+                (file_hash, EXTRACTOR_VERSION, num_pages)
+            )
+            self._db.commit()
+
+    def reset_stats(self):
+        """
+        Zero the hit and miss counters
+        """
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        """
+        Close the database
+        """
+        with self._lock:
+            self._db.close()
+
+
+class LazyPages:
+    """
+    The pages of one PDF, parsed one at a time as they are read
+
+    Cached pages are served without opening the PDF at all; the parser is
+    only created for the first page missing from the cache.
+    """
+
+    def __init__(self, data: bytes, file_hash: str, cache: Optional[PageCache] = None):
+        """
+        Wrap a PDF
+
+        Args:
+            data: Raw PDF bytes
+            file_hash: content_hash() of the bytes
+            cache: Where parsed pages are kept (default: no cache)
+        """
+        self.data = data
+        self.file_hash = file_hash
+        self.cache = cache
+        self.parsed = 0
+        self._reader: Optional[PdfReader] = None
+        self._num_pages = cache.num_pages(file_hash) if cache is not None else None
+
+    def _open(self) -> PdfReader:
+        """
+        Open the parser on first use
+        """
+        if self._reader is None:
+            self._reader = PdfReader(BytesIO(self.data))
+        return self._reader
+
+    def __len__(self) -> int:
+        if self._num_pages is None:
+            self._num_pages = len(self._open().pages)
+            if self.cache is not None:
+                self.cache.put_num_pages(self.file_hash, self._num_pages)
+        return self._num_pages
+
+    def text(self, page: int) -> str:
+        """
+        Get the text of one page, parsing it if it is not cached
+
+        Args:
+            page: Zero-based page number
+
+        Returns:
+            str: The extracted text
+        """
+        if self.cache is not None:
+            cached = self.cache.get(self.file_hash, page)
+            if cached is not None:
+                return cached
+
+        text = self._open().pages[page].extract_text()
+        self.parsed += 1
+        if self.cache is not None:
+            self.cache.put(self.file_hash, page, text)
+        return text
+
+    def __iter__(self) -> Iterator[str]:
+        for page in range(len(self)):
+            yield self.text(page)
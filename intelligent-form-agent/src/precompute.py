@@ -0,0 +1,280 @@
+"""
+Precompute Module
+Generates per-document summaries and key facts in the background after
+ingest, so the UI can serve them without waiting on the LLM
+"""
+
+import hashlib
+import itertools
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+
+# Fields answered ahead of time for every new document
+KEY_FIELD_QUESTIONS = {
+    "document_number": "What is the invoice or form number?",
+    "date": "What is the date of the document?",
+    "vendor": "Who issued the document (vendor or sender)?",
+    "total": "What is the total amount?",
+}
+
+SUMMARY = "summary"
+
+# Lower runs first; interactive work never goes through the queue at all
+PRIORITY_NEW_DOCUMENT = 10
+
+
+class Preempted(Exception):
+    """
+    Raised inside a job when an interactive request needs the LLM
+    """
+
+
+def stream_text(llm, prompt: str, preempted: Callable[[], bool]) -> str:
+    """
+    Generate text token by token, giving up as soon as preempted() is true
+
+    Closing the stream drops the connection, so a local Ollama stops
+    generating and serves the interactive request next.
+
+    Args:
+        llm: LangChain LLM
+        prompt: The prompt
+        preempted: Checked before and between tokens
+
+    Returns:
+        str: The generated text
+
+    Raises:
+        Preempted: If an interactive request started before the end
+    """
+    if preempted():
+        raise Preempted()
+
+    parts = []
+    stream = llm.stream(prompt)
+    try:
+        for part in stream:
+            if preempted():
+                raise Preempted()
+            parts.append(part)
+    finally:
+        stream.close()
+    return "".join(parts)
+
+
+def document_key(source: str, text: str) -> str:
+    """
+    Key a document by name and content, so a changed file is recomputed
+
+    Args:
+        source: Document source path
+        text: The document's chunk text
+
+    Returns:
+        str: e.g. "invoice_001.pdf:3f9a..."
+    """
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+    return f"{os.path.basename(source)}:{digest}"
+
+
+class PrecomputeStore:
+    """
+    Persistent store of precomputed results, one row per (document, kind)
+    """
+
+    def __init__(self, path: str = ".precompute.db"):
+        """
+        Open (or create) the store
+
+        Args:
+            path: SQLite database file (default: .precompute.db)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " document TEXT NOT NULL,"
+            " kind TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " PRIMARY KEY (document, kind))"
+        )
+        self._db.commit()
+
+    def get(self, document: str, kind: str) -> Optional[str]:
+        """
+        Look up one precomputed result
+
+        Args:
+            document: Key from document_key()
+            kind: SUMMARY or a KEY_FIELD_QUESTIONS field
+
+        Returns:
+            The stored value, or None
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM results WHERE document = ? AND kind = ?",
+                (document, kind)
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_all(self, document: str) -> Dict[str, str]:
+        """
+        Get every precomputed result for a document
+
+        Args:
+            document: Key from document_key()
+
+        Returns:
+            Dict of kind -> value
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT kind, value FROM results WHERE document = ?", (document,)
+            ).fetchall()
+        return dict(rows)
+
+    def put(self, document: str, kind: str, value: str):
+        """
+        Store one result, replacing any older one
+
+        Args:
+            document: Key from document_key()
+            kind: SUMMARY or a KEY_FIELD_QUESTIONS field
+            value: The generated text
+        """
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                (document, kind, value, time.time())
+            )
+            self._db.commit()
+
+    def close(self):
+        """
+        Close the database
+        """
+        with self._lock:
+            self._db.close()
+
+
+class PrecomputeScheduler:
+    """
+    Runs precompute jobs on one low-priority background thread
+
+    Jobs only start while no interactive request is running; callers mark
+    their requests with interactive(). Jobs are called with a preempted()
+    check; a job that raises Preempted (see stream_text) is put back in the
+    queue and run again once the interactive requests are over, so a long
+    summary never holds the LLM while a question waits.
+    """
+
+    def __init__(self, store: PrecomputeStore):
+        """
+        Initialize the scheduler and start its worker thread
+
+        Args:
+            store: Where results are written
+        """
+        self.store = store
+        self._queue = queue.PriorityQueue()
+        self._order = itertools.count()
+        self._idle = threading.Condition()
+        self._active_requests = 0
+        self._stopped = False
+
+        self.completed = 0
+        self.failed = 0
+        self.preempted = 0
+
+        self._worker = threading.Thread(target=self._run, name="precompute", daemon=True)
+        self._worker.start()
+
+    def schedule(self, document: str, kind: str, job: Callable[[Callable[[], bool]], str],
+                 priority: int = PRIORITY_NEW_DOCUMENT):
+        """
+        Queue a job unless its result is already stored
+
+        Args:
+            document: Key from document_key()
+            kind: SUMMARY or a KEY_FIELD_QUESTIONS field
+            job: Function taking a preempted() check and returning the text
+                to store; it should raise Preempted when the check is true
+            priority: Lower runs first
+        """
+        if self.store.get(document, kind) is None:
+            self._queue.put((priority, next(self._order), document, kind, job))
+
+    @contextmanager
+    def interactive(self):
+        """
+        Mark an interactive request; background jobs wait until it ends
+        """
+        with self._idle:
+            self._active_requests += 1
+        try:
+            yield
+        finally:
+            with self._idle:
+                self._active_requests -= 1
+                self._idle.notify_all()
+
+    def _preempted(self) -> bool:
+        """
+        Whether the running job should give up the LLM
+        """
+        return self._active_requests > 0 or self._stopped
+
+    def pending(self) -> int:
+        """
+        Number of jobs waiting to run
+        """
+        return self._queue.qsize()
+
+    def shutdown(self):
+        """
+        Stop the worker after its current job
+        """
+        self._stopped = True
+        with self._idle:
+            self._idle.notify_all()
+        self._queue.put((-1, -1, None, None, None))
+        self._worker.join(timeout=5)
+
+    def _run(self):
+        """
+        Worker loop: take the next job once no interactive request is running
+        """
+        while not self._stopped:
+            priority, order, document, kind, job = self._queue.get()
+            if job is None:
+                break
+
+            # Yield to interactive requests
+            with self._idle:
+                self._idle.wait_for(lambda: self._active_requests == 0 or self._stopped)
+            if self._stopped:
+                break
+
+            # Skip work that was stored since the job was queued
+            if self.store.get(document, kind) is not None:
+                continue
+
+            try:
+                self.store.put(document, kind, job(self._preempted))
+                self.completed += 1
+            except Preempted:
+                # Back in its old place; it runs again once requests are over
+                self.preempted += 1
+                self._queue.put((priority, order, document, kind, job))
+            except Exception as e:
+                self.failed += 1
+                print(f"  ✗ Precompute {kind} for {document} failed: {e}")
@@ -0,0 +1,327 @@
+"""
+Profiling Module
+Samples the call stacks of a session and times each stage, to find where
+ingest and queries spend their time
+"""
+
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from src.utils import print_separator
+
+
+# Time between stack samples
+SAMPLE_INTERVAL = 0.005
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__))).replace("\\", "/") + "/"
+
+# Libraries whose frames identify a component, checked leaf first
+COMPONENTS = (
+    ("pypdf", ("/pypdf/",)),
+    ("ocr", ("/pytesseract/", "/PIL/", "src/ocr.py")),
+    ("splitter", ("/text_splitter", "src/chunking.py")),
+    ("dedup", ("src/dedup.py",)),
+    ("embeddings", ("/sentence_transformers/", "/transformers/", "/torch/",
+                    "/tokenizers/", "/langchain_community/embeddings/")),
+    ("chroma", ("/chromadb/", "/hnswlib", "/vectorstores/chroma.py")),
+    ("llm", ("/langchain_community/llms/", "/requests/", "/urllib3/", "/http/client.py")),
+)
+
+# Leaf frames of threads that are only waiting for work
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+}
+
+
+@dataclass
+class StageTiming:
+    """
+    Wall time of one named stage
+    """
+    calls: int = 0
+    total: float = 0.0
+    longest: float = 0.0
+
+
+def _short_path(path: str) -> str:
+    """
+    Shorten a source path to its package- or project-relative form
+    """
+    marker = "site-packages/"
+    if marker in path:
+        return path.split(marker, 1)[1]
+    return path[len(PROJECT_ROOT):] if path.startswith(PROJECT_ROOT) else os.path.basename(path)
+
+
+def component_of(paths: List[str]) -> str:
+    """
+    Name the component a stack sample belongs to
+
+    Args:
+        paths: Full source paths of the stack's frames, leaf first
+
+    Returns:
+        str: The first matching component, or "other"
+    """
+    for path in paths:
+        for component, patterns in COMPONENTS:
+            if any(pattern in path for pattern in patterns):
+                return component
+    return "other"
+
+
+class Profiler:
+    """
+    Sampling profiler with named stages
+
+    A background thread samples every thread's stack. Samples are rooted
+    at the stage the thread is in, so the collapsed-stack output shows one
+    flame graph per stage. Stages are also timed exactly, and each sample
+    is attributed to a component (pypdf, splitter, embeddings, chroma,
+    llm, ...) for the summary table.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL, enabled: bool = True):
+        """
+        Initialize the profiler
+
+        Args:
+            interval: Seconds between samples (default: 0.005)
+            enabled: False makes every method a no-op, so callers can
+                profile unconditionally
+        """
+        self.interval = interval
+        self.enabled = enabled
+
+        self.stacks: Counter = Counter()
+        self.components: Dict[str, Counter] = defaultdict(Counter)
+        self.timings: Dict[str, StageTiming] = defaultdict(StageTiming)
+        self.samples = 0
+
+        self._stages: Dict[int, List[str]] = defaultdict(list)
+        self._labels: Dict[object, Tuple[str, str]] = {}
+        self._owner = threading.get_ident()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._started = 0.0
+        self.elapsed = 0.0
+
+    def start(self):
+        """
+        Start sampling
+        """
+        if not self.enabled or self._sampler is not None:
+            return
+        self._started = time.perf_counter()
+        self._sampler = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        """
+        Stop sampling
+        """
+        if self._sampler is None:
+            return
+        self._stop.set()
+        self._sampler.join()
+        self._sampler = None
+        self.elapsed = time.perf_counter() - self._started
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Time a block and root its stack samples at the stage name
+
+        Args:
+            name: Stage name, e.g. "ingest" or "ask_question"
+        """
+        if not self.enabled:
+            yield
+            return
+
+        stack = self._stages[threading.get_ident()]
+        stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            stack.pop()
+            timing = self.timings[name]
+            timing.calls += 1
+            timing.total += duration
+            timing.longest = max(timing.longest, duration)
+
+    def instrument(self, obj, *method_names: str):
+        """
+        Run each call of some of an object's methods as a stage
+
+        Args:
+            obj: Object whose methods to wrap, e.g. an agent
+            method_names: Methods to wrap; each becomes a stage of that name
+        """
+        if not self.enabled:
+            return
+        for name in method_names:
+            method = getattr(obj, name)
+
+            @functools.wraps(method)
+            def wrapper(*args, _method=method, _name=name, **kwargs):
+                with self.stage(_name):
+                    return _method(*args, **kwargs)
+
+            setattr(obj, name, wrapper)
+
+    def _label(self, code) -> Tuple[str, str]:
+        """
+        Get the frame label and full path of a code object, cached
+        """
+        label = self._labels.get(code)
+        if label is None:
+            path = code.co_filename.replace("\\", "/")
+            label = (f"{code.co_name} ({_short_path(path)}:{code.co_firstlineno})", path)
+            self._labels[code] = label
+        return label
+
+    def _run(self):
+        """
+        Sampler loop
+        """
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+
+                stages = self._stages.get(thread_id)
+                # Outside a stage the main thread is just waiting for input
+                if not stages and thread_id == self._owner:
+                    continue
+
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    continue
+
+                frames, paths = [], []
+                while frame is not None:
+                    label, path = self._label(frame.f_code)
+                    frames.append(label)
+                    paths.append(path)
+                    frame = frame.f_back
+
+                if stages:
+                    root = ";".join(stages)
+                else:
+                    if thread_id not in names:
+                        names = {thread.ident: thread.name for thread in threading.enumerate()}
+                    root = f"[{names.get(thread_id, thread_id)}]"
+
+                self.stacks[";".join([root] + frames[::-1])] += 1
+                self.components[root][component_of(paths)] += 1
+                self.samples += 1
+
+    def write(self, path: str):
+        """
+        Write the samples as collapsed stacks ("frame;frame;frame count")
+
+        Open the file in https://www.speedscope.app or pass it to
+        flamegraph.pl.
+
+        Args:
+            path: Output file
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+
+    def report(self):
+        """
+        Print wall time per stage and where each stage's samples went
+        """
+        print_separator("Profile Summary")
+        print(f"{self.samples} samples over {self.elapsed:.1f}s "
+              f"(every {self.interval * 1000:.0f}ms)\n")
+
+        print(f"{'Stage':<24}{'Calls':>6}{'Total':>10}{'Mean':>10}{'Max':>10}  Components")
+        for name, timing in sorted(self.timings.items(), key=lambda item: -item[1].total):
+            # Nested stages count towards the innermost one
+            components = Counter()
+            for root, counts in self.components.items():
+                if root.split(";")[-1] == name:
+                    components.update(counts)
+            print(f"{name:<24}{timing.calls:>6}{timing.total:>9.2f}s"
+                  f"{timing.total / timing.calls:>9.2f}s{timing.longest:>9.2f}s  "
+                  f"{_breakdown(components)}")
+
+        # Background threads (precompute, shard searches) outside any stage
+        for root, counts in self.components.items():
+            if root.startswith("["):
+                print(f"{root:<24}{'':>6}{sum(counts.values()) * self.interval:>9.2f}s"
+                      f"{'':>20}  {_breakdown(counts)}")
+
+
+def _breakdown(components: Counter) -> str:
+    """
+    Format the largest components of a set of samples, e.g. "chroma 60%, llm 40%"
+    """
+    sampled = sum(components.values())
+    if not sampled:
+        return "-"
+    return ", ".join(
+        f"{component} {count / sampled:.0%}" for component, count in components.most_common(4)
+    )
+
+
+@contextmanager
+def profiled(output: Optional[str], interval: float = SAMPLE_INTERVAL):
+    """
+    Profile a block when an output file is given
+
+    On exit the collapsed stacks are written to the file and the summary
+    table is printed. Without an output file the yielded profiler is
+    disabled and costs nothing.
+
+    Args:
+        output: Collapsed-stack file to write, or None to not profile
+        interval: Seconds between samples
+
+    Yields:
+        Profiler: Use its stage() and instrument() to mark stages
+    """
+    profiler = Profiler(interval=interval, enabled=bool(output))
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        if output:
+            profiler.write(output)
+            profiler.report()
+            print(f"\n✓ Profile written to {output} (open it in https://www.speedscope.app)")
+
+
+def add_profile_argument(parser, default: str = "profile.folded"):
+    """
+    Add the --profile [FILE] option to an argument parser
+
+    Args:
+        parser: argparse.ArgumentParser to extend
+        default: File written when --profile is given without a name
+    """
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=default,
+        metavar="FILE",
+        help=f"sample the session and write a flame graph to FILE (default: {default})"
+    )
@@ -0,0 +1,99 @@
+"""
+Query Results Module
+Structured results returned by the agent's query methods
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from langchain.schema import Document
+
+
+@dataclass
+class SourceChunk:
+    """
+    A retrieved chunk and how close it was to the query
+    """
+    document: Document
+    score: float  # Distance from the query; lower is closer
+
+    @property
+    def chunk_id(self) -> Optional[int]:
+        return self.document.metadata.get("chunk_id")
+
+
+@dataclass
+class QueryResult:
+    """
+    Everything a query produced, so callers never have to retrieve again
+
+    Attributes:
+        question: The question asked
+        answer: The LLM's answer, or an error message
+        sources: Chunks the answer was generated from, closest first
+        timings: Seconds spent per stage (embed, retrieve, generate, total)
+        k: Number of chunks put in the prompt
+        prompt_tokens: Estimated size of the prompt sent to the LLM
+        error: Set when the query failed
+    """
+    question: str
+    answer: str
+    sources: List[SourceChunk] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)
+    k: int = 0
+    prompt_tokens: int = 0
+    error: Optional[str] = None
+
+    @property
+    def source_documents(self) -> List[Document]:
+        return [source.document for source in self.sources]
+
+    def __str__(self) -> str:
+        return self.answer
+
+
+@dataclass
+class DocumentFields:
+    """
+    Field values found in one document
+
+    Attributes:
+        source: Document source path
+        values: Field name -> value, for the fields that were found
+        methods: Field name -> where the value came from: "precomputed",
+            "text" (a labelled line in the document) or "llm"
+        seconds: Time spent on this document
+        error: Set when the lookup failed
+    """
+    source: str
+    values: Dict[str, str] = field(default_factory=dict)
+    methods: Dict[str, str] = field(default_factory=dict)
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+@dataclass
+class CrossDocumentResult:
+    """
+    Result of a comparison or aggregation over many documents
+
+    Attributes:
+        question: What was asked, e.g. "Sum of total by vendor"
+        answer: The LLM's narrative, or the joined table if it failed
+        documents: Per-document field values the answer was built from
+        table: The joined values, as sent to the LLM
+        groups: For aggregations, group -> {"sum": ..., "count": ...}
+        timings: Seconds spent per stage (extract, generate, total)
+        llm_calls: LLM calls made, including the final narrative
+        error: Set when the narrative could not be generated
+    """
+    question: str
+    answer: str
+    documents: List[DocumentFields] = field(default_factory=list)
+    table: str = ""
+    groups: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    timings: Dict[str, float] = field(default_factory=dict)
+    llm_calls: int = 0
+    error: Optional[str] = None
+
+    def __str__(self) -> str:
+        return self.answer
@@ -0,0 +1,79 @@
+"""
+Adaptive Retrieval Module
+Chooses how many retrieved chunks to put in the prompt for each query
+"""
+
+from dataclasses import dataclass
+from typing import List, Tuple
+from src.results import SourceChunk
+from src.utils import estimate_tokens
+
+
+@dataclass
+class RetrievalDepth:
+    """
+    Limits for adaptive retrieval depth
+
+    Attributes:
+        min_k: Always keep at least this many chunks
+        max_k: Fetch this many candidates and never keep more
+        max_context_tokens: Stop adding chunks once the context would
+            exceed this many (estimated) tokens
+        score_margin: Drop chunks whose distance is more than this above
+            the closest chunk's
+        score_gap: Stop at the first jump in distance between neighbouring
+            chunks of at least this much
+    """
+    min_k: int = 1
+    max_k: int = 6
+    max_context_tokens: int = 1500
+    score_margin: float = 0.35
+    score_gap: float = 0.15
+
+    @classmethod
+    def fixed(cls, k: int) -> "RetrievalDepth":
+        """
+        Depth that always keeps exactly k chunks (the old behaviour)
+        """
+        return cls(min_k=k, max_k=k, max_context_tokens=10 ** 9,
+                   score_margin=float("inf"), score_gap=float("inf"))
+
+
+def select_depth(candidates: List[SourceChunk], depth: RetrievalDepth) -> Tuple[List[SourceChunk], str]:
+    """
+    Keep the closest candidates until the scores or the token budget say stop
+
+    Scores are distances, so candidates are sorted closest first.
+
+    Args:
+        candidates: Retrieved chunks, closest first, at most depth.max_k
+        depth: Limits to apply
+
+    Returns:
+        Tuple of (chunks to use, reason retrieval stopped)
+    """
+    if not candidates:
+        return [], "no candidates"
+
+    best = candidates[0].score
+    selected = [candidates[0]]
+    tokens = estimate_tokens(candidates[0].document.page_content)
+
+    for previous, candidate in zip(candidates, candidates[1:]):
+        if len(selected) >= depth.max_k:
+            break
+
+        tokens += estimate_tokens(candidate.document.page_content)
+        required = len(selected) < depth.min_k
+
+        if not required:
+            if candidate.score - best > depth.score_margin:
+                return selected, "similarity threshold"
+            if candidate.score - previous.score >= depth.score_gap:
+                return selected, "score gap"
+            if tokens > depth.max_context_tokens:
+                return selected, "token budget"
+
+        selected.append(candidate)
+
+    return selected, "max k"
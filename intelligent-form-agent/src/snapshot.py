@@ -0,0 +1,115 @@
+"""
+Snapshot Module
+Saves a fully-built agent to disk and loads it back without re-embedding
+"""
+
+import json
+import os
+import shutil
+import time
+from typing import Optional, Tuple
+import numpy as np
+from src.chunk_store import ChunkStore
+
+
+# Bump whenever the files written by write_snapshot() change
+SNAPSHOT_FORMAT_VERSION = 4
+
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.npy"
+NORMS_FILE = "norms.npy"
+
+
+def write_snapshot(
+    path: str,
+    chunks: ChunkStore,
+    vectors: np.ndarray,
+    params: dict
+):
+    """
+    Write a self-contained, versioned snapshot directory
+
+    The snapshot is built in a temporary directory next to the target and
+    renamed into place, so readers never see a half-written snapshot.
+
+    Args:
+        path: Snapshot directory to create (replaced if it exists)
+        chunks: The agent's chunk store, including its metadata index
+        vectors: One embedding per chunk, in chunk ID order
+        params: Parameters the agent was built with
+    """
+    if len(vectors) != len(chunks):
+        raise ValueError(f"Expected {len(chunks)} vectors, got {len(vectors)}")
+
+    path = os.path.abspath(path)
+    building = f"{path}.building"
+    shutil.rmtree(building, ignore_errors=True)
+    os.makedirs(building)
+
+    chunks.save(building)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    np.save(os.path.join(building, VECTORS_FILE), vectors)
+
+    # Squared lengths, so query nodes get L2 distances from one product
+    np.save(os.path.join(building, NORMS_FILE), np.einsum("ij,ij->i", vectors, vectors))
+
+    manifest = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "num_chunks": len(chunks),
+        "num_documents": len(chunks.sources()),
+        "embedding_dim": int(vectors.shape[1]) if len(vectors) else 0,
+        "params": params,
+    }
+    with open(os.path.join(building, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.rename(building, path)
+
+
+def read_snapshot(
+    path: str,
+    expected_params: Optional[dict] = None
+) -> Tuple[dict, ChunkStore, np.ndarray, np.ndarray]:
+    """
+    Open a snapshot written by write_snapshot()
+
+    Chunk text and vectors are memory-mapped, not read into memory, so
+    every process opening the same snapshot shares one copy.
+
+    Args:
+        path: Snapshot directory
+        expected_params: Parameters that must match the snapshot's, e.g.
+            the embedding model, so query vectors are comparable
+
+    Returns:
+        Tuple of (manifest, read-only chunk store, vectors, squared vector
+        lengths)
+
+    Raises:
+        ValueError: If the snapshot is from another format version or
+            was built with different parameters
+    """
+    with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(
+            f"Snapshot format version {manifest.get('format_version')} is not supported "
+            f"(expected {SNAPSHOT_FORMAT_VERSION}). Rebuild the snapshot."
+        )
+
+    for key, value in (expected_params or {}).items():
+        if manifest["params"].get(key) != value:
+            raise ValueError(
+                f"Snapshot was built with {key}={manifest['params'].get(key)!r}, "
+                f"but this agent uses {value!r}. Rebuild the snapshot."
+            )
+
+    chunks = ChunkStore.load(path)
+    vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r")
+    norms = np.load(os.path.join(path, NORMS_FILE), mmap_mode="r")
+
+    return manifest, chunks, vectors, norms
@@ -55,6 +55,53 @@ def format_documents_for_display(documents: list) -> str:
     return "\n".join(output)
 
 
+def format_timings(timings: dict) -> str:
+    """
+    Format per-stage timings for display
+    
+    Args:
+        timings: Seconds spent per stage, e.g. {"embed": 0.01, "generate": 2.3}
+        
+    Returns:
+        str: e.g. "embed 0.01s | generate 2.30s"
+    """
+    return " | ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items())
+
+
+def format_cache_stats(stats: dict) -> str:
+    """
+    Format query cache hit rates for display
+    
+    Args:
+        stats: Result of IntelligentFormAgent.cache_stats()
+        
+    Returns:
+        str: e.g. "embeddings 67% hit (2/3) | retrievals 33% hit (1/3)"
+    """
+    parts = []
+    for level in ("embeddings", "retrievals"):
+        level_stats = stats[level]
+        lookups = level_stats["hits"] + level_stats["misses"]
+        parts.append(f"{level} {level_stats['hit_rate']:.0%} hit ({level_stats['hits']}/{lookups})")
+    return " | ".join(parts)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of LLM tokens in a text
+    
+    Uses the common rule of thumb of about 4 characters per token, which
+    is close enough for budgeting and needs no tokenizer download.
+    
+    Args:
+        text: Text to measure
+        
+    Returns:
+        int: Estimated token count
+    """
+    return (len(text) + 3) // 4
+
+
 def print_separator(title: Optional[str] = None):
     """
     Print a nice separator line
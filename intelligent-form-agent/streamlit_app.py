@@ -9,8 +9,10 @@ To use:
 
 import streamlit as st
 import os
+import uuid
 from src.ingest import DocumentIngester
 from src.agent import IntelligentFormAgent
+from src.utils import format_timings, format_cache_stats
 
 
 # Page configuration
@@ -52,6 +54,13 @@ st.markdown("""
 if 'agent' not in st.session_state:
     st.session_state.agent = None
     st.session_state.documents_loaded = False
+    # Each session gets its own vector collections
+    st.session_state.tenant = f"session-{uuid.uuid4().hex[:8]}"
+
+# One ingester per session: it remembers the content hash of every file
+# already indexed, so re-uploads are skipped and changed files are replaced
+if 'ingester' not in st.session_state:
+    st.session_state.ingester = DocumentIngester()
 
 
 # Sidebar for setup
@@ -72,38 +81,67 @@ with st.sidebar:
     # Process button
     if st.button("🚀 Process Documents", disabled=not uploaded_files):
         if uploaded_files:
-            with st.spinner("Processing documents..."):
+            ingester = st.session_state.ingester
+            progress = st.progress(0.0, text="Processing documents...")
+            added, skipped = 0, 0
+            
+            for i, uploaded_file in enumerate(uploaded_files):
+                progress.progress(i / len(uploaded_files), text=f"Processing {uploaded_file.name}...")
+                
                 try:
-                    # Save uploaded files temporarily
-                    temp_dir = "temp_uploads"
-                    os.makedirs(temp_dir, exist_ok=True)
+                    # Ingest straight from memory; no temporary files
+                    data = bytes(uploaded_file.getbuffer())
                     
-                    for uploaded_file in uploaded_files:
-                        file_path = os.path.join(temp_dir, uploaded_file.name)
-                        with open(file_path, "wb") as f:
-                            f.write(uploaded_file.getbuffer())
+                    if ingester.has_seen(data, uploaded_file.name):
+                        skipped += 1
+                        continue
                     
-                    # Process documents
-                    ingester = DocumentIngester()
-                    chunks = ingester.process_directory(temp_dir)
+                    chunks = ingester.process_bytes(data, uploaded_file.name)
+                    if not chunks:
+                        # Nothing was indexed, so a re-upload must not be skipped
+                        ingester.forget(uploaded_file.name)
+                        st.warning(f"No new content found in {uploaded_file.name}")
+                        continue
                     
-                    # Create agent
-                    st.session_state.agent = IntelligentFormAgent(chunks)
-                    st.session_state.documents_loaded = True
+                    # Only the new chunks are embedded
+                    if st.session_state.agent is None:
+                        st.session_state.agent = IntelligentFormAgent(
+                            chunks, tenant=st.session_state.tenant
+                        )
+                        # Summaries and key facts are ready before they are asked for
+                        st.session_state.agent.enable_precompute()
+                    else:
+                        # A changed file replaces the version indexed under its name
+                        st.session_state.agent.remove_document(uploaded_file.name)
+                        st.session_state.agent.add_chunks(chunks)
                     
-                    st.success(f"✅ Processed {len(uploaded_files)} document(s)!")
+                    st.session_state.documents_loaded = True
+                    added += 1
                     
                 except Exception as e:
-                    st.error(f"Error: {str(e)}")
+                    ingester.forget(uploaded_file.name)
+                    st.error(f"Error processing {uploaded_file.name}: {str(e)}")
+            
+            progress.progress(1.0, text="Done")
+            if added:
+                st.success(f"✅ Processed {added} new document(s)!")
+            if skipped:
+                st.info(f"↷ Skipped {skipped} document(s) already indexed")
         else:
             st.warning("Please upload documents to process")
     
     # Show loaded documents
     if st.session_state.documents_loaded:
         st.success("✅ Documents Ready")
+        for source in st.session_state.agent.chunks.sources():
+            st.caption(f"📄 {os.path.basename(source)}")
+        st.caption(f"⚡ Query cache: {format_cache_stats(st.session_state.agent.cache_stats())}")
         if st.button("🔄 Reset"):
+            if st.session_state.agent is not None:
+                st.session_state.agent.close()
             st.session_state.agent = None
             st.session_state.documents_loaded = False
+            st.session_state.ingester = DocumentIngester()
             st.rerun()
 
 
@@ -128,11 +166,12 @@ if not st.session_state.documents_loaded:
         - **Ask Questions**: Get specific information from documents
         - **Summarize**: Get concise summaries of your forms
         - **Analyze**: Get insights across multiple documents
+        - **Compare & Total**: Line up fields side by side, or sum amounts per vendor
         """)
 
 else:
     # Tabs for different functions
-    tab1, tab2, tab3 = st.tabs(["❓ Ask Question", "📝 Summarize", "📊 Analyze"])
+    tab1, tab2, tab3, tab4 = st.tabs(["❓ Ask Question", "📝 Summarize", "📊 Analyze", "⚖️ Compare & Total"])
     
     # Tab 1: Question Answering
     with tab1:
@@ -152,20 +191,23 @@ else:
             if question:
                 with st.spinner("Thinking..."):
                     try:
-                        answer = st.session_state.agent.ask_question(
+                        result = st.session_state.agent.ask_question(
                             question,
                             show_sources=show_sources
                         )
 
                         st.markdown("### Answer")
-                        st.success(answer)
+                        st.success(result.answer)
+                        st.caption(format_timings(result.timings))
 
+                        # Reuse the chunks the answer was generated from
                         if show_sources:
                             st.markdown("### Sources")
-                            retriever = st.session_state.agent.retriever
-                            docs = retriever.get_relevant_documents(question)
-                            for i, doc in enumerate(docs, 1):
-                                with st.expander(f"Source {i}"):
+                            for i, source in enumerate(result.sources, 1):
+                                doc = source.document
+                                name = os.path.basename(doc.metadata.get("source", "Unknown"))
+                                page = doc.metadata.get("page", "Unknown")
+                                with st.expander(f"Source {i}: {name}, page {page} (distance {source.score:.3f})"):
                                     st.write(doc.page_content[:500] + "...")
                     except Exception as e:
                         st.error(f"Error getting answer: {e}")
@@ -204,6 +246,13 @@ else:
                 if summary:
                     st.markdown("### Summary")
                     st.info(summary)
+                
+                if doc_option == "Specific document" and doc_name:
+                    key_facts = st.session_state.agent.get_key_facts(doc_name)
+                    if key_facts:
+                        st.markdown("### Key Facts")
+                        for field, value in key_facts.items():
+                            st.markdown(f"**{field.replace('_', ' ').title()}:** {value}")
     
     # Tab 3: Holistic Analysis
     with tab3:
@@ -225,14 +274,82 @@ else:
         if st.button("Analyze", key="analysis_button"):
             if analysis_question:
                 with st.spinner("Analyzing documents..."):
-                    analysis = st.session_state.agent.holistic_analysis(
+                    result = st.session_state.agent.holistic_analysis(
                         analysis_question
                     )
                     
                     st.markdown("### Analysis Result")
-                    st.success(analysis)
+                    st.success(result.answer)
+                    st.caption(format_timings(result.timings))
             else:
                 st.warning("Please enter an analysis question")
+    
+    # Tab 4: Comparison and aggregation
+    with tab4:
+        st.subheader("Compare and Total Across Documents")
+        
+        st.markdown("""
+        Fields are read from each document in parallel and combined exactly;
+        the AI is only asked once, to describe the result.
+        """)
+        
+        mode = st.radio(
+            "What to do:",
+            ["Compare documents", "Total a field"],
+            key="cross_option"
+        )
+        
+        if mode == "Compare documents":
+            names = st.text_input(
+                "Document names, separated by commas:",
+                placeholder="e.g., invoice_001, invoice_002",
+                key="compare_input"
+            )
+        else:
+            col1, col2 = st.columns(2)
+            with col1:
+                value_field = st.text_input("Field to total:", value="total", key="total_field")
+            with col2:
+                group_by = st.text_input("Group by:", value="vendor", key="group_field")
+        
+        if st.button("Run", key="cross_button"):
+            progress = st.progress(0.0, text="Reading documents...")
+            partial = st.empty()
+            rows = []
+            
+            def show_progress(done, total, document):
+                # Partial results appear as each document finishes
+                rows.append({"document": os.path.basename(document.source), **document.values})
+                progress.progress(done / total, text=f"Read {done} of {total} documents")
+                partial.dataframe(rows, use_container_width=True)
+            
+            if mode == "Compare documents":
+                document_names = [name.strip() for name in names.split(",") if name.strip()]
+                if document_names:
+                    result = st.session_state.agent.compare_documents(
+                        document_names, on_progress=show_progress
+                    )
+                else:
+                    st.warning("Please enter at least one document name")
+                    result = None
+            else:
+                result = st.session_state.agent.aggregate(
+                    value_field or "total", group_by or "vendor", on_progress=show_progress
+                )
+            
+            if result is not None:
+                progress.empty()
+                if result.groups:
+                    partial.dataframe(
+                        [{group_by: group, **values} for group, values in result.groups.items()],
+                        use_container_width=True
+                    )
+                st.markdown("### Result")
+                if result.error:
+                    st.warning(f"Could not describe the result: {result.error}")
+                else:
+                    st.success(result.answer)
+                st.caption(f"{format_timings(result.timings)} | {result.llm_calls} LLM call(s)")
 
 
 # Footer
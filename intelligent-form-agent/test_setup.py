@@ -26,7 +26,7 @@ def check_imports():
         ("langchain", "LangChain"),
         ("chromadb", "ChromaDB"),
         ("pypdf", "PyPDF"),
-        ("google.generativeai", "Google Generative AI"),
+        ("langchain_community", "LangChain Community"),
         ("sentence_transformers", "Sentence Transformers"),
         ("dotenv", "Python Dotenv"),
     ]
@@ -111,6 +111,7 @@ def main():
     if all(checks):
         print("  ✓✓✓ ALL CHECKS PASSED! ✓✓✓")
         print("  You're ready to run: python main.py")
+        print("  Regression tests (offline, fake models): python -m pytest tests")
     else:
         print("  ✗ Some checks failed")
         print("  Please fix the issues above before running main.py")
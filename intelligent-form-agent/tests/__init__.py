@@ -0,0 +1,6 @@
+"""
+Regression tests for the Intelligent Form Agent
+
+Run offline, with deterministic fake models:
+    python -m pytest tests
+"""
@@ -0,0 +1,47 @@
+"""
+Shared fixtures: fake models, a generated corpus and an isolated ingester
+"""
+
+from typing import Iterator
+import pytest
+from benchmarks.fakes import FakeModels
+from benchmarks.pdf_factory import make_corpus
+from src.agent import IntelligentFormAgent
+from src.ingest import DocumentIngester
+
+
+@pytest.fixture
+def models() -> Iterator[FakeModels]:
+    """Fake embedder and LLM, installed in place of the real ones"""
+    with FakeModels().installed() as fakes:
+        yield fakes
+
+
+@pytest.fixture
+def corpus(tmp_path) -> str:
+    """Directory of 5 generated two-page invoices"""
+    directory = str(tmp_path / "data")
+    make_corpus(directory, num_documents=5, pages_per_document=2)
+    return directory
+
+
+@pytest.fixture
+def ingester(tmp_path) -> DocumentIngester:
+    """Ingester whose OCR and page caches live in the test's directory"""
+    return DocumentIngester(
+        ocr_cache_dir=str(tmp_path / "ocr_cache"),
+        page_cache_path=str(tmp_path / "page_cache.db")
+    )
+
+
+@pytest.fixture
+def agent(models, ingester, corpus):
+    """Agent built from the generated corpus"""
+    agent = IntelligentFormAgent(ingester.process_directory(corpus))
+    yield agent
+    agent.close()
+
+
+def searches(agent: IntelligentFormAgent) -> int:
+    """Vector searches run by an agent so far, across all its collections"""
+    return sum(stats["queries"] for stats in agent.collection_stats())
@@ -0,0 +1,104 @@
+"""
+Wall time, peak memory and model call budgets for every pipeline operation
+
+Budgets are for a 20-document, 40-page generated corpus with fake models.
+Wall time budgets are about 5x the measured cost, memory budgets leave more
+headroom, and model call budgets are exact. Cached operations are also
+checked against the uncached ones they replace, which holds on any machine.
+Run `python -m benchmarks.pipeline_benchmark 20 2` to see the current numbers.
+"""
+
+import contextlib
+import io
+import pytest
+from benchmarks.fakes import FakeModels
+from benchmarks.pdf_factory import make_corpus
+from benchmarks.pipeline_benchmark import run_pipeline
+
+
+NUM_DOCUMENTS = 20
+PAGES_PER_DOCUMENT = 2
+
+# operation: (seconds, peak MB); per-query operations are per call
+BUDGETS = {
+    "ingest": (1.0, 16),
+    "build_index": (1.5, 32),
+    "ask_question": (0.1, 4),
+    "ask_question_cached": (0.01, 2),
+    "holistic_analysis": (0.025, 4),
+    "summarize_document": (0.01, 2),
+    "aggregate": (0.025, 4),
+    "save_snapshot": (0.05, 16),
+    "from_snapshot": (0.01, 16),
+    "reingest_cached": (0.2, 4),
+}
+
+# cached operation: (operation it replaces, largest share of its time)
+SPEEDUPS = {
+    "ask_question_cached": ("ask_question", 0.5),
+    "reingest_cached": ("ingest", 0.5),
+    "from_snapshot": ("build_index", 0.1),
+}
+
+# operation: expected model and vector search calls
+CALLS = {
+    "ingest": {"embed_documents": 0, "embed_query": 0, "llm": 0},
+    "ask_question": {"embed_documents": 0, "embed_query": 1, "llm": 1, "searches": 1},
+    "ask_question_cached": {"embed_documents": 0, "embed_query": 0, "llm": 1, "searches": 0},
+    "holistic_analysis": {"embed_documents": 0, "embed_query": 1, "llm": 1, "searches": 1},
+    "summarize_document": {"embed_documents": 0, "embed_query": 0, "llm": 1, "searches": 0},
+    "aggregate": {"embed_documents": 0, "embed_query": 0, "llm": 1, "searches": 0},
+    "save_snapshot": {"embed_documents": 0, "embed_query": 0, "llm": 0},
+    "from_snapshot": {"embed_documents": 0, "embed_query": 0, "llm": 0},
+}
+
+
+def pipeline(tmp_path_factory, trace_memory: bool) -> dict:
+    data_dir = str(tmp_path_factory.mktemp("data"))
+    make_corpus(data_dir, NUM_DOCUMENTS, PAGES_PER_DOCUMENT)
+
+    with FakeModels().installed() as models, contextlib.redirect_stdout(io.StringIO()):
+        return run_pipeline(data_dir, str(tmp_path_factory.mktemp("work")), models, trace_memory)
+
+
+@pytest.fixture(scope="module")
+def timed(tmp_path_factory) -> dict:
+    return pipeline(tmp_path_factory, trace_memory=False)
+
+
+@pytest.fixture(scope="module")
+def traced(tmp_path_factory) -> dict:
+    return pipeline(tmp_path_factory, trace_memory=True)
+
+
+@pytest.mark.parametrize("operation", BUDGETS)
+def test_wall_time_budget(timed, operation):
+    seconds, _ = BUDGETS[operation]
+    assert timed[operation]["seconds"] <= seconds
+
+
+@pytest.mark.parametrize("operation", SPEEDUPS)
+def test_cache_speedup(timed, operation):
+    uncached, share = SPEEDUPS[operation]
+    assert timed[operation]["seconds"] <= timed[uncached]["seconds"] * share
+
+
+@pytest.mark.parametrize("operation", BUDGETS)
+def test_peak_memory_budget(traced, operation):
+    _, peak_mb = BUDGETS[operation]
+    assert traced[operation]["peak_mb"] <= peak_mb
+
+
+@pytest.mark.parametrize("operation", CALLS)
+def test_model_call_budget(timed, operation):
+    measured = {key: timed[operation][key] for key in CALLS[operation]}
+    assert measured == CALLS[operation]
+
+
+def test_index_embeds_each_chunk_once(timed):
+    assert timed["build_index"]["embed_documents"] == timed["build_index"]["chunks"]
+
+
+def test_reingest_parses_nothing(timed):
+    reingest = timed["reingest_cached"]
+    assert reingest["cached_pages"] == reingest["pages"] == NUM_DOCUMENTS * PAGES_PER_DOCUMENT
@@ -0,0 +1,67 @@
+"""
+Tests of the layout-aware splitter: fields, headings and table rows stay
+whole, and no chunk goes over the chunk size
+"""
+
+from src.chunking import HEADING, KEY_VALUE, TABLE_ROW, TEXT, LayoutAwareSplitter, classify_line
+
+
+PROSE = "Some prose about the invoice that runs on for a while here and there.\nMore prose words."
+
+TABLE = "Items:\n" + "\n".join(f"{i}. Consulting Services line {i} - $100.00" for i in range(1, 8))
+
+
+def test_lines_are_classified():
+    assert classify_line("Invoice Number: INV-0001") == KEY_VALUE
+    assert classify_line("Items:") == HEADING
+    assert classify_line("1. Consulting Services - $800.00") == TABLE_ROW
+    assert classify_line("Qty    Price    Total") == TABLE_ROW
+    assert classify_line("Thank you for your business.") == TEXT
+
+
+def test_small_page_is_one_chunk():
+    text = "INVOICE\nInvoice Number: INV-0001\nDate: 2024-01-15\nFrom: ABC Corporation"
+
+    assert LayoutAwareSplitter(chunk_size=1000).split_text(text) == [text]
+
+
+def test_blocks_are_not_cut():
+    text = "Invoice Number: INV-0001\nDate: 2024-01-15\n\nFrom: ABC Corporation\nTo: Customer 1"
+    chunks = LayoutAwareSplitter(chunk_size=50).split_text(text)
+
+    assert chunks == ["Invoice Number: INV-0001\nDate: 2024-01-15", "From: ABC Corporation\nTo: Customer 1"]
+
+
+def test_oversized_table_starts_a_chunk_with_its_heading():
+    chunks = LayoutAwareSplitter(chunk_size=120).split_text(f"{PROSE}\n{TABLE}")
+
+    assert chunks[0] == PROSE
+    assert chunks[1].startswith("Items:\n1. Consulting")
+    assert all(chunk.count("Items:") <= 1 for chunk in chunks)
+    # Continuations repeat the heading so they read on their own
+    assert all(chunk.startswith("Items:\n") for chunk in chunks[1:])
+    assert all(len(chunk) <= 120 for chunk in chunks)
+
+
+def test_every_row_is_kept_once():
+    chunks = LayoutAwareSplitter(chunk_size=120).split_text(f"{PROSE}\n{TABLE}")
+    rows = [line for chunk in chunks for line in chunk.splitlines() if classify_line(line) == TABLE_ROW]
+
+    assert rows == TABLE.splitlines()[1:]
+
+
+def test_long_line_is_broken_at_words():
+    line = " ".join(["word"] * 60)
+    chunks = LayoutAwareSplitter(chunk_size=100).split_text(line)
+
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert " ".join(chunks) == line
+
+
+def test_overlap_carries_whole_lines():
+    text = "\n\n".join(f"Paragraph number {i} of the terms and conditions." for i in range(4))
+    chunks = LayoutAwareSplitter(chunk_size=110, chunk_overlap=60).split_text(text)
+
+    assert len(chunks) > 1
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.splitlines()[0] == previous.splitlines()[-1]
@@ -0,0 +1,157 @@
+"""
+Tests of comparisons and aggregations across documents: values are joined
+in Python, the LLM is called once for the narrative, and per-document LLM
+extraction never exceeds its concurrency limit
+"""
+
+import threading
+import time
+import pytest
+from langchain.schema import Document
+from benchmarks.pdf_factory import invoice_pages
+from src.agent import IntelligentFormAgent
+from src.cross_document import FieldExtractor, find_field, normalise_answer, parse_amount
+from src.precompute import PrecomputeStore, document_key
+
+
+class SlowLLM:
+    """Stand-in LLM that records how many calls overlap"""
+
+    def __init__(self, seconds: float = 0.02):
+        self.seconds = seconds
+        self.calls = 0
+        self.running = 0
+        self.most_running = 0
+        self._lock = threading.Lock()
+
+    def predict(self, prompt: str) -> str:
+        with self._lock:
+            self.calls += 1
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        time.sleep(self.seconds)
+        with self._lock:
+            self.running -= 1
+        return "Customer 1"
+
+
+def expected_totals(num_documents: int) -> dict:
+    totals = {}
+    for index in range(1, num_documents + 1):
+        lines = invoice_pages(index)[0]
+        vendor = find_field("\n".join(lines), "vendor")
+        totals[vendor] = totals.get(vendor, 0.0) + parse_amount(find_field("\n".join(lines), "total"))
+    return totals
+
+
+def test_labelled_lines_are_found():
+    text = "INVOICE\nInvoice Number: INV-0007\nDate: 2024-08-08\nFrom: Globex Inc\nTotal: $1,250.00"
+
+    assert find_field(text, "document_number") == "INV-0007"
+    assert find_field(text, "vendor") == "Globex Inc"
+    assert find_field(text, "customer") is None
+    assert parse_amount(find_field(text, "total")) == 1250.0
+    assert parse_amount("not found") is None
+
+
+def test_verbose_answers_are_reduced_to_values():
+    assert normalise_answer("total", "Invoice 0001 has a total amount of $1,250.00.") == "$1,250.00"
+    assert normalise_answer("total", "Total: $870.00") == "$870.00"
+    assert normalise_answer("total", "Either $10.00 or $20.00.") is None
+    assert normalise_answer("vendor", '"ABC Corporation"') == "ABC Corporation"
+    assert normalise_answer("vendor", "The invoice was issued by ABC Corporation.") is None
+    assert normalise_answer("date", "I don't know.") is None
+    assert parse_amount("Invoice 0001 has a total amount of $1,250.00.") == 1250.0
+
+
+def store_facts(agent, tmp_path, facts: dict):
+    # Answers in the shape the QA prompt gives them, for every document
+    agent.precompute_store = PrecomputeStore(str(tmp_path / "precompute.db"))
+    for source in agent.chunks.sources():
+        key = document_key(source, agent._document_text(source))
+        for field, answer in facts.items():
+            agent.precompute_store.put(key, field, answer)
+
+
+def test_labelled_lines_win_over_verbose_precomputed_answers(agent, tmp_path):
+    store_facts(agent, tmp_path, {
+        "vendor": "The invoice was issued by ABC Corporation.",
+        "total": "Invoice 0001 has a total amount of $3.00, paid in 2 parts.",
+    })
+    result = agent.aggregate("total", group_by="vendor")
+
+    assert {group: values["sum"] for group, values in result.groups.items()} == pytest.approx(expected_totals(5))
+    assert all(method == "text" for document in result.documents for method in document.methods.values())
+
+
+def test_unlabelled_documents_use_reduced_precomputed_answers(models, tmp_path):
+    agent = IntelligentFormAgent([
+        Document(page_content=f"Thank you for your order number {i}.", metadata={"source": f"letter_{i}.pdf", "page": 0})
+        for i in range(1, 3)
+    ])
+    store_facts(agent, tmp_path, {
+        "vendor": "ABC Corporation",
+        "total": "The letter confirms a total amount of $1,250.00.",
+    })
+    before = models.calls()["llm"]
+    result = agent.aggregate("total", group_by="vendor")
+
+    assert result.groups == {"ABC Corporation": {"sum": 2500.0, "count": 2}}
+    assert all(document.methods == {"total": "precomputed", "vendor": "precomputed"} for document in result.documents)
+    assert models.calls()["llm"] - before == 1
+    agent.close()
+
+
+def test_aggregate_is_exact_and_makes_one_llm_call(models, agent):
+    before = models.calls()["llm"]
+    result = agent.aggregate("total", group_by="vendor")
+
+    assert result.error is None
+    assert models.calls()["llm"] - before == 1
+    assert result.llm_calls == 1
+    assert {group: values["sum"] for group, values in result.groups.items()} == pytest.approx(expected_totals(5))
+    assert all(method == "text" for document in result.documents for method in document.methods.values())
+
+
+def test_compare_joins_only_the_named_documents(models, agent):
+    before = models.calls()["llm"]
+    result = agent.compare_documents(["invoice_0002", "invoice_0004", "no_such_invoice"], fields=["date", "total"])
+
+    assert [document.source.split("/")[-1] for document in result.documents] == [
+        "invoice_0002.pdf", "invoice_0004.pdf"
+    ]
+    assert result.documents[0].values["date"] == "2024-03-03"
+    assert "invoice_0004.pdf | 2024-05-05 |" in result.table
+    assert models.calls()["llm"] - before == 1
+
+
+def test_progress_is_reported_per_document(agent):
+    progress = []
+    agent.aggregate(on_progress=lambda done, total, document: progress.append((done, total, document.source)))
+
+    assert [(done, total) for done, total, _ in progress] == [(i, 5) for i in range(1, 6)]
+    assert len({source for _, _, source in progress}) == 5
+
+
+def test_llm_extraction_is_bounded(agent):
+    agent.llm = SlowLLM()
+    extractor = FieldExtractor(agent, max_workers=8, llm_concurrency=2)
+
+    documents = list(agent.iter_document_fields(fields=["customer"], extractor=extractor))
+
+    assert len(documents) == 5
+    assert all(document.methods == {"customer": "llm"} for document in documents)
+    assert extractor.llm_calls == agent.llm.calls == 5
+    assert agent.llm.most_running == 2
+
+
+def test_narrative_failure_still_returns_the_values(agent):
+    def fail(prompt):
+        raise ConnectionError("Ollama is not running")
+
+    agent.llm = type("BrokenLLM", (), {"predict": staticmethod(fail)})()
+    result = agent.aggregate()
+
+    assert result.error == "Ollama is not running"
+    assert result.answer == result.table
+    assert result.table.startswith("vendor | total | documents")
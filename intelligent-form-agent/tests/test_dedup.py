@@ -0,0 +1,217 @@
+"""
+Tests of deduplication at ingest: duplicates are linked, never dropped, so
+every document keeps all of its text while shared text is embedded once
+"""
+
+import pytest
+from benchmarks.pdf_factory import pdf_bytes
+from src.agent import IntelligentFormAgent
+from src.dedup import DUPLICATE_OF
+from src.ingest import DocumentIngester
+
+
+TERMS = [
+    "Terms and Conditions:",
+    "Payment is due within thirty days of the invoice date.",
+    "Late payments incur a fee of one and a half percent per month.",
+    "Goods remain the property of the seller until paid in full.",
+    "Disputes must be raised in writing within fourteen days.",
+]
+
+
+def invoice(number: str, total: str) -> list:
+    return [
+        "INVOICE",
+        f"Invoice Number: {number}",
+        "Date: 2024-01-15",
+        "From: ABC Corporation",
+        "To: Customer 1",
+        "Items:",
+        "1. Consulting Services - $800.00",
+        "2. Software License - $300.00",
+        "3. Support Package - $150.00",
+        f"Total: {total}",
+    ] + TERMS[1:]
+
+
+@pytest.fixture
+def layout_ingester(tmp_path) -> DocumentIngester:
+    return DocumentIngester(
+        chunk_size=120,
+        chunking_strategy="layout",
+        ocr_cache_dir=str(tmp_path / "ocr_cache"),
+        page_cache_path=str(tmp_path / "page_cache.db")
+    )
+
+
+def texts(chunks, source: str) -> list:
+    return [chunk.page_content for chunk in chunks if chunk.metadata["source"] == source]
+
+
+def linked(chunks, source: str) -> list:
+    return [chunk.metadata.get(DUPLICATE_OF) for chunk in chunks if chunk.metadata["source"] == source]
+
+
+def test_same_file_under_the_same_name_is_skipped(layout_ingester):
+    data = pdf_bytes([invoice("INV-0001", "$1,250.00")])
+
+    assert layout_ingester.process_bytes(data, "a.pdf")
+    assert layout_ingester.has_seen(data, "a.pdf")
+    assert layout_ingester.process_bytes(data, "a.pdf") == []
+
+
+def test_exact_duplicate_under_another_name_is_linked(layout_ingester):
+    data = pdf_bytes([invoice("INV-0001", "$1,250.00")])
+    first = layout_ingester.process_bytes(data, "a.pdf")
+    second = layout_ingester.process_bytes(data, "b.pdf")
+
+    assert texts(second, "b.pdf") == texts(first, "a.pdf")
+    assert set(linked(second, "b.pdf")) == {"a.pdf"}
+    assert layout_ingester.deduplicator.stats.files_linked == 1
+
+
+def test_near_duplicate_keeps_every_chunk(layout_ingester):
+    first = layout_ingester.process_bytes(pdf_bytes([invoice("INV-0001", "$1,250.00")]), "a.pdf")
+    second = layout_ingester.process_bytes(pdf_bytes([invoice("INV-0002", "$1,250.50")]), "b.pdf")
+
+    assert len(texts(second, "b.pdf")) == len(texts(first, "a.pdf"))
+    assert any("From: ABC Corporation" in text for text in texts(second, "b.pdf"))
+    # Only the chunks that changed are left to embed
+    changed = [text for text in texts(second, "b.pdf") if text not in texts(first, "a.pdf")]
+    assert changed
+    assert all(
+        chunk.metadata.get(DUPLICATE_OF) is None
+        for chunk in second if chunk.page_content in changed
+    )
+    assert linked(second, "b.pdf").count("a.pdf") == len(texts(second, "b.pdf")) - len(changed)
+
+
+def test_shared_page_stays_in_both_documents(layout_ingester):
+    first = layout_ingester.process_bytes(
+        pdf_bytes([invoice("INV-0001", "$1,250.00"), TERMS]), "a.pdf"
+    )
+    second = layout_ingester.process_bytes(
+        pdf_bytes([["INVOICE", "Invoice Number: INV-0777", "From: Globex Inc", "Total: $99.00"], TERMS]),
+        "b.pdf"
+    )
+
+    terms = [chunk for chunk in second if chunk.metadata["page"] == 1]
+    assert [chunk.page_content for chunk in terms] == [
+        chunk.page_content for chunk in first if chunk.metadata["page"] == 1
+    ]
+    assert all(chunk.metadata[DUPLICATE_OF] == "a.pdf" for chunk in terms)
+    assert all(DUPLICATE_OF not in chunk.metadata for chunk in second if chunk.metadata["page"] == 0)
+
+
+def test_agent_resolves_linked_chunks(models, layout_ingester, tmp_path):
+    chunks = layout_ingester.process_bytes(pdf_bytes([invoice("INV-0001", "$1,250.00")]), "a.pdf")
+    agent = IntelligentFormAgent(chunks)
+    before = models.calls()["embed_documents"]
+    added = agent.add_chunks(
+        layout_ingester.process_bytes(pdf_bytes([invoice("INV-0002", "$1,250.50")]), "b.pdf")
+    )
+
+    # Only b's changed chunks are embedded, but all of them are stored
+    embedded = models.calls()["embed_documents"] - before
+    assert 0 < embedded < len(added)
+    assert "From: ABC Corporation" in agent._document_text("b.pdf")
+
+    result = agent.aggregate("total", group_by="vendor")
+    assert result.groups == {"ABC Corporation": {"sum": 2500.5, "count": 2}}
+
+    # Searches on b alone also reach the chunks it shares with a
+    sources = agent._retrieve("Who issued the invoice?", {}, agent.qa_depth, where={"source": "b.pdf"})
+    assert any("From: ABC Corporation" in source.document.page_content for source in sources)
+
+    snapshot = str(tmp_path / "snapshot")
+    agent.save_snapshot(snapshot)
+    restored = IntelligentFormAgent.from_snapshot(snapshot)
+    assert restored.collections.stats()[0]["chunks"] == agent.collections.stats()[0]["chunks"]
+    assert restored._document_text("b.pdf") == agent._document_text("b.pdf")
+
+    agent.close()
+    restored.close()
+
+
+@pytest.mark.parametrize("num_shards", [1, 4])
+def test_search_on_a_near_duplicate_sees_only_its_own_text(models, layout_ingester, num_shards):
+    chunks = layout_ingester.process_bytes(pdf_bytes([invoice("INV-0001", "$1,250.00")]), "a.pdf")
+    chunks += layout_ingester.process_bytes(pdf_bytes([invoice("INV-0002", "$9,999.50")]), "b.pdf")
+    agent = IntelligentFormAgent(chunks, num_shards=num_shards)
+    depth = type(agent.qa_depth)(min_k=12, max_k=12, max_context_tokens=100000)
+
+    for question in ("What is the invoice number?", "What is the total?", "What are the payment terms?"):
+        sources = agent._retrieve(question, {}, depth, where={"source": "b.pdf"})
+        assert sources
+        assert {source.document.metadata["source"] for source in sources} == {"b.pdf"}
+        text = "\n".join(source.document.page_content for source in sources)
+        assert "INV-0001" not in text and "$1,250.00" not in text
+
+    # The shared terms are found through a's embedded chunk, shown as b's
+    sources = agent._retrieve("When is payment due?", {}, depth, where={"source": "b.pdf"})
+    shared = [source for source in sources if DUPLICATE_OF in source.document.metadata]
+    assert shared and all(source.document.metadata[DUPLICATE_OF] == "a.pdf" for source in shared)
+
+    agent.close()
+
+
+def test_file_that_fails_to_parse_is_not_remembered(layout_ingester):
+    data = b"%PDF-1.4 truncated"
+
+    assert layout_ingester.process_bytes(data, "broken.pdf") == []
+    assert not layout_ingester.has_seen(data)
+
+
+def test_forgotten_file_is_processed_again_and_not_linked_to(layout_ingester):
+    data = pdf_bytes([invoice("INV-0001", "$1,250.00")])
+    first = layout_ingester.process_bytes(data, "a.pdf")
+
+    # e.g. the agent failed to index a.pdf
+    layout_ingester.forget("a.pdf")
+    assert not layout_ingester.has_seen(data, "a.pdf")
+
+    again = layout_ingester.process_bytes(data, "a.pdf")
+    assert texts(again, "a.pdf") == texts(first, "a.pdf")
+    assert set(linked(again, "a.pdf")) == {None}
+
+    near = layout_ingester.process_bytes(pdf_bytes([invoice("INV-0002", "$1,250.50")]), "b.pdf")
+    assert "a.pdf" in linked(near, "b.pdf")
+
+
+def test_changed_file_replaces_its_old_version(models, layout_ingester, tmp_path):
+    # b.pdf is an exact copy of the first a.pdf, so it is linked to it
+    first = pdf_bytes([invoice("INV-0001", "$1,250.00")])
+    agent = IntelligentFormAgent(
+        layout_ingester.process_bytes(first, "a.pdf") + layout_ingester.process_bytes(first, "b.pdf")
+    )
+
+    changed = layout_ingester.process_bytes(pdf_bytes([invoice("INV-0001", "$1,300.00")]), "a.pdf")
+    assert changed and layout_ingester.deduplicator.stats.files_replaced == 1
+    assert set(linked(changed, "a.pdf")) == {None}
+    before = models.calls()["embed_documents"]
+    agent.remove_document("a.pdf")
+    agent.add_chunks(changed)
+
+    assert len(agent.chunks.chunk_ids("a.pdf")) == len(changed)
+    assert "$1,250.00" not in agent._document_text("a.pdf")
+    # b's chunks lost their original, so they are embedded now
+    assert models.calls()["embed_documents"] - before == len(changed) + len(agent.chunks.chunk_ids("b.pdf"))
+
+    result = agent.aggregate("total", group_by="document_number")
+    assert sorted(document.values["total"] for document in result.documents) == ["$1,250.00", "$1,300.00"]
+    sources = agent._retrieve("What is the total?", {}, agent.qa_depth, where={"source": "b.pdf"})
+    assert sources and all(source.document.metadata["source"] == "b.pdf" for source in sources)
+
+    snapshot = str(tmp_path / "snapshot")
+    agent.save_snapshot(snapshot)
+    restored = IntelligentFormAgent.from_snapshot(snapshot)
+    assert sorted(restored.chunks.sources()) == ["a.pdf", "b.pdf"]
+    assert restored._document_text("a.pdf") == agent._document_text("a.pdf")
+    for source in ("a.pdf", "b.pdf"):
+        live = agent._retrieve("What is the total?", {}, agent.qa_depth, where={"source": source})
+        served = restored._retrieve("What is the total?", {}, restored.qa_depth, where={"source": source})
+        assert [chunk.score for chunk in served] == pytest.approx([chunk.score for chunk in live], abs=1e-4)
+        assert {chunk.document.metadata["source"] for chunk in served} == {source}
+
+    agent.close()
+    restored.close()
@@ -0,0 +1,89 @@
+"""
+Tests of the OCR fallback: text-less pages are recognised once, then served
+from the cache by image hash, and one failing page must not cost the text
+of the other pages
+"""
+
+import hashlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+from langchain.schema import Document
+from benchmarks.pdf_factory import pdf_bytes
+from src import ocr as ocr_module
+from src.ocr import OCRFallback
+
+
+def finished(text: str = None, error: Exception = None) -> Future:
+    future = Future()
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(text)
+    return future
+
+
+def test_failed_page_does_not_stop_the_others(tmp_path):
+    ocr = OCRFallback(cache_dir=str(tmp_path / "ocr_cache"))
+    documents = [Document(page_content="", metadata={"page": i}) for i in range(3)]
+    pending = {
+        finished("Invoice Number: INV-0001"): (0, "hash0"),
+        finished(error=RuntimeError("Tesseract crashed")): (1, "hash1"),
+        finished("Total: $1,250.00"): (2, "hash2"),
+    }
+
+    assert ocr._collect(pending, documents) == 2
+    assert pending == {}
+    assert ocr.failures == 1
+    assert [document.page_content for document in documents] == [
+        "Invoice Number: INV-0001", "", "Total: $1,250.00"
+    ]
+    # Only recognised pages are cached
+    assert ocr.cache.get("hash0") == "Invoice Number: INV-0001"
+    assert ocr.cache.get("hash1") is None
+
+
+def test_scanned_page_is_recognised_once_then_served_from_cache(monkeypatch, tmp_path):
+    # One page with a text layer, two scanned ones
+    data = pdf_bytes([["Invoice Number: INV-0001", "From: ABC Corporation"], [], []])
+    images = {1: b"scan of the totals page", 2: b"scan of the signature page"}
+    recognised = {images[1]: "Total: $1,250.00", images[2]: "Signed: J. Smith"}
+    calls = []
+
+    def fake_ocr(image_bytes):
+        calls.append(image_bytes)
+        return recognised[image_bytes]
+
+    # Threads instead of processes, so the fakes are seen by the workers
+    monkeypatch.setattr(ocr_module, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(ocr_module, "ocr_image", fake_ocr)
+    monkeypatch.setattr(ocr_module, "page_image", lambda page: images.get(page.page_number))
+
+    def run():
+        ocr = OCRFallback(cache_dir=str(tmp_path / "ocr_cache"))
+        ocr.available, ocr._engine_checked = True, True
+        pages = [
+            Document(page_content=text, metadata={"page": i})
+            for i, text in enumerate(["Invoice Number: INV-0001\nFrom: ABC Corporation", "", " "])
+        ]
+        return ocr, ocr.apply(pages, BytesIO(data))
+
+    ocr, pages = run()
+    assert sorted(calls) == sorted(images.values())
+    assert [page.page_content for page in pages[1:]] == ["Total: $1,250.00", "Signed: J. Smith"]
+    assert pages[0].page_content.startswith("Invoice Number")
+    assert (ocr.pages, ocr.cache_hits) == (2, 0)
+    assert ocr.cache.get(hashlib.sha256(images[1]).hexdigest()) == "Total: $1,250.00"
+
+    # The same pages again: no OCR at all
+    ocr, pages = run()
+    assert len(calls) == 2
+    assert [page.page_content for page in pages[1:]] == ["Total: $1,250.00", "Signed: J. Smith"]
+    assert (ocr.pages, ocr.cache_hits) == (0, 2)
+
+    # A new scan of the same page is a new image, so it is recognised
+    images[2] = b"rescan of the signature page"
+    recognised[images[2]] = "Signed: J. Smith, 2024-01-15"
+    ocr, pages = run()
+    assert calls[2:] == [images[2]]
+    assert pages[2].page_content == "Signed: J. Smith, 2024-01-15"
+    assert (ocr.pages, ocr.cache_hits) == (1, 1)
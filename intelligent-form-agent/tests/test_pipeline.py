@@ -0,0 +1,245 @@
+"""
+End-to-end tests of how much model and vector store work each operation
+does; they catch accidental re-embedding, double retrieval and extra LLM
+calls
+"""
+
+import json
+import os
+import sqlite3
+import numpy as np
+import pytest
+from benchmarks.pdf_factory import make_corpus
+from src.agent import IntelligentFormAgent
+from src.dedup import DUPLICATE_OF
+from src.ingest import DocumentIngester
+from tests.conftest import searches
+
+
+def diff(before: dict, after: dict) -> dict:
+    return {key: after[key] - before[key] for key in after}
+
+
+def test_every_chunk_is_embedded_exactly_once(models, ingester, corpus):
+    chunks = ingester.process_directory(corpus)
+    agent = IntelligentFormAgent(chunks)
+
+    assert len(chunks) > 0
+    assert models.calls() == {"embed_documents": len(chunks), "embed_query": 0, "llm": 0}
+    agent.close()
+
+
+def test_chunk_text_is_kept_once(models, agent):
+    for shard in agent.collections.shards:
+        stored = shard.get(include=["documents", "metadatas"])
+        assert stored["ids"]
+        assert all(document is None for document in stored["documents"])
+
+    result = agent.ask_question("What is the total amount of INV-0002?")
+    chunk = result.sources[0]
+    assert chunk.document.page_content == agent.chunks.text(chunk.chunk_id)
+
+
+def test_question_costs_one_embedding_one_search_one_llm_call(models, agent):
+    before = models.calls()
+    result = agent.ask_question("What is the total amount of INV-0002?")
+
+    assert result.error is None
+    assert diff(before, models.calls()) == {"embed_documents": 0, "embed_query": 1, "llm": 1}
+    assert searches(agent) == 1
+    assert 1 <= result.k <= agent.qa_depth.max_k
+
+
+def test_answer_uses_the_matching_document(models, agent):
+    result = agent.ask_question("What is the total of invoice INV-0003 from Initech LLC?")
+
+    assert "invoice_0003.pdf" in result.sources[0].document.metadata["source"]
+
+
+def test_repeated_question_skips_embedding_and_search(models, agent):
+    agent.ask_question("What is the date of INV-0001?")
+    before = models.calls()
+    agent.ask_question("What is the  date of INV-0001?")
+
+    assert diff(before, models.calls()) == {"embed_documents": 0, "embed_query": 0, "llm": 1}
+    assert searches(agent) == 1
+
+
+def test_holistic_analysis_makes_a_single_llm_call(models, agent):
+    before = models.calls()
+    result = agent.holistic_analysis("Which vendors issued invoices?")
+
+    assert diff(before, models.calls()) == {"embed_documents": 0, "embed_query": 1, "llm": 1}
+    assert result.k >= agent.analysis_depth.min_k
+
+
+def test_add_chunks_embeds_only_new_chunks_and_invalidates_searches(models, agent, ingester, tmp_path):
+    question = "What is the total amount?"
+    agent.ask_question(question)
+
+    new_dir = str(tmp_path / "more")
+    make_corpus(new_dir, num_documents=7, pages_per_document=1)
+    new_chunks = ingester.process_directory(new_dir)
+    # Invoices 6 and 7 are new; the first pages of 1 to 5 repeat pages already indexed
+    new = [chunk for chunk in new_chunks if DUPLICATE_OF not in chunk.metadata]
+    assert new and len(new) < len(new_chunks)
+
+    before = models.calls()
+    agent.add_chunks(new_chunks)
+    assert diff(before, models.calls())["embed_documents"] == len(new)
+
+    agent.ask_question(question)
+    assert searches(agent) == 2
+
+
+def test_any_write_to_the_collections_invalidates_searches(models, agent):
+    question = "What is the total amount?"
+    agent.ask_question(question)
+
+    # Written straight to the collections, not through add_chunks()
+    agent.collections.upsert_vectors(
+        ids=["0"],
+        vectors=list(agent.collections.get_vectors(["0"]).values()),
+        metadatas=[agent.chunks.metadata(0)]
+    )
+
+    agent.ask_question(question)
+    assert searches(agent) == 2
+    assert agent.cache_stats()["index_version"] == agent.collections.index_version
+
+
+def test_reingesting_the_same_files_produces_no_chunks(models, ingester, corpus):
+    assert ingester.process_directory(corpus)
+    assert ingester.process_directory(corpus) == []
+
+
+def test_page_cache_serves_unchanged_files(tmp_path, corpus):
+    cache = str(tmp_path / "pages.db")
+    first = DocumentIngester(page_cache_path=cache, deduplicate=False)
+    chunks = first.process_directory(corpus)
+    assert first.metrics.cached_pages == 0
+
+    second = DocumentIngester(page_cache_path=cache, deduplicate=False)
+    assert [c.page_content for c in second.process_directory(corpus)] == [c.page_content for c in chunks]
+    assert second.metrics.cached_pages == second.metrics.pages == 10
+
+
+def test_snapshot_restore_does_not_reembed(models, agent, tmp_path):
+    path = str(tmp_path / "snapshot")
+    agent.save_snapshot(path)
+
+    before = models.calls()
+    restored = IntelligentFormAgent.from_snapshot(path, num_shards=2)
+    assert diff(before, models.calls())["embed_documents"] == 0
+
+    question = "What is the total amount of INV-0004?"
+    assert restored.ask_question(question).answer == agent.ask_question(question).answer
+    restored.close()
+
+
+def test_snapshot_is_searched_in_place(models, agent, tmp_path):
+    path = str(tmp_path / "snapshot")
+    agent.save_snapshot(path)
+    restored = IntelligentFormAgent.from_snapshot(path, num_shards=3)
+
+    # The vectors stay in the snapshot file; nothing is copied into an index
+    assert isinstance(restored.collections.vectors, np.memmap)
+    assert sum(stats["chunks"] for stats in restored.collection_stats()) == agent.collection_stats()[0]["chunks"]
+
+    source = agent.chunks.sources()[2]
+    for question in ("What is the total amount?", "Who issued invoice INV-0003?", "Line item 4"):
+        for where in (None, {"source": source}):
+            live = agent._retrieve(question, {}, agent.analysis_depth, where=where)
+            served = restored._retrieve(question, {}, restored.analysis_depth, where=where)
+            # Same distances in the same order; chunks with equal distances
+            # may come back in either order
+            assert [chunk.score for chunk in served] == pytest.approx([chunk.score for chunk in live], abs=1e-4)
+            live_scores = {chunk.chunk_id: chunk.score for chunk in live}
+            for chunk in served:
+                if chunk.chunk_id in live_scores:
+                    assert chunk.score == pytest.approx(live_scores[chunk.chunk_id], abs=1e-4)
+
+    with pytest.raises(ValueError):
+        restored.add_chunks([agent.chunks.get(0)])
+    restored.close()
+
+
+def test_sharded_search_matches_single_collection(models, ingester, corpus):
+    chunks = ingester.process_directory(corpus)
+    single = IntelligentFormAgent(chunks)
+    sharded = IntelligentFormAgent(chunks, num_shards=3)
+
+    question = "Which invoice is from Globex Inc?"
+    expected = single.ask_question(question).sources
+    actual = sharded.ask_question(question).sources
+    # Equally close chunks may come back in either order
+    assert [round(s.score, 6) for s in actual] == [round(s.score, 6) for s in expected]
+    assert {s.chunk_id for s in actual} == {s.chunk_id for s in expected}
+
+    single.close()
+    sharded.close()
+
+
+def test_agents_do_not_share_collections(models, ingester, tmp_path):
+    first_dir, second_dir = str(tmp_path / "a"), str(tmp_path / "b")
+    make_corpus(first_dir, num_documents=1)
+    make_corpus(second_dir, num_documents=2)
+
+    first = IntelligentFormAgent(ingester.process_directory(first_dir), tenant="first")
+    second = IntelligentFormAgent(DocumentIngester(page_cache_path=None).process_directory(second_dir),
+                                  tenant="second")
+
+    result = first.holistic_analysis("List every invoice")
+    assert {s.document.metadata["source"] for s in result.sources} == set(first.chunks.sources())
+
+    first.close()
+    second.close()
+
+
+def test_close_releases_every_store(models, ingester, corpus, tmp_path):
+    agent = IntelligentFormAgent(ingester.process_directory(corpus))
+    agent.enable_precompute(str(tmp_path / "precompute.db"))
+    chunk_file = agent.chunks._file
+    store = agent.precompute_store
+
+    agent.close()
+
+    assert chunk_file.closed
+    assert not [
+        collection for collection in agent.collections.client.list_collections()
+        if collection.name.startswith(agent.collections.prefix)
+    ]
+    with pytest.raises(sqlite3.ProgrammingError):
+        store.get("any", "summary")
+    assert agent.scheduler is None and agent.precompute_store is None
+
+
+def test_lazy_ingest_precomputes_each_document_once(models, ingester, corpus, tmp_path, monkeypatch):
+    scheduled = []
+    agent = None
+
+    # Same flow as main.py --lazy --precompute, one page per batch
+    batches = ingester.iter_chunks(
+        corpus, batch_pages=1, on_file_done=lambda source: agent.document_complete(source)
+    )
+    agent = IntelligentFormAgent(next(batches), complete=False)
+    monkeypatch.setattr(agent, "_schedule_precompute", scheduled.append)
+    agent.enable_precompute(str(tmp_path / "precompute.db"))
+    assert scheduled == []
+
+    for chunks in batches:
+        agent.add_chunks(chunks, complete=False)
+
+    assert sorted(scheduled) == agent.chunks.sources()
+    assert not agent.incomplete_sources
+    agent.close()
+
+
+def test_snapshot_manifest_has_no_stale_params(models, agent, tmp_path):
+    snapshot = str(tmp_path / "snapshot")
+    agent.save_snapshot(snapshot)
+
+    with open(os.path.join(snapshot, "manifest.json"), encoding="utf-8") as f:
+        params = json.load(f)["params"]
+    assert "retriever_k" not in params
+    assert params["qa_depth"]["max_k"] == agent.qa_depth.max_k
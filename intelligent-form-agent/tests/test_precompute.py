@@ -0,0 +1,76 @@
+"""
+Tests of the background precompute scheduler: interactive requests
+pre-empt a running job, which is queued again and finishes later
+"""
+
+import threading
+import time
+from src.precompute import PrecomputeScheduler, PrecomputeStore, Preempted, stream_text
+
+
+class TokenLLM:
+    """Stand-in LLM that streams one token at a time"""
+
+    def __init__(self, tokens: int, seconds: float = 0.01):
+        self.tokens = tokens
+        self.seconds = seconds
+        self.closed = 0
+
+    def stream(self, prompt: str):
+        try:
+            for i in range(self.tokens):
+                time.sleep(self.seconds)
+                yield f"t{i} "
+        finally:
+            self.closed += 1
+
+
+def wait_until(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_stream_text_stops_between_tokens():
+    llm = TokenLLM(tokens=50)
+    calls = []
+
+    def preempted():
+        calls.append(1)
+        return len(calls) > 3
+
+    try:
+        stream_text(llm, "prompt", preempted)
+        assert False, "expected Preempted"
+    except Preempted:
+        pass
+    assert llm.closed == 1
+    assert stream_text(TokenLLM(tokens=3, seconds=0), "prompt", lambda: False) == "t0 t1 t2 "
+
+
+def test_interactive_request_preempts_a_running_job(tmp_path):
+    store = PrecomputeStore(str(tmp_path / "precompute.db"))
+    scheduler = PrecomputeScheduler(store)
+    llm = TokenLLM(tokens=40)
+    started = threading.Event()
+
+    def job(preempted):
+        started.set()
+        return stream_text(llm, "Summarize", preempted)
+
+    scheduler.schedule("doc", "summary", job)
+    started.wait(timeout=5)
+
+    with scheduler.interactive():
+        # The job gives the LLM up within a token or two
+        wait_until(lambda: scheduler.preempted == 1)
+        assert store.get("doc", "summary") is None
+
+    # ...and runs to the end once the request is over
+    wait_until(lambda: scheduler.completed == 1)
+    assert store.get("doc", "summary").startswith("t0 t1")
+    assert scheduler.failed == 0
+
+    scheduler.shutdown()
+    store.close()